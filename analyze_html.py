@@ -3,14 +3,28 @@ import sys
 import json
 import glob
 import re
+import io
+import importlib.util
 from datetime import datetime
 from zoneinfo import ZoneInfo
+from html.parser import HTMLParser
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import font_manager
 import matplotlib.colors as mcolors
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer, Tag, NavigableString, CData
+from snapshot_dedup import UNCHANGED_SUFFIX, resolve_snapshot
+from html_storage import HTML_EXTENSIONS, is_html_path, strip_html_extension, read_html, open_html
+from extraction_index import ExtractionIndex
+from layout_cache import LayoutCache, layout_fingerprint
+from data_store import AppendOnlyCsvStore, SnapshotDigests
+import parquet_store
+import sqlite_store
+from world_store import append_world_store, save_world_store
+from capture_records import get_world_records_config, get_world_records_path, load_world_records
 
 # 日本語フォントの設定
 def setup_japanese_font():
@@ -59,164 +73,549 @@ def load_config():
         return json.load(f)
 
 
-# ゾーン名の定義
-ZONE_NAMES = [
-    "01.IPTeCAバーチャル・イノベーション展示館：エントランス",
-    "02.IPTeCAバーチャル・イノベーション展示館：メインロビー",
-    "03.IPTeCAバーチャル・イノベーション展示館：「研究成果・技術内容」ゾーン",
-    "04.IPTeCAバーチャル・イノベーション展示館：「CSAP」ゾーン",
-    "05.IPTeCAバーチャル・イノベーション展示館：「地域貢献・展開」ゾーン",
-    "06.IPTeCAバーチャル・イノベーション展示館：「ものづくり教育」ゾーン",
-]
-
-ZONE_SHORT_NAMES = [
-    "エントランス",
-    "メインロビー",
-    "研究成果・技術内容",
-    "CSAP",
-    "地域貢献・展開",
-    "ものづくり教育",
-]
+def load_zones():
+    """config.json の "zones" からゾーンの定義（短い名前・ワールド名・番号）を読み込む
+    ワールド名に short_name を含むワールドが、そのゾーンとしてCSVとグラフに出力される"""
+    try:
+        zones = load_config().get("zones", [])
+    except (OSError, ValueError) as e:
+        print(f"警告: config.json からゾーンの定義を読み込めませんでした: {e}")
+        zones = []
+    return [zone for zone in zones if zone.get("short_name")]
+
 
+# ゾーンの定義（config.json の "zones"）
+ZONES = load_zones()
+ZONE_NAMES = [zone.get("name", zone["short_name"]) for zone in ZONES]
+ZONE_SHORT_NAMES = [zone["short_name"] for zone in ZONES]
 # ゾーン番号とゾーン名の対応
-ZONE_NUMBERS = {
-    "01": "エントランス",
-    "02": "メインロビー",
-    "03": "研究成果・技術内容",
-    "04": "CSAP",
-    "05": "地域貢献・展開",
-    "06": "ものづくり教育",
+ZONE_NUMBERS = {zone["number"]: zone["short_name"] for zone in ZONES if zone.get("number")}
+
+
+# HTMLの解析バックエンド（tools/check_parser_backends.py で全件の一致と速度を確認できる）
+PARSER_BACKENDS = ["html.parser", "html.parser+strainer", "lxml", "lxml+strainer", "selectolax", "stream"]
+# 既定は最も速い selectolax（未インストールの場合は追加の依存が無い html.parser+strainer）
+DEFAULT_PARSER_BACKEND = "selectolax" if importlib.util.find_spec("selectolax") else "html.parser+strainer"
+
+# レイアウトキャッシュの記録がカードの内容と合わなかったことを表す値
+LAYOUT_MISMATCH = object()
+
+# 並列解析でワーカーに一度に渡すファイル数の既定値
+DEFAULT_CHUNKSIZE = 8
+
+
+def _is_world_href(href):
+    """ワールドカードのリンク先（/w/...）かどうか"""
+    return href is not None and href.startswith("/w/")
+
+
+def world_id_from_href(href):
+    """ワールドカードのリンク先（/w/<id>）からワールドIDを取り出す"""
+    return href[len("/w/"):].split("?", 1)[0].split("#", 1)[0].strip("/")
+
+
+def _match_zone_name(name):
+    """ワールド名に含まれるゾーンの短い名前を返す（該当なしは None）"""
+    for short_name in ZONE_SHORT_NAMES:
+        if short_name in name:
+            return short_name
+    return None
+
+
+def _parse_count(text):
+    """「1,234」などの表示から数値を取り出す（数値が無い場合は None）"""
+    match = re.search(r'[\d,]+', text.replace(',', ''))
+    return int(match.group().replace(',', '')) if match else None
+
+
+def _layout_token(parent_position, tag_name, classes, d_attr):
+    """レイアウトの指紋に使う要素1つ分の文字列（親の位置・タグ名・class・pathのdの先頭）"""
+    if isinstance(classes, list):
+        classes = " ".join(classes)
+    token = f"{parent_position}>{tag_name}.{'.'.join((classes or '').split())}"
+    return f"{token}:{d_attr[:7]}" if d_attr else token
+
+
+def _read_card_layout(elements, entry, get_text):
+    """記録済みの位置の要素だけを読み、(タイトル, 来場者数, いいね数) を返す
+    タイトルが無いレイアウトは None、記録と内容が合わない場合（タイトルが短い・数値が読めない）は LAYOUT_MISMATCH"""
+    if entry["title"] is None:
+        return None
+    title = get_text(elements[entry["title"]])
+    if len(title) <= 10:
+        return LAYOUT_MISMATCH
+    counts = {}
+    for key in ("visitors", "likes"):
+        if entry[key] is None:
+            counts[key] = 0
+            continue
+        counts[key] = _parse_count(get_text(elements[entry[key]]))
+        if counts[key] is None:
+            return LAYOUT_MISMATCH
+    return title, counts["visitors"], counts["likes"]
+
+
+def _scan_card_with_layout(card, layouts, card_layout, scan_card, get_text):
+    """レイアウトキャッシュを使ってカードを読む（バックエンドごとの関数を受け取る）
+    既知のレイアウトは記録した位置の要素だけを読み、未知のレイアウトや記録と合わない場合は全体を探索して記録する"""
+    elements, position_of, fingerprint = card_layout(card)
+    entry = layouts.lookup(fingerprint)
+    if entry is not None:
+        scanned = _read_card_layout(elements, entry, get_text)
+        if scanned is not LAYOUT_MISMATCH:
+            return scanned
+        layouts.reject(fingerprint)
+    nodes = {}
+    scanned = scan_card(card, nodes)
+    layouts.store(fingerprint, {key: position_of(node) if node is not None else None for key, node in nodes.items()})
+    return scanned
+
+
+def _scan_card_bs4(card, nodes=None):
+    """ワールドカードを1回だけ走査し、(タイトル, 来場者数, いいね数) を返す（タイトルが無い場合は None）
+    各divのテキスト長と、SVGアイコン（♥と▶）の直後のspanを同じ走査の中で集める
+    nodes に辞書を渡すと、採用したタイトルのdivと数値のspanを "title" / "likes" / "visitors" に入れる（レイアウトキャッシュ用）
+    タイトルは、テキスト（空白を除いた文字列の連結）が11文字以上のdivのうち、そのようなdivを内側に含まないもので
+    テキストが最も長いもの（同じ長さなら先のもの）。カード全体を囲むdiv（作者名や数値も含む）は対象にしない"""
+    divs = []  # [div, テキスト長, 内側にタイトル候補のdivを含むか] を文書順に記録
+    counts = {"likes": 0, "visitors": 0}
+    assigned = {"likes": -1, "visitors": -1}  # 値を採用したsvgの順番（文書順で後のsvgを優先する）
+    chosen = {"likes": None, "visitors": None}  # 値を採用したspan
+    spans = {}  # svgごとの直後のspan（同じsvg内の複数のpathで再検索しない）
+    svg_count = [0]
+
+    def walk(tag, svgs):
+        """tag 以下を走査し、(テキスト長, タイトル候補のdivを含むか) を返す"""
+        entry = None
+        if tag.name == "div":
+            entry = [tag, 0, False]
+            divs.append(entry)
+        elif tag.name == "svg":
+            svgs = svgs + ((svg_count[0], tag),)
+            svg_count[0] += 1
+        elif tag.name == "path" and svgs:
+            d_attr = tag.get("d", "")
+            # Heart（♥）: dが"M60.004"で始まる / Play（▶）: dが"M38.678"で始まる
+            key = "likes" if d_attr.startswith("M60.004") else "visitors" if d_attr.startswith("M38.678") else None
+            if key:
+                # pathを囲むすべてのsvgについて、svgの親要素内でsvgの後に来る最初のspanを探す
+                for order, svg in svgs:
+                    if id(svg) not in spans:
+                        spans[id(svg)] = svg.find_next_sibling("span")
+                    found_span = spans[id(svg)]
+                    count = _parse_count(found_span.get_text(strip=True)) if found_span else None
+                    if count is not None and order > assigned[key]:
+                        assigned[key] = order
+                        counts[key] = count
+                        chosen[key] = found_span
+
+        length = 0
+        has_candidate = False
+        for child in tag.children:
+            if isinstance(child, Tag):
+                child_length, child_has_candidate = walk(child, svgs)
+                length += child_length
+                has_candidate = has_candidate or child_has_candidate
+            elif type(child) in (NavigableString, CData):
+                # get_text と同じく、通常の文字列とCDATAだけを数える（コメント・スクリプトは除く）
+                length += len(child.strip())
+        if entry is not None:
+            entry[1] = length
+            entry[2] = has_candidate
+            has_candidate = has_candidate or length > 10
+        return length, has_candidate
+
+    walk(card, ())
+
+    best = None
+    for entry in divs:
+        if entry[1] > 10 and not entry[2] and (best is None or entry[1] > best[1]):
+            best = entry
+    if nodes is not None:
+        nodes.update(chosen, title=best[0] if best else None)
+    if best is None:
+        return None
+    return best[0].get_text(strip=True), counts["visitors"], counts["likes"]
+
+
+def _get_text_bs4(node):
+    return node.get_text(strip=True)
+
+
+def _card_layout_bs4(card):
+    """カード内の要素を文書順に並べたリスト、要素から位置を返す関数、レイアウトの指紋を返す"""
+    elements = [card]
+    positions = {id(card): 0}
+    tokens = [_layout_token(-1, card.name, card.get("class"), None)]
+    for node in card.descendants:
+        if isinstance(node, Tag):
+            positions[id(node)] = len(elements)
+            tokens.append(_layout_token(positions[id(node.parent)], node.name, node.get("class"), node.get("d")))
+            elements.append(node)
+    return elements, lambda node: positions[id(node)], layout_fingerprint("bs4", tokens)
+
+
+def _iter_world_cards_bs4(soup, layouts=None):
+    """BeautifulSoupのツリーからワールドカードを走査し、カードごとに (ワールドID, タイトル, 来場者数, いいね数) を列挙
+    SVGアイコン（♥と▶）を基準に数値を取得する（クラス名非依存）
+    layouts（LayoutCache）を渡すと、既知のレイアウトのカードは記録した位置の要素だけを読む"""
+    # ワールドカード（a[href^="/w/"]）を全て取得
+    for card in soup.find_all("a", href=_is_world_href):
+        if layouts is not None:
+            scanned = _scan_card_with_layout(card, layouts, _card_layout_bs4, _scan_card_bs4, _get_text_bs4)
+        else:
+            scanned = _scan_card_bs4(card)
+        if scanned is None:
+            continue
+        name, visitors, likes = scanned
+        yield world_id_from_href(card["href"]), name, visitors, likes
+
+
+def _following_span(node):
+    """node の後ろにある最初の兄弟要素 span（selectolax）"""
+    sibling = node.next
+    while sibling is not None:
+        if sibling.tag == "span":
+            return sibling
+        sibling = sibling.next
+    return None
+
+
+def _scan_card_selectolax(card, nodes=None):
+    """selectolaxのカードから _scan_card_bs4 と同じ規則で (タイトル, 来場者数, いいね数) を返す（タイトルが無い場合は None）"""
+    # カード内のdivのテキストのうち11文字以上のものをタイトルの候補とし、
+    # 他の候補を内側に含まないもので最も長いものをタイトルとして採用
+    candidates = []
+    for div in card.css("div"):
+        text = div.text(deep=True, separator="", strip=True)
+        if len(text) > 10:
+            candidates.append((div, text))
+    candidate_ids = {div.mem_id for div, _ in candidates}
+    enclosing_ids = set()
+    for div, _ in candidates:
+        parent = div.parent
+        while parent is not None and parent.mem_id not in enclosing_ids:
+            if parent.mem_id in candidate_ids:
+                enclosing_ids.add(parent.mem_id)
+            parent = parent.parent
+    name = None
+    title_div = None
+    for div, text in candidates:
+        if div.mem_id not in enclosing_ids and (name is None or len(text) > len(name)):
+            name = text
+            title_div = div
+    
+    counts = {"likes": 0, "visitors": 0}
+    chosen = {"likes": None, "visitors": None}
+    if name:
+        for svg in card.css("svg"):
+            for path in svg.css("path"):
+                d_attr = path.attributes.get("d") or ""
+                if not (d_attr.startswith("M60.004") or d_attr.startswith("M38.678")):
+                    continue
+                # svgの後に来る最初のspanの数値（♥: いいね数、▶: 来場者数）
+                found_span = _following_span(svg)
+                count = _parse_count(found_span.text(deep=True, separator="", strip=True)) if found_span else None
+                if count is None:
+                    continue
+                key = "likes" if d_attr.startswith("M60.004") else "visitors"
+                counts[key] = count
+                chosen[key] = found_span
+    if nodes is not None:
+        nodes.update(chosen, title=title_div)
+    if not name:
+        return None
+    return name, counts["visitors"], counts["likes"]
+
+
+def _get_text_selectolax(node):
+    return node.text(deep=True, separator="", strip=True)
+
+
+def _card_layout_selectolax(card):
+    """_card_layout_bs4 と同じ形式で、selectolaxのカードのレイアウトを求める（テキスト・コメントのノードは数えない）"""
+    elements = []
+    positions = {}
+    tokens = []
+    for node in card.traverse():
+        if node.tag.startswith("-"):
+            continue
+        parent_position = positions[node.parent.mem_id] if elements else -1
+        positions[node.mem_id] = len(elements)
+        attributes = node.attributes
+        tokens.append(_layout_token(parent_position, node.tag, attributes.get("class"), attributes.get("d")))
+        elements.append(node)
+    return elements, lambda node: positions[node.mem_id], layout_fingerprint("selectolax", tokens)
+
+
+def _iter_world_cards_selectolax(tree, layouts=None):
+    """selectolaxのツリーから _iter_world_cards_bs4 と同じ規則で (ワールドID, タイトル, 来場者数, いいね数) を列挙"""
+    for card in tree.css('a[href^="/w/"]'):
+        if layouts is not None:
+            scanned = _scan_card_with_layout(
+                card, layouts, _card_layout_selectolax, _scan_card_selectolax, _get_text_selectolax
+            )
+        else:
+            scanned = _scan_card_selectolax(card)
+        if scanned is None:
+            continue
+        name, visitors, likes = scanned
+        yield world_id_from_href(card.attributes.get("href")), name, visitors, likes
+
+
+# ストリーム解析で一度に読み込む文字数
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# 終了タグを持たない要素と、テキストが get_text の対象にならない要素（BeautifulSoup の html.parser と同じ）
+VOID_ELEMENTS = {
+    "area", "base", "basefont", "bgsound", "br", "col", "command", "embed", "frame", "hr", "image", "img", "input",
+    "isindex", "keygen", "link", "menuitem", "meta", "nextid", "param", "source", "spacer", "track", "wbr",
 }
+STRING_CONTAINER_ELEMENTS = {"rt", "rp", "style", "script", "template"}
 
 
-def extract_zone_data_from_html(html_path):
-    """HTMLファイルから各ゾーンの来場者数といいね数を抽出
-    SVGアイコン（♥と▶）を基準に数値を取得する（クラス名非依存）"""
-    try:
-        with open(html_path, "r", encoding="utf-8") as f:
-            html_content = f.read()
-        
-        soup = BeautifulSoup(html_content, "html.parser")
-        
-        # データを格納する辞書
-        zone_data = {}
-        
-        # ワールドカード（a[href^="/w/"]）を全て取得
-        world_cards = soup.find_all("a", href=lambda x: x and x.startswith("/w/"))
-        
-        for card in world_cards:
-            # カード内のタイトル要素を探す（最も長いテキストまたは見出し相当のノード）
-            name = None
-            title_candidates = []
-            
-            # div内のテキストを候補として収集
-            for div in card.find_all("div", recursive=True):
-                text = div.get_text(strip=True)
-                if text and len(text) > 10:  # 短すぎるテキストは除外
-                    title_candidates.append((len(text), text))
-            
-            if title_candidates:
-                # 最も長いテキストをタイトルとして採用
-                title_candidates.sort(reverse=True, key=lambda x: x[0])
-                name = title_candidates[0][1]
-            
-            if not name:
-                continue
-            
-            # ゾーン名から短い名前を抽出（例：「02.IPTeCAバーチャル・イノベーション展示館：メインロビー」→「メインロビー」）
-            matched_zone = None
-            for short_name in ZONE_SHORT_NAMES:
-                if short_name in name:
-                    matched_zone = short_name
-                    break
-            
-            if not matched_zone:
-                continue
-            
-            # カード内の全てのsvgを走査
-            likes = 0
-            visitors = 0
-            
-            svgs = card.find_all("svg", recursive=True)
-            for svg in svgs:
-                # svg内のpath要素を探す
-                paths = svg.find_all("path", recursive=True)
-                for path in paths:
-                    d_attr = path.get("d", "")
-                    
-                    # Heart（♥）判定: dが"M60.004"で始まる
-                    if d_attr.startswith("M60.004"):
-                        # svgの親要素内で、svgの次のspanを探す
-                        parent = svg.parent
-                        if parent:
-                            # 親要素内でsvgの後に来る最初のspanを探す
-                            found_span = svg.find_next_sibling("span")
-                            
-                            # 見つからない場合、親要素内の全てのspanを探す
-                            if not found_span:
-                                all_spans = parent.find_all("span", recursive=False)
-                                # svgの後に来る最初のspanを探す
-                                svg_index = None
-                                for i, child in enumerate(parent.children):
-                                    if child == svg:
-                                        svg_index = i
-                                        break
-                                
-                                if svg_index is not None:
-                                    for i, child in enumerate(parent.children):
-                                        if i > svg_index and child.name == "span":
-                                            found_span = child
-                                            break
-                            
-                            if found_span:
-                                likes_text = found_span.get_text(strip=True)
-                                likes_match = re.search(r'[\d,]+', likes_text.replace(',', ''))
-                                if likes_match:
-                                    likes = int(likes_match.group().replace(',', ''))
-                    
-                    # Play（▶）判定: dが"M38.678"で始まる
-                    elif d_attr.startswith("M38.678"):
-                        # svgの親要素内で、svgの次のspanを探す
-                        parent = svg.parent
-                        if parent:
-                            # 親要素内でsvgの後に来る最初のspanを探す
-                            found_span = svg.find_next_sibling("span")
-                            
-                            # 見つからない場合、親要素内の全てのspanを探す
-                            if not found_span:
-                                all_spans = parent.find_all("span", recursive=False)
-                                # svgの後に来る最初のspanを探す
-                                svg_index = None
-                                for i, child in enumerate(parent.children):
-                                    if child == svg:
-                                        svg_index = i
-                                        break
-                                
-                                if svg_index is not None:
-                                    for i, child in enumerate(parent.children):
-                                        if i > svg_index and child.name == "span":
-                                            found_span = child
-                                            break
-                            
-                            if found_span:
-                                visitors_text = found_span.get_text(strip=True)
-                                visitors_match = re.search(r'[\d,]+', visitors_text.replace(',', ''))
-                                if visitors_match:
-                                    visitors = int(visitors_match.group().replace(',', ''))
-            
-            # データが取得できた場合のみ追加
-            if matched_zone:
-                zone_data[matched_zone] = {
-                    "visitors": visitors,
-                    "likes": likes
+class _WorldCardStreamParser(HTMLParser):
+    """html.parser のイベントだけでワールドカードを処理し、DOMを作らずに (ワールドID, タイトル, 来場者数, いいね数) を集める
+    要素の開閉は BeautifulSoup（html.parser）と同じ規則で扱い、_iter_world_cards_bs4 と同じ結果になる
+    保持するのは開いている要素の名前と、処理中のカード1枚分のテキストだけ"""
+
+    def __init__(self):
+        super().__init__()
+        self.stack = []  # 開いている要素のフレーム（カード外の要素は名前だけを使う）
+        self.closed_void = []  # 開始タグで閉じた要素（後に来る冗長な終了タグを無視する）
+        self.buffer = []  # 次のタグまでのテキスト
+        self.container_depth = 0  # script・style などの中にいる深さ
+        self.card = None  # 処理中のカードの状態
+        self.records = []  # 完成した (ワールドID, タイトル, 来場者数, いいね数)
+
+    def _flush_text(self):
+        """溜まったテキストを1つの文字列として確定する（get_text(strip=True) と同じく前後の空白を除く）"""
+        if not self.buffer:
+            return
+        text = "".join(self.buffer).strip()
+        self.buffer = []
+        if text and self.card is not None and self.container_depth == 0:
+            self.card["texts"].append(text)
+            self.card["length"] += len(text)
+
+    def _start(self, tag, attrs):
+        card = self.card
+        frame = {"name": tag}
+        if card is None:
+            href = dict(attrs).get("href") if tag == "a" else None
+            if _is_world_href(href):
+                card = self.card = {
+                    "world_id": world_id_from_href(href), "texts": [], "length": 0, "order": 0, "best": None, "candidates": 0,
+                    "counts": {"likes": 0, "visitors": 0}, "assigned": {"likes": -1, "visitors": -1},
                 }
-                # デバッグ用：片方しか取れない場合は警告
-                if likes == 0 and visitors > 0:
-                    print(f"警告: {matched_zone} のいいね数が取得できませんでした（訪問者数: {visitors}）")
-                elif visitors == 0 and likes > 0:
-                    print(f"警告: {matched_zone} の訪問者数が取得できませんでした（いいね数: {likes}）")
-        
-        return zone_data
+                frame["card"] = True
+        if card is not None:
+            frame["text_index"] = len(card["texts"])
+            frame["text_length"] = card["length"]
+            frame["order"] = card["order"]
+            frame["candidates"] = card["candidates"]
+            card["order"] += 1
+            if tag == "svg":
+                frame["keys"] = []
+            elif tag == "path":
+                d_attr = dict(attrs).get("d") or ""
+                # Heart（♥）: dが"M60.004"で始まる / Play（▶）: dが"M38.678"で始まる
+                key = "likes" if d_attr.startswith("M60.004") else "visitors" if d_attr.startswith("M38.678") else None
+                if key:
+                    # 囲んでいるすべてのsvgの対象にする（find_all("path") と同じ）
+                    for open_frame in self.stack:
+                        if "keys" in open_frame:
+                            open_frame["keys"].append(key)
+            elif tag == "span" and self.stack and self.stack[-1].get("waiters"):
+                # 直前の兄弟svgが待っている「後に来る最初のspan」
+                frame["resolves"] = self.stack[-1]["waiters"]
+                self.stack[-1]["waiters"] = []
+        if tag in STRING_CONTAINER_ELEMENTS:
+            self.container_depth += 1
+        self.stack.append(frame)
+
+    def _close(self, frame):
+        if frame["name"] in STRING_CONTAINER_ELEMENTS:
+            self.container_depth -= 1
+        card = self.card
+        if card is None or "text_index" not in frame:
+            return
+        length = card["length"] - frame["text_length"]
+        if frame["name"] == "div" and length > 10:
+            best = card["best"]
+            # 他の候補（11文字以上のdiv）を内側に含まないdivのうち、最も長いもの（同じ長さなら先に開いたもの）をタイトルとする
+            leaf = card["candidates"] == frame["candidates"]
+            card["candidates"] += 1
+            if leaf and (best is None or length > best[0] or (length == best[0] and frame["order"] < best[1])):
+                card["best"] = (length, frame["order"], frame["text_index"], len(card["texts"]))
+        elif frame.get("keys") and self.stack:
+            self.stack[-1].setdefault("waiters", []).append((frame["order"], frame["keys"]))
+        elif frame.get("resolves"):
+            count = _parse_count("".join(card["texts"][frame["text_index"]:]))
+            if count is not None:
+                for svg_order, keys in frame["resolves"]:
+                    for key in keys:
+                        # 文書順で後のsvgの結果を優先する
+                        if svg_order > card["assigned"][key]:
+                            card["assigned"][key] = svg_order
+                            card["counts"][key] = count
+        if frame.get("card"):
+            best = card["best"]
+            self.card = None
+            if best is None:
+                return
+            name = "".join(card["texts"][best[2]:best[3]])
+            self.records.append((card["world_id"], name, card["counts"]["visitors"], card["counts"]["likes"]))
+
+    def _end(self, tag):
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i]["name"] == tag:
+                # 対応する開始タグまでの要素をまとめて閉じる（閉じ忘れの要素も含む）
+                while len(self.stack) > i:
+                    self._close(self.stack.pop())
+                return
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag in VOID_ELEMENTS:
+            self.closed_void.append(tag)
+            return
+        self._start(tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush_text()
+        self._start(tag, attrs)
+        self._end(tag)
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if tag in self.closed_void:
+            self.closed_void.remove(tag)
+            return
+        self._end(tag)
+
+    def handle_data(self, data):
+        self.buffer.append(data)
+
+    def handle_comment(self, data):
+        self._flush_text()
+
+    def handle_decl(self, decl):
+        self._flush_text()
+
+    def handle_pi(self, data):
+        self._flush_text()
+
+    def unknown_decl(self, data):
+        self._flush_text()
+        if data.upper().startswith("CDATA["):
+            self.buffer.append(data[len("CDATA["):])
+            self._flush_text()
+
+    def close(self):
+        super().close()
+        self._flush_text()
+        while self.stack:
+            self._close(self.stack.pop())
+
+    def pop_records(self):
+        """これまでに完成したレコードを取り出す"""
+        records, self.records = self.records, []
+        return records
+
+
+def iter_world_cards_from_stream(stream, chunk_size=STREAM_CHUNK_SIZE):
+    """テキストストリーム（open_html で開いた圧縮HTMLなど）を少しずつ読みながら解析し、
+    カードが閉じるたびに (ワールドID, タイトル, 来場者数, いいね数) を列挙する"""
+    parser = _WorldCardStreamParser()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        parser.feed(chunk)
+        yield from parser.pop_records()
+    parser.close()
+    yield from parser.pop_records()
+
+
+def iter_world_cards(html_content, backend=DEFAULT_PARSER_BACKEND, layouts=None):
+    """HTML文字列を指定のバックエンドで解析し、ワールドカードごとに (ワールドID, タイトル, 来場者数, いいね数) を列挙
+    ゾーンに該当しないワールドも含め、ページ上のすべてのワールドカードを対象にする
+    "+strainer" はワールドカード（a[href^="/w/"]）以外を木に含めずに解析する
+    "stream" は木を作らずに html.parser のイベントだけで解析する（layouts は使わない）
+    layouts（LayoutCache）を渡すと、既知のレイアウトのカードは記録した位置の要素だけを読む"""
+    if backend == "stream":
+        return iter_world_cards_from_stream(io.StringIO(html_content))
+    if backend == "selectolax":
+        try:
+            from selectolax.lexbor import LexborHTMLParser
+        except ImportError:
+            raise ImportError("selectolax バックエンドには selectolax が必要です: pip install selectolax")
+        return _iter_world_cards_selectolax(LexborHTMLParser(html_content), layouts)
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"解析バックエンドは {PARSER_BACKENDS} のいずれかを指定してください: {backend}")
+    features, _, option = backend.partition("+")
+    parse_only = SoupStrainer("a", href=_is_world_href) if option == "strainer" else None
+    return _iter_world_cards_bs4(BeautifulSoup(html_content, features, parse_only=parse_only), layouts)
+
+
+def _add_world(worlds, world_id, title, visitors, likes):
+    """抽出結果の辞書にワールドを追加する（見つからなかった数値 None は0とする）
+    同じワールドが複数回現れた場合は後のものを優先し、辞書の順序も後の位置にする（ゾーンの対応付けで後のカードを優先するため）"""
+    worlds.pop(world_id, None)
+    worlds[world_id] = {
+        "title": title,
+        "visitors": visitors if visitors is not None else 0,
+        "likes": likes if likes is not None else 0
+    }
+
+
+def zone_data_from_worlds(worlds):
+    """ワールドごとの抽出結果から、ゾーンごとの来場者数といいね数を求める（ワールド名に短い名前を含むものをそのゾーンとする）"""
+    zone_data = {}
+    for world in worlds.values():
+        # ゾーン名から短い名前を抽出（例：「02.IPTeCAバーチャル・イノベーション展示館：メインロビー」→「メインロビー」）
+        matched_zone = _match_zone_name(world["title"])
+        if matched_zone:
+            zone_data[matched_zone] = {
+                "visitors": world["visitors"],
+                "likes": world["likes"]
+            }
+    return zone_data
+
+
+def _extract_worlds_from_html(html_path, backend, layouts=None):
+    """extract_worlds_from_html の本体（失敗時は例外をそのまま送出する）
+    "stream" バックエンドではファイル全体を読み込まず、展開しながら少しずつ解析する"""
+    backend = backend or DEFAULT_PARSER_BACKEND
+    if backend == "stream":
+        with open_html(html_path) as f:
+            cards = list(iter_world_cards_from_stream(f))
+    else:
+        if layouts is not None:
+            layouts.source = os.path.basename(html_path)
+        cards = iter_world_cards(read_html(html_path), backend, layouts)
+    
+    # データを格納する辞書（ワールドID → タイトル・来場者数・いいね数）
+    worlds = {}
+    
+    for world_id, title, visitors, likes in cards:
+        _add_world(worlds, world_id, title, visitors, likes)
+        # デバッグ用：片方しか取れない場合は警告
+        if likes == 0 and visitors > 0:
+            print(f"警告: {title} のいいね数が取得できませんでした（訪問者数: {visitors}）")
+        elif visitors == 0 and likes > 0:
+            print(f"警告: {title} の訪問者数が取得できませんでした（いいね数: {likes}）")
+    
+    return worlds
+
+
+def extract_worlds_from_html(html_path, backend=None):
+    """HTMLファイル（.html / .html.gz / .html.zst）からページ上のすべてのワールドの来場者数といいね数を抽出
+    SVGアイコン（♥と▶）を基準に数値を取得する（クラス名非依存）
+    backend を省略した場合は DEFAULT_PARSER_BACKEND で解析する"""
+    try:
+        return _extract_worlds_from_html(html_path, backend)
     except Exception as e:
         print(f"警告: HTMLファイル {html_path} からのデータ抽出に失敗しました: {e}")
         import traceback
@@ -224,64 +623,370 @@ def extract_zone_data_from_html(html_path):
         return {}
 
 
-def get_html_files(html_dir, screenshots_dir="screenshots"):
-    """htmlフォルダ内のHTMLファイルを取得し、日時情報とゾーンデータを抽出"""
-    pattern = os.path.join(html_dir, "*.html")
-    files = glob.glob(pattern)
+def extract_zone_data_from_html(html_path, backend=None):
+    """HTMLファイル（.html / .html.gz / .html.zst）から各ゾーンの来場者数といいね数を抽出"""
+    return zone_data_from_worlds(extract_worlds_from_html(html_path, backend))
+
+
+def _extract_html_job(job):
+    """1ファイル分の抽出処理（プロセスプールのワーカーでも実行する）
+    1ファイルの失敗で全体が止まらないよう、例外は (空の結果, エラー内容, レイアウトキャッシュの差分) として返す
+    layout_entries が None でなければ、その記録でレイアウトキャッシュを使う（差分は親プロセスで取り込む）"""
+    html_path, backend, layout_entries = job
+    layouts = LayoutCache(entries=layout_entries) if layout_entries is not None else None
+    try:
+        worlds, error = _extract_worlds_from_html(html_path, backend, layouts), None
+    except Exception as e:
+        worlds, error = {}, f"{type(e).__name__}: {e}"
+    return worlds, error, layouts.delta() if layouts is not None else None
+
+
+def extract_html_files(html_paths, backend=None, workers=1, chunksize=DEFAULT_CHUNKSIZE, layout_cache=None):
+    """複数のHTMLファイルから抽出し、html_paths と同じ順序で (抽出結果, エラー内容) のリストを返す
+    workers が2以上でファイル数が chunksize を超える場合は、プロセスプールで並列に解析する
+    ワーカープロセスが異常終了した場合は、残りのファイルをこのプロセスで順に解析する
+    layout_cache（LayoutCache）を渡すと、既知のレイアウトのカードは記録した位置だけを読み、新しいレイアウトを記録する
+    （並列解析では開始時点の記録をワーカーに渡すため、実行中に見つかったレイアウトは他のワーカーでは使われない）"""
+    layout_entries = layout_cache.entries if layout_cache is not None else None
+    jobs = [(path, backend or DEFAULT_PARSER_BACKEND, layout_entries) for path in html_paths]
+    results = []
+    if workers > 1 and len(jobs) > chunksize:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for result in executor.map(_extract_html_job, jobs, chunksize=chunksize):
+                    results.append(result)
+        except BrokenProcessPool as e:
+            print(f"警告: 解析用のワーカープロセスが異常終了しました。残り {len(jobs) - len(results)} 件を順に解析します: {e}")
+    for job in jobs[len(results):]:
+        results.append(_extract_html_job(job))
+    
+    extracted = []
+    for worlds, error, delta in results:
+        if delta is not None:
+            layout_cache.merge(delta)
+        extracted.append((worlds, error))
+    return extracted
+
+
+# 検索APIのレスポンスの形: 本文がワールドの一覧か、本文の最上位のこれらのキーのいずれかにワールドの一覧がある
+API_WORLD_LIST_KEYS = ["worlds", "items", "results"]
+# APIレスポンス（JSON）のワールドの項目から値を読み取る際のキー候補（先に見つかったものを使用）
+API_ID_KEYS = ["id", "worldId"]
+API_NAME_KEYS = ["name", "title", "worldName"]
+API_VISITORS_KEYS = ["playCount", "visitCount", "visitorCount", "viewCount"]
+API_LIKES_KEYS = ["likeCount", "favoriteCount", "heartCount"]
+
+
+def _find_api_value(node, keys, value_type):
+    """辞書nodeからkeysの順に探し、最初に見つかったvalue_type型の値を返す"""
+    for key in keys:
+        value = node.get(key)
+        if isinstance(value, value_type) and not isinstance(value, bool):
+            return value
+    return None
+
+
+def _api_world_list(body):
+    """検索APIのレスポンス本文からワールドの一覧を取り出す（検索APIの形でない場合は空）"""
+    if isinstance(body, list):
+        return body
+    if isinstance(body, dict):
+        for key in API_WORLD_LIST_KEYS:
+            if isinstance(body.get(key), list):
+                return body[key]
+    return []
+
+
+def _iter_api_worlds(body):
+    """検索APIのレスポンス本文のワールドの一覧を (ワールドID, 名前, 来場者数, いいね数) で列挙
+    ID・名前・来場者数・いいね数がすべてそろった項目だけをワールドとする（入れ子のオブジェクトや他のAPIの項目は読まない）"""
+    for item in _api_world_list(body):
+        if not isinstance(item, dict):
+            continue
+        world_id = _find_api_value(item, API_ID_KEYS, (str, int))
+        name = _find_api_value(item, API_NAME_KEYS, str)
+        visitors = _find_api_value(item, API_VISITORS_KEYS, (int, float))
+        likes = _find_api_value(item, API_LIKES_KEYS, (int, float))
+        if world_id is None or name is None or visitors is None or likes is None:
+            continue
+        yield str(world_id), name, int(visitors), int(likes)
+
+
+def extract_worlds_from_json(json_path):
+    """fetch_html.py が保存したAPIレスポンス（JSON）からすべてのワールドの来場者数といいね数を抽出
+    DOM解析は行わず、レスポンス内のワールド情報を直接読み取る"""
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            capture_data = json.load(f)
+        
+        worlds = {}
+        for response in capture_data.get("responses", []):
+            # 同じワールドが複数のレスポンスに含まれる場合は後のレスポンスを優先
+            for world_id, name, visitors, likes in _iter_api_worlds(response.get("body")):
+                _add_world(worlds, world_id, name, visitors, likes)
+        
+        return worlds
+    except Exception as e:
+        print(f"警告: JSONファイル {json_path} からのデータ抽出に失敗しました: {e}")
+        return {}
+
+
+def extract_zone_data_from_json(json_path):
+    """fetch_html.py が保存したAPIレスポンス（JSON）から各ゾーンの来場者数といいね数を抽出"""
+    return zone_data_from_worlds(extract_worlds_from_json(json_path))
+
+
+def missing_zones(worlds):
+    """抽出結果に含まれないゾーンの短い名前のリスト"""
+    zone_data = zone_data_from_worlds(worlds)
+    return [zone_name for zone_name in ZONE_SHORT_NAMES if zone_name not in zone_data]
+
+
+def merge_worlds(html_worlds, api_worlds):
+    """HTMLの抽出結果にAPIレスポンスの抽出結果を重ねる（同じワールドはAPIレスポンスの値を使う）"""
+    worlds = dict(html_worlds)
+    for world_id, world in api_worlds.items():
+        _add_world(worlds, world_id, world["title"], world["visitors"], world["likes"])
+    return worlds
+
+
+def worlds_from_record(record):
+    """取得時の記録（world_records の worlds）を (数値がそろったワールド, 数値が欠けたワールド) の抽出結果に分ける
+    数値が欠けたワールド（visitors・likes が None）は、欠けた数値を0として入れる"""
+    complete = {}
+    partial = {}
+    for world in record:
+        worlds = partial if world["visitors"] is None or world["likes"] is None else complete
+        _add_world(worlds, world["world_id"], world["title"], world["visitors"], world["likes"])
+    return complete, partial
+
+
+# 抽出処理のバージョン（抽出結果が変わる変更をした場合に上げると、抽出インデックスが作り直される）
+EXTRACTOR_VERSION = 3
+
+# スナップショットのファイル名（IPTeCA_YYYYMMDD_HHMMSS_JST.<拡張子>）
+SNAPSHOT_FILENAME_PATTERN = re.compile(r"^IPTeCA_(\d{8}_\d{6})_JST\.")
+
+
+def get_html_files(
+    html_dir, screenshots_dir="screenshots", index_path=None, workers=1, chunksize=DEFAULT_CHUNKSIZE, records_path=None,
+    layout_cache_path=None, since=None, until=None, backend=None, digests=None
+):
+    """htmlフォルダ内のHTMLファイルを取得し、日時情報とゾーンデータを抽出
+    各行の "worlds" には、ゾーンに該当しないものも含めたページ上のすべてのワールド（ワールドIDごと）を入れる
+    圧縮済みのHTML（.html.gz / .html.zst）も同じように扱い、ファイル名は .html として記録する
+    index_path を指定すると抽出結果をインデックスに保存し、次回以降は新しいファイル・変更されたファイルだけを解析する
+    workers が2以上の場合、解析が必要なHTMLをプロセスプールで並列に解析する（結果の順序は workers によらず同じ）
+    APIレスポンス（JSON）があるスナップショットはDOM解析を行わずにそこから読み、設定されたゾーンが欠けている場合はHTMLの抽出結果と重ねる
+    records_path の記録（取得時にブラウザ内で抽出した数値）があるスナップショットは、APIレスポンスやHTMLを解析せずに記録を使う
+    （記録に数値が欠けたワールドや設定されたゾーンが無い場合だけ、APIレスポンスやHTMLの抽出結果で補う）
+    layout_cache_path を指定すると、カードのレイアウトごとに数値の位置を記録し、同じレイアウトのカードは全体を探索せずに読む
+    since / until（JSTのdatetime、両端を含む）を指定すると、その範囲の取得時刻のスナップショットだけを対象にする（範囲外は解析しない）
+    backend を指定すると DEFAULT_PARSER_BACKEND の代わりにその解析バックエンドを使う（ワーカープロセスにも渡す）
+    digests（SnapshotDigests）を渡すと、抽出結果が前回データストアに書き込んだものと同じスナップショットは行を作らずに除き、
+    新しいスナップショットと値が変わったスナップショットの行だけを返す（記録はデータストアへの書き込み後に digests.save() で更新する）"""
+    index = ExtractionIndex(index_path, EXTRACTOR_VERSION, base_dir=html_dir)
+    layout_cache = LayoutCache(layout_cache_path) if layout_cache_path else None
+    world_records = load_world_records(records_path)
+    from_records = 0
+    record_fallbacks = {}  # 数値やゾーンが欠けた記録 → (HTMLなどの抽出元, 数値がそろったワールド, 数値が欠けたワールド)
+    merged = 0
+    # 同じ取得時刻のファイルが圧縮方式違いで複数ある場合（移行途中など）は1つだけ使う
+    html_files = {}
+    for ext in HTML_EXTENSIONS:
+        for p in glob.glob(os.path.join(html_dir, f"*{ext}")):
+            html_files.setdefault(strip_html_extension(p), p)
+    files = list(html_files.values())
+    
+    # APIレスポンス（JSON）が保存されている場合はDOM解析の代わりに使用する
+    json_files = {os.path.splitext(p)[0]: p for p in glob.glob(os.path.join(html_dir, "*.json"))}
+    # JSONのみ保存されたスナップショットも対象にする
+    files += [p for stem, p in json_files.items() if stem not in html_files]
+    # 前回から変化が無かった取得のマーカーも対象にする（参照先のデータを使用）
+    for ext in HTML_EXTENSIONS:
+        files += glob.glob(os.path.join(html_dir, f"*{ext}{UNCHANGED_SUFFIX}"))
     
-    data = []
     jst = ZoneInfo("Asia/Tokyo")
+    # 抽出結果（同じ実ファイルを参照するマーカーが多数あるため、1ファイル1回だけ解析する）
+    extracted = {}
+    # 解析が必要なHTML（インデックスに無いもの）
+    pending = []
+    # ゾーンが欠けていたためHTMLで補うAPIレスポンスの抽出結果（HTMLの解析後に重ねる）
+    api_worlds = {}
+    snapshots = []
+    
+    def extract_source(source_path):
+        """APIレスポンス（JSON）があればそこから、無ければHTMLからワールドごとのデータを抽出する
+        APIレスポンスに無いゾーンがある場合は、HTMLの抽出結果と重ねる（インデックスに無いHTMLは pending で後から解析する）"""
+        nonlocal merged
+        worlds = {}
+        if is_html_path(source_path):
+            json_path = json_files.get(strip_html_extension(source_path))
+        else:
+            json_path = json_files.get(os.path.splitext(source_path)[0])
+        if json_path:
+            worlds = index.get_or_extract(json_path, extract_worlds_from_json)
+        if is_html_path(source_path) and (not worlds or missing_zones(worlds)):
+            html_worlds = index.lookup(source_path)
+            if html_worlds is None:
+                pending.append(source_path)
+                if worlds:
+                    api_worlds[source_path] = worlds
+            elif worlds:
+                worlds = merge_worlds(html_worlds, worlds)
+                merged += 1
+            else:
+                worlds = html_worlds
+        extracted[source_path] = worlds
     
     for file_path in files:
         filename = os.path.basename(file_path)
-        # IPTeCA_YYYYMMDD_HHMMSS_JST.html 形式から日時を抽出
+        # IPTeCA_YYYYMMDD_HHMMSS_JST.html（または .json）形式から日時を抽出
         try:
+            # マーカーの場合は取得時刻を表すファイル名と、参照先の実ファイルを使う
+            source_path = file_path
+            if file_path.endswith(UNCHANGED_SUFFIX):
+                filename = filename[:-len(UNCHANGED_SUFFIX)]
+                source_path = resolve_snapshot(file_path)
+            if is_html_path(filename):
+                filename = strip_html_extension(filename) + ".html"
+            
             # ファイル名から日時部分を抽出
-            if filename.startswith("IPTeCA_") and filename.endswith("_JST.html"):
-                timestamp_str = filename.replace("IPTeCA_", "").replace("_JST.html", "")
+            match = SNAPSHOT_FILENAME_PATTERN.match(filename)
+            if match:
+                timestamp_str = match.group(1)
                 # YYYYMMDD_HHMMSS 形式をパース
                 dt = datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
                 # JSTとして設定
                 dt = dt.replace(tzinfo=jst)
+                if (since is not None and dt < since) or (until is not None and dt > until):
+                    continue
                 
                 # ファイルの作成日時も取得
                 mtime = os.path.getmtime(file_path)
                 file_dt = datetime.fromtimestamp(mtime, tz=jst)
                 
-                # HTMLからゾーンデータを抽出
-                zone_data = extract_zone_data_from_html(file_path)
-                
-                file_data = {
-                    "filename": filename,
-                    "date": dt,
-                    "file_date": file_dt,
-                    "file_path": file_path
-                }
-                
-                # 各ゾーンのデータを追加
-                for zone_name in ZONE_SHORT_NAMES:
-                    file_data[f"{zone_name}_visitors"] = zone_data.get(zone_name, {}).get("visitors", 0)
-                    file_data[f"{zone_name}_likes"] = zone_data.get(zone_name, {}).get("likes", 0)
+                # 取得時の記録があればそれを使う（変化なしマーカーも取得時刻ごとに記録がある）
+                # 記録に数値が欠けたワールド（null）や設定されたゾーンが無い場合は、JSONと同じくHTMLなどの抽出結果と重ねる
+                record = world_records.get(filename.split(".", 1)[0])
+                if record:
+                    # 記録は取得時刻ごとのため、同じ実ファイルを参照する他のスナップショットとは別に保持する
+                    record_key = (file_path, "record")
+                    complete, partial = worlds_from_record(record)
+                    if partial or missing_zones(complete):
+                        if source_path not in extracted:
+                            extract_source(source_path)
+                        record_fallbacks[record_key] = (source_path, complete, partial)
+                    else:
+                        extracted[record_key] = complete
+                    source_path = record_key
+                    from_records += 1
+                elif source_path not in extracted:
+                    extract_source(source_path)
                 
-                data.append(file_data)
+                snapshots.append((filename, dt, file_dt, file_path, source_path))
         except Exception as e:
             print(f"警告: ファイル {filename} の解析に失敗しました: {e}")
             continue
     
+    # インデックスに無いHTMLを解析する（失敗したファイルは空の結果とし、インデックスには記録しない）
+    failed = 0
+    results = extract_html_files(
+        pending, backend=backend, workers=workers, chunksize=chunksize, layout_cache=layout_cache
+    )
+    for source_path, (worlds, error) in zip(pending, results):
+        if error:
+            print(f"警告: HTMLファイル {source_path} からのデータ抽出に失敗しました: {error}")
+            failed += 1
+        else:
+            index.store(source_path, worlds)
+        if source_path in api_worlds:
+            worlds = merge_worlds(worlds, api_worlds[source_path])
+            merged += 1
+        extracted[source_path] = worlds
+    
+    # 数値やゾーンが欠けた記録は、欠けたものをHTMLなどの抽出結果で補う（記録にある数値を優先する）
+    for record_key, (source_path, complete, partial) in record_fallbacks.items():
+        extracted[record_key] = merge_worlds(merge_worlds(partial, extracted[source_path]), complete)
+    
+    data = []
+    # 同じ実ファイルを参照するマーカーが多数あるため、ダイジェストは1ファイル1回だけ求める
+    source_digests = {}
+    for filename, dt, file_dt, file_path, source_path in snapshots:
+        worlds = extracted[source_path]
+        if digests is not None:
+            if source_path not in source_digests:
+                source_digests[source_path] = digests.digest(worlds)
+            if not digests.changed(filename, source_digests[source_path]):
+                continue
+        zone_data = zone_data_from_worlds(worlds)
+        
+        file_data = {
+            "filename": filename,
+            "date": dt,
+            "file_date": file_dt,
+            "file_path": file_path,
+            # ページ上のすべてのワールド（ワールドID → タイトル・来場者数・いいね数、world_store に保存する）
+            "worlds": worlds
+        }
+        
+        # 各ゾーンのデータを追加
+        for zone_name in ZONE_SHORT_NAMES:
+            file_data[f"{zone_name}_visitors"] = zone_data.get(zone_name, {}).get("visitors", 0)
+            file_data[f"{zone_name}_likes"] = zone_data.get(zone_name, {}).get("likes", 0)
+        
+        data.append(file_data)
+    
+    if failed:
+        print(f"警告: {failed} 件のHTMLファイルからデータを抽出できませんでした。")
+    if from_records:
+        print(f"取得時の記録を使用: {from_records} 件（{records_path}）")
+    if record_fallbacks:
+        print(f"記録に欠けた数値・ゾーンをHTMLなどの抽出結果で補いました: {len(record_fallbacks)} 件")
+    if merged:
+        print(f"APIレスポンスに無いゾーンをHTMLの抽出結果で補いました: {merged} 件")
+    if digests is not None and digests.unchanged:
+        print(f"前回から抽出結果が変わらないスナップショット: {digests.unchanged} 件（データストアに渡しません）")
+    if index_path:
+        index.save()
+        print(f"抽出インデックス: 再利用 {index.hits} 件、新規解析 {index.misses} 件（{index_path}）")
+    if layout_cache is not None and pending:
+        layout_cache.report()
+        layout_cache.save()
+    
     return data
 
 
+def graph_frame(data):
+    """グラフ作成で共有するDataFrameを作る（各グラフは同じものを受け取り、作り直さない）
+    data は typed_frame の結果か get_html_files・load_from_csv の行のリスト（graph_frame の結果はそのまま返す）
+    取得日時（JST）順の DatetimeIndex（date）と、日付（date_only）・時（hour）・ゾーンデータ（int32）の列を持つ"""
+    if isinstance(data, pd.DataFrame) and isinstance(data.index, pd.DatetimeIndex) and "hour" in data.columns:
+        return data
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    df = df.sort_values("date", kind="stable")
+    dates = pd.DatetimeIndex(df["date"], name="date")
+    columns = {
+        # 日付はタイムゾーンを外したその日の0時（日別の集計とグラフの横軸に使う）
+        "date_only": dates.tz_localize(None).normalize(),
+        "hour": dates.hour.astype("int8"),
+    }
+    for col in df.columns:
+        if isinstance(col, str) and col.endswith(("_visitors", "_likes")):
+            columns[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype("int32").to_numpy()
+    return pd.DataFrame(columns, index=dates)
+
+
 def create_timeline_graph(data, output_dir):
     """HTML取得のタイムライングラフを作成"""
-    if not data:
+    if data is None or len(data) == 0:
         print("グラフを作成するデータがありません。")
         return None
     
-    df = pd.DataFrame(data)
-    df = df.sort_values("date")
+    df = graph_frame(data)
     
     plt.figure(figsize=(12, 6))
-    plt.plot(df["date"], range(len(df)), marker="o", linestyle="-", markersize=8)
+    plt.plot(df.index, range(len(df)), marker="o", linestyle="-", markersize=8)
     plt.xlabel("日時 (JST)", fontsize=16, fontweight="bold")
     plt.ylabel("HTML取得回数（累積）", fontsize=16, fontweight="bold")
     plt.title("IPTeCA HTML取得タイムライン", fontsize=18, fontweight="bold")
@@ -302,15 +1007,13 @@ def create_timeline_graph(data, output_dir):
 
 def create_daily_count_graph(data, output_dir):
     """日別のHTML取得数をグラフ化"""
-    if not data:
+    if data is None or len(data) == 0:
         print("グラフを作成するデータがありません。")
         return None
     
-    df = pd.DataFrame(data)
-    df["date_only"] = df["date"].dt.date
+    df = graph_frame(data)
     
     daily_counts = df.groupby("date_only").size().reset_index(name="count")
-    daily_counts = daily_counts.sort_values("date_only")
     
     plt.figure(figsize=(10, 5))
     plt.bar(daily_counts["date_only"], daily_counts["count"], color="steelblue", alpha=0.7)
@@ -334,15 +1037,13 @@ def create_daily_count_graph(data, output_dir):
 
 def create_hourly_distribution_graph(data, output_dir):
     """時間帯別のHTML取得分布をグラフ化"""
-    if not data:
+    if data is None or len(data) == 0:
         print("グラフを作成するデータがありません。")
         return None
     
-    df = pd.DataFrame(data)
-    df["hour"] = df["date"].dt.hour
+    df = graph_frame(data)
     
     hourly_counts = df.groupby("hour").size().reset_index(name="count")
-    hourly_counts = hourly_counts.sort_values("hour")
     
     plt.figure(figsize=(10, 5))
     plt.bar(hourly_counts["hour"], hourly_counts["count"], color="coral", alpha=0.7)
@@ -463,43 +1164,56 @@ def add_events_to_graph(ax, events, y_min, y_max):
         )
 
 
+def series_frame(data, metric):
+    """グラフ用に、系列（ゾーン・ワールド）ごとの metric（visitors / likes）を縦持ちの (date, label, metric) にする
+    data は graph_frame の結果（または graph_frame に渡せるもの）か、
+    label 列を持つ縦持ちのDataFrame（load_world_store の結果に label 列を加えたものなど）
+    系列の数によらず列は増えないため、ワールドが数百あっても同じ処理で描画できる"""
+    if isinstance(data, pd.DataFrame) and "label" in data.columns:
+        return data.sort_values("date", kind="stable")[["date", "label", metric]]
+    df = graph_frame(data)
+    suffix = f"_{metric}"
+    columns = [col for col in df.columns if col.endswith(suffix)]
+    long_df = df[columns].reset_index().melt(id_vars=["date"], value_vars=columns, var_name="label", value_name=metric)
+    # 列の順（ゾーンの定義の順）に系列を並べる
+    long_df["label"] = pd.Categorical(long_df["label"].str[:-len(suffix)], categories=[col[:-len(suffix)] for col in columns])
+    return long_df
+
+
 def create_zone_visitors_graph(data, output_dir, events=None):
     """各ゾーンの来場者数の時系列グラフを作成し、最新点に値を表示"""
-    if not data:
+    if data is None or len(data) == 0:
         print("グラフを作成するデータがありません。")
         return None
     
-    df = pd.DataFrame(data)
-    df = df.sort_values("date")
+    series_df = series_frame(data, "visitors")
     
     fig, ax = plt.subplots(figsize=(16, 10))
     
     total_latest = 0
 
-    for zone_name in ZONE_SHORT_NAMES:
-        col_name = f"{zone_name}_visitors"
-        if col_name in df.columns:
-            series = df[["date", col_name]].dropna()
-            if series.empty:
-                continue
-            line, = ax.plot(series["date"], series[col_name], marker="o", label=zone_name, linewidth=2.5, markersize=8)
-            # 最新点に値を表示
-            last_row = series.iloc[-1]
-            val = float(last_row[col_name])
-            total_latest += val
-            ts_str = last_row["date"].strftime("%Y/%m/%d %H:%M")
-            ax.annotate(
-                f"{int(val)}人\n{ts_str}",
-                xy=(last_row["date"], last_row[col_name]),
-                xytext=(8, 0),
-                textcoords="offset points",
-                ha="left",
-                va="center",
-                fontsize=11,
-                fontweight="bold",
-                color=line.get_color(),
-                bbox=dict(boxstyle="round,pad=0.25", facecolor="white", edgecolor=line.get_color(), linewidth=0.8, alpha=0.85)
-            )
+    for label, series in series_df.groupby("label", sort=False, observed=True):
+        series = series[["date", "visitors"]].dropna()
+        if series.empty:
+            continue
+        line, = ax.plot(series["date"], series["visitors"], marker="o", label=label, linewidth=2.5, markersize=8)
+        # 最新点に値を表示
+        last_row = series.iloc[-1]
+        val = float(last_row["visitors"])
+        total_latest += val
+        ts_str = last_row["date"].strftime("%Y/%m/%d %H:%M")
+        ax.annotate(
+            f"{int(val)}人\n{ts_str}",
+            xy=(last_row["date"], last_row["visitors"]),
+            xytext=(8, 0),
+            textcoords="offset points",
+            ha="left",
+            va="center",
+            fontsize=11,
+            fontweight="bold",
+            color=line.get_color(),
+            bbox=dict(boxstyle="round,pad=0.25", facecolor="white", edgecolor=line.get_color(), linewidth=0.8, alpha=0.85)
+        )
     
     ax.set_xlabel("日時 (JST)", fontsize=20, fontweight="bold")
     ax.set_ylabel("来場者数", fontsize=20, fontweight="bold")
@@ -536,19 +1250,16 @@ def create_zone_visitors_graph(data, output_dir, events=None):
 
 def create_zone_likes_graph(data, output_dir, events=None):
     """各ゾーンのいいね数の時系列グラフを作成"""
-    if not data:
+    if data is None or len(data) == 0:
         print("グラフを作成するデータがありません。")
         return None
     
-    df = pd.DataFrame(data)
-    df = df.sort_values("date")
+    series_df = series_frame(data, "likes")
     
     fig, ax = plt.subplots(figsize=(16, 10))
     
-    for zone_name in ZONE_SHORT_NAMES:
-        col_name = f"{zone_name}_likes"
-        if col_name in df.columns:
-            ax.plot(df["date"], df[col_name], marker="s", label=zone_name, linewidth=2.5, markersize=8)
+    for label, series in series_df.groupby("label", sort=False, observed=True):
+        ax.plot(series["date"], series["likes"], marker="s", label=label, linewidth=2.5, markersize=8)
     
     ax.set_xlabel("日時 (JST)", fontsize=20, fontweight="bold")
     ax.set_ylabel("いいね数", fontsize=20, fontweight="bold")
@@ -583,12 +1294,8 @@ def create_zone_likes_graph(data, output_dir, events=None):
     return output_path
 
 
-def save_to_csv(data, output_dir, csv_path):
-    """HTML情報をCSVに保存（追記形式）"""
-    if not data:
-        print("CSVに保存するデータがありません。")
-        return None
-    
+def csv_frame(data):
+    """get_html_files の結果を、CSVの列（日時の文字列・ゾーンデータ）のDataFrameに変換する"""
     # 新しいデータをDataFrameに変換
     df_new = pd.DataFrame(data)
     df_new["date_str"] = df_new["date"].dt.strftime("%Y-%m-%d %H:%M:%S")
@@ -606,7 +1313,16 @@ def save_to_csv(data, output_dir, csv_path):
     csv_columns = base_columns + zone_columns
     # 存在する列のみを選択
     available_columns = [col for col in csv_columns if col in df_new.columns]
-    df_new_output = df_new[available_columns].copy()
+    return df_new[available_columns].copy()
+
+
+def save_to_csv(data, output_dir, csv_path):
+    """HTML情報をCSVに保存（追記形式）"""
+    if not data:
+        print("CSVに保存するデータがありません。")
+        return None
+    
+    df_new_output = csv_frame(data)
     
     # 既存のCSVファイルがある場合は読み込む
     if os.path.exists(csv_path):
@@ -642,6 +1358,8 @@ def normalize_datetime_str(dt_str, filename=None):
                     timestamp_str = filename.replace("IPTeCA_", "").replace("_JST.html", "")
                 elif filename.endswith("_JST.png"):
                     timestamp_str = filename.replace("IPTeCA_", "").replace("_JST.png", "")
+                elif filename.endswith("_JST.json"):
+                    timestamp_str = filename.replace("IPTeCA_", "").replace("_JST.json", "")
                 else:
                     return None
                 dt = datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
@@ -676,83 +1394,118 @@ def load_from_csv(csv_path):
         print(f"エラー: CSVファイルが見つかりません: {csv_path}")
         return None
     
-    df = pd.read_csv(csv_path, encoding="utf-8-sig")
+    return records_from_frame(pd.read_csv(csv_path, encoding="utf-8-sig"))
+
+
+def load_frame_from_csv(csv_path):
+    """CSVファイルを typed_frame の型付きDataFrameとして読み込む（ファイルが無い場合は None）"""
+    if not os.path.exists(csv_path):
+        print(f"エラー: CSVファイルが見つかりません: {csv_path}")
+        return None
+    
+    return typed_frame(pd.read_csv(csv_path, encoding="utf-8-sig"))
+
+
+def _snapshot_dates_from_filenames(filenames):
+    """ファイル名（IPTeCA_YYYYMMDD_HHMMSS_JST.html / .png / .json）から取得日時の文字列（YYYY-MM-DD HH:MM:SS）を一括で求める
+    該当しないファイル名は欠損になる"""
+    timestamps = filenames.astype("string").str.extract(r"^IPTeCA_(\d{8}_\d{6})_JST\.(?:html|png|json)$", expand=False)
+    return pd.to_datetime(timestamps, format="%Y%m%d_%H%M%S", errors="coerce").dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def normalize_datetime_series(values, filenames):
+    """normalize_datetime_str と同じ正規化を、列全体の文字列操作で行う
+    空の値はファイル名から求め、スラッシュ区切り・秒の無い時刻・日付のみの値を「YYYY-MM-DD HH:MM:SS」に揃える"""
+    text = values.astype("string").str.strip()
+    missing = text.isna() | (text == "")
+    text = text.str.replace("/", "-", regex=False)
+    # "YYYY-MM-DD H:MM" 形式は秒を追加し、日付のみの場合は時刻を追加
+    text = text.mask(text.str.match(r"^\d{4}-\d{2}-\d{2} \d{1,2}:\d{2}$", na=False), text + ":00")
+    text = text.mask(text.str.match(r"^\d{4}-\d{2}-\d{2}$", na=False), text + " 00:00:00")
+    # ファイル名からの変換は空の行だけに行う
+    return text.mask(missing, _snapshot_dates_from_filenames(filenames[missing]).astype("string"))
+
+
+def typed_frame(df):
+    """CSVの列のDataFrameから、日時を正規化した型付きのDataFrameを作る（行ごとのループは使わない）
+    列は filename・date・file_date（JSTのdatetime）・file_path と、ゾーンデータ（欠損は0の float）
+    日時を解釈できない行は除く"""
     jst = ZoneInfo("Asia/Tokyo")
     
-    # 日時文字列を正規化
-    for idx, row in df.iterrows():
-        filename = row.get("filename", "")
-        date_str = normalize_datetime_str(row.get("date_str"), filename)
-        if date_str:
-            df.at[idx, "date_str"] = date_str
-        
-        # file_date_strが空の場合は、date_strと同じ値を使用
-        file_date_str = row.get("file_date_str")
-        if pd.isna(file_date_str) or str(file_date_str).strip() == "":
-            df.at[idx, "file_date_str"] = df.at[idx, "date_str"]
-        else:
-            file_date_str = normalize_datetime_str(file_date_str, filename)
-            if file_date_str:
-                df.at[idx, "file_date_str"] = file_date_str
+    def column(name):
+        return df[name] if name in df.columns else pd.Series(pd.NA, index=df.index, dtype="string")
+    
+    filenames = column("filename")
+    # 日時文字列を正規化（空の場合はファイル名から求める）
+    date_str = normalize_datetime_series(column("date_str"), filenames)
+    # file_date_strが空の場合は、date_strと同じ値を使用
+    file_date_raw = column("file_date_str").astype("string").str.strip()
+    file_date_str = normalize_datetime_series(file_date_raw, filenames)
+    file_date_str = file_date_str.mask(file_date_raw.isna() | (file_date_raw == ""), date_str)
     
     # 日時文字列をdatetimeオブジェクトに変換
     try:
-        df["date"] = pd.to_datetime(df["date_str"], errors="coerce").dt.tz_localize(jst, ambiguous="infer")
+        dates = pd.to_datetime(date_str.astype(object), errors="coerce").dt.tz_localize(jst, ambiguous="infer")
     except Exception as e:
-        print(f"警告: 日時の変換でエラーが発生しました: {e}")
-        # フォールバック: ファイル名から日時を抽出
-        for idx, row in df.iterrows():
-            if pd.isna(df.at[idx, "date"]):
-                filename = row.get("filename", "")
-                if filename.startswith("IPTeCA_"):
-                    try:
-                        if filename.endswith("_JST.html"):
-                            timestamp_str = filename.replace("IPTeCA_", "").replace("_JST.html", "")
-                        elif filename.endswith("_JST.png"):
-                            timestamp_str = filename.replace("IPTeCA_", "").replace("_JST.png", "")
-                        else:
-                            continue
-                        dt = datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
-                        df.at[idx, "date"] = dt.replace(tzinfo=jst)
-                    except Exception:
-                        pass
-    
+        print(f"警告: 日時の変換でエラーが発生しました。ファイル名から日時を求めます: {e}")
+        dates = pd.to_datetime(_snapshot_dates_from_filenames(filenames), errors="coerce").dt.tz_localize(jst)
     try:
-        df["file_date"] = pd.to_datetime(df["file_date_str"], errors="coerce").dt.tz_localize(jst, ambiguous="infer")
+        file_dates = pd.to_datetime(file_date_str.astype(object), errors="coerce").dt.tz_localize(jst, ambiguous="infer")
         # file_dateがNaNの場合は、dateと同じ値を使用
-        df["file_date"] = df["file_date"].fillna(df["date"])
+        file_dates = file_dates.fillna(dates)
     except Exception as e:
         print(f"警告: file_dateの変換でエラーが発生しました: {e}")
-        df["file_date"] = df["date"]
-    
-    # dateがNaNの行を除外
-    df = df.dropna(subset=["date"])
+        file_dates = dates
     
-    # データ形式を統一（ゾーンデータも含める）
-    data = []
-    for _, row in df.iterrows():
-        row_data = {
-            "filename": row["filename"],
-            "date": row["date"],
-            "file_date": row["file_date"],
-            "file_path": row["file_path"]
-        }
-        
-        # ゾーンデータを追加
-        for zone_name in ZONE_SHORT_NAMES:
-            visitors_col = f"{zone_name}_visitors"
-            likes_col = f"{zone_name}_likes"
-            if visitors_col in df.columns:
-                # NaNの場合は0に変換
-                value = row.get(visitors_col, 0)
-                row_data[visitors_col] = 0 if pd.isna(value) else float(value)
-            if likes_col in df.columns:
-                value = row.get(likes_col, 0)
-                row_data[likes_col] = 0 if pd.isna(value) else float(value)
-        
-        data.append(row_data)
+    typed = pd.DataFrame({
+        "filename": filenames,
+        "date": dates,
+        "file_date": file_dates,
+        "file_path": column("file_path"),
+    })
+    # ゾーンデータ（NaNの場合は0）
+    for zone_name in ZONE_SHORT_NAMES:
+        for metric in ("visitors", "likes"):
+            name = f"{zone_name}_{metric}"
+            if name in df.columns:
+                typed[name] = pd.to_numeric(df[name], errors="coerce").fillna(0).astype("float64")
     
-    return data
+    # dateがNaNの行を除外
+    return typed.dropna(subset=["date"])
+
+
+def records_from_frame(df):
+    """CSVの列のDataFrameを、グラフ作成用の行（辞書）のリストに変換する"""
+    return typed_frame(df).to_dict("records")
+
+
+def zone_columns():
+    """ゾーンデータの列名（ゾーンごとに来場者数・いいね数）"""
+    return [f"{zone_name}_{metric}" for zone_name in ZONE_SHORT_NAMES for metric in ("visitors", "likes")]
+
+
+# 時系列データの保存形式（config.json の analysis.storage、parquet には pyarrow が必要）
+STORAGE_MODES = ("csv", "parquet", "sqlite")
+
+
+def get_storage_config(config, output_dir="graphs"):
+    """config.json の analysis.storage から (保存形式, 保存先) を返す（対応していない形式の場合は ValueError）
+    保存先は csv: <output_dir>/html_data.csv、parquet: <output_dir>/html_data.parquet、sqlite: analysis.sqlite_path"""
+    analysis_config = config.get("analysis", {})
+    storage = analysis_config.get("storage", "csv")
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"analysis.storage は \"csv\"・\"parquet\"・\"sqlite\" のいずれかを指定してください: {storage}")
+    if storage == "parquet":
+        return storage, os.path.join(output_dir, "html_data.parquet")
+    if storage == "sqlite":
+        return storage, analysis_config.get("sqlite_path") or sqlite_store.DEFAULT_SQLITE_PATH
+    return storage, os.path.join(output_dir, "html_data.csv")
+
+
+def html_data_store(csv_path):
+    """html_data.csv の追記型データストア（filename と date_str の組をキーとし、ゾーンデータが変わった場合だけ追記する）
+    file_date_str（ファイルの更新日時）はチェックアウトのたびに変わるため比較しない"""
+    return AppendOnlyCsvStore(csv_path, ["filename", "date_str"], zone_columns())
 
 
 def analyze_html():
@@ -760,45 +1513,98 @@ def analyze_html():
     html_dir = "html"
     output_dir = "graphs"
     csv_path = os.path.join(output_dir, "html_data.csv")
+    # すべてのワールドの縦持ちデータ（取得日時・ワールドID・タイトル・来場者数・いいね数）
+    world_csv_path = os.path.join(output_dir, "world_data.csv")
+    index_path = os.path.join(output_dir, "extraction_index.json")
+    # スナップショットごとに、前回データストアに書き込んだ抽出結果のダイジェスト（変わったものだけを書き込む）
+    digests_path = os.path.join(output_dir, "snapshot_digests.json")
+    # カードのレイアウトごとの数値の位置（同じレイアウトのカードは全体を探索せずに読む）
+    layout_cache_path = os.path.join(output_dir, "layout_cache.json")
+    config = load_config()
+    # 取得時にブラウザ内で抽出した数値の記録（capture.py などが html/ に追記する）
+    records_path = get_world_records_path(html_dir, get_world_records_config(config))
+    # 並列解析の設定（workers が null の場合はCPUコア数）
+    analysis_config = config.get("analysis", {})
+    workers = analysis_config.get("workers") or os.cpu_count() or 1
+    chunksize = analysis_config.get("chunksize", DEFAULT_CHUNKSIZE)
+    # 時系列データの保存形式と保存先
+    # parquet: 月ごとのパーティションに分けたParquetのデータセット、sqlite: データベース（world_records.write_sqlite が有効なら取得時にも capture_records が書き込む）
+    storage, store_path = get_storage_config(config, output_dir)
+    dataset_dir = db_path = store_path
     
     # 日本語フォントを設定
     setup_japanese_font()
     
-    # 既存のCSVファイルから全データを読み込む（手動データも含む）
-    all_data = []
-    if os.path.exists(csv_path):
-        print(f"CSVファイルから全データを読み込みます: {csv_path}")
-        data_from_csv = load_from_csv(csv_path)
-        if data_from_csv:
-            all_data.extend(data_from_csv)
-            print(f"CSVから {len(data_from_csv)} 件のデータを読み込みました。")
+    if storage == "parquet":
+        # 初回はCSVファイル（手動データも含む）を取り込む（以降、CSVファイルは読み書きしない）
+        if not parquet_store.exists(dataset_dir) and os.path.exists(csv_path):
+            imported = parquet_store.import_csv_frame(dataset_dir, load_frame_from_csv(csv_path), zone_columns())
+            print(f"CSVファイルから {imported} 件のデータをParquetに取り込みました: {csv_path} → {dataset_dir}")
+        has_data = parquet_store.exists(dataset_dir)
+    elif storage == "sqlite":
+        # 初回はCSVファイル（手動データも含む）を取り込む（以降、CSVファイルは読み書きしない）
+        if not sqlite_store.exists(db_path) and os.path.exists(csv_path):
+            imported = sqlite_store.import_csv_frame(db_path, load_frame_from_csv(csv_path), ZONE_SHORT_NAMES)
+            print(f"CSVファイルから {imported} 件のデータをSQLiteに取り込みました: {csv_path} → {db_path}")
+        has_data = sqlite_store.exists(db_path)
+    else:
+        # 既存のCSVファイルを1回だけ読み込む（手動データも含む、以降は追記した行をメモリ上で加える）
+        store = html_data_store(csv_path)
+        if store.load() is not None:
+            print(f"CSVファイルから {len(store.frame)} 件のデータを読み込みました: {csv_path}")
+        has_data = store.frame is not None
     
-    # HTMLファイルを取得
+    # 保存形式やゾーンの設定を変えた場合と、データストアが無い場合（初回・削除した場合）は全件を書き込む
+    digests = SnapshotDigests(digests_path, scope={"storage": storage, "zones": ZONE_SHORT_NAMES})
+    if not has_data or not os.path.exists(world_csv_path):
+        digests.clear()
+    
+    # HTMLファイルを取得（新しいスナップショットと抽出結果が変わったスナップショットだけ）
     print(f"htmlフォルダをスキャン中: {html_dir}")
-    html_data = get_html_files(html_dir)
+    html_data = get_html_files(
+        html_dir, index_path=index_path, workers=workers, chunksize=chunksize, records_path=records_path,
+        layout_cache_path=layout_cache_path, digests=digests
+    )
     
     if html_data:
-        print(f"HTMLファイルを {len(html_data)} 件見つけました。")
-        # HTMLデータをCSVに保存（追記形式、重複は上書き）
-        save_to_csv(html_data, output_dir, csv_path)
-        
-        # 更新されたCSVから全データを再読み込み
-        print(f"更新されたCSVファイルから全データを再読み込みます: {csv_path}")
-        data_from_csv = load_from_csv(csv_path)
-        if data_from_csv:
-            all_data = data_from_csv
-            print(f"CSVから {len(data_from_csv)} 件のデータを読み込みました。")
-    elif not all_data:
-        print(f"エラー: {html_dir} フォルダにHTMLファイルが見つからず、CSVファイルもありませんでした。")
+        print(f"新しい・変わったスナップショットを {len(html_data)} 件見つけました。")
+        if storage == "parquet":
+            # 新しい行と値が変わった行を含む月のパーティションだけを書き直す
+            changed = parquet_store.upsert_parquet_store(dataset_dir, pd.DataFrame(html_data), zone_columns())
+            print(f"Parquetに {changed} 件を追加・更新しました（変化の無い {len(html_data) - changed} 件は書き込みません）: {dataset_dir}")
+        elif storage == "sqlite":
+            # 取得時に書き込まれたスナップショットは、値が同じなら書き込まない
+            changed = sqlite_store.upsert_sqlite_store(db_path, pd.DataFrame(html_data), ZONE_SHORT_NAMES)
+            print(f"SQLiteに {changed} 件を追加・更新しました（変化の無い {len(html_data) - changed} 件は書き込みません）: {db_path}")
+        else:
+            # HTMLデータをCSVに追記（新しい行と値が変わった行だけを末尾に書き足す）
+            appended = store.append(csv_frame(html_data))
+            print(f"CSVファイルに {appended} 件を追記しました（変化の無い {len(html_data) - appended} 件は追記しません）: {csv_path}")
+        if digests.digests:
+            append_world_store(html_data, world_csv_path)
+        else:
+            # 記録が無い場合（初回・設定の変更後）は全件を渡すため、追記せずに書き直す（重複した古い行も除く）
+            save_world_store(html_data, world_csv_path)
+        # 両方のデータストアに書き込んでから記録を更新する（途中で失敗した場合は次回もう一度書き込む）
+        digests.save()
+    elif not has_data:
+        print(f"エラー: {html_dir} フォルダにHTMLファイルが見つからず、保存済みのデータもありませんでした。")
         sys.exit(1)
     
-    if not all_data:
+    # グラフ作成用のDataFrame（日時順・型付き）は1回だけ作り、すべてのグラフで共有する
+    if storage == "parquet":
+        all_data = graph_frame(parquet_store.read_parquet_store(dataset_dir, zone_columns=zone_columns()))
+    elif storage == "sqlite":
+        # 読み込みは開始時点の内容で行う（取得が同時に書き込んでも待たない）
+        all_data = graph_frame(sqlite_store.read_sqlite_store(db_path, ZONE_SHORT_NAMES))
+    else:
+        # 同じ行（filename と date_str の組）は後に追記したものを使う
+        all_data = graph_frame(typed_frame(store.latest()))
+    
+    if all_data.empty:
         print("エラー: グラフを作成するデータがありません。")
         sys.exit(1)
     
-    # 日時でソート
-    all_data.sort(key=lambda x: x["date"])
-    
     # イベント情報を読み込む
     events = load_events("events.json")
     if events:
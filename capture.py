@@ -0,0 +1,522 @@
+import io
+import os
+import sys
+import csv
+import json
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from playwright.sync_api import sync_playwright
+from snapshot_dedup import get_dedup_config, deduplicate_snapshot
+from html_storage import get_html_storage_config, write_html, build_pruned_html
+from capture_records import get_world_records_config, append_world_record
+
+
+def load_config():
+    """config.json を読み込む"""
+    with open("config.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def generate_timestamp():
+    """日本時間（JST）でYYYYMMDD_HHMMSS_JST形式のタイムスタンプを生成"""
+    jst = ZoneInfo("Asia/Tokyo")
+    return datetime.now(jst).strftime("%Y%m%d_%H%M%S_JST")
+
+
+# 準備完了判定の既定値（config.json の readiness で上書き）
+DEFAULT_READINESS = {
+    "strategy": "cards",  # "cards": ワールドカードの出現を待つ / "networkidle": 従来の networkidle + 固定待機
+    "expected_cards": 6,
+    "timeout_ms": 30000,
+    "stable_ms": 500,
+    "poll_ms": 100,
+    "latency_log": "metrics/capture_latency.csv",
+}
+
+# readiness.strategy に指定できる値
+READINESS_STRATEGIES = ("cards", "networkidle")
+
+# Cookieバナーの「すべて許可」ボタンの表示（英語・日本語）
+COOKIE_BANNER_LABELS = ["Allow all", "すべて許可"]
+
+# 表示されているCookieバナーの「すべて許可」ボタンを押す（押した場合は true、表示されていなければ false）
+DISMISS_COOKIE_BANNER_JS = """
+(labels) => {
+  const wanted = labels.map(label => label.toLowerCase());
+  for (const button of document.querySelectorAll('button, [role="button"], a')) {
+    const text = button.textContent.replace(/\\s+/g, ' ').trim().toLowerCase();
+    if (wanted.includes(text) && button.getClientRects().length > 0) {
+      button.click();
+      return true;
+    }
+  }
+  return false;
+}
+"""
+
+# ♥と▶のカウンターを持つワールドカードが expected 枚以上あり、内容が stableMs の間変化していなければ true
+# bannerLabels を渡すと、判定のたびにCookieバナーを探し、表示されたら閉じる（後から表示されるバナーも待たずに閉じる）
+CARDS_READY_JS = """
+({expected, stableMs, bannerLabels}) => {
+  if (bannerLabels && !window.__cookieBannerDismissed) {
+    window.__cookieBannerDismissed = (__DISMISS_COOKIE_BANNER__)(bannerLabels);
+  }
+  const cards = Array.from(document.querySelectorAll('a[href^="/w/"]')).filter(card =>
+    card.querySelector('svg path[d^="M60.004"]') && card.querySelector('svg path[d^="M38.678"]'));
+  const signature = cards.map(card => card.getAttribute('href') + ':' + card.textContent).join('|');
+  const now = performance.now();
+  const state = window.__captureReady || (window.__captureReady = {signature: null, since: now});
+  if (state.signature !== signature) {
+    state.signature = signature;
+    state.since = now;
+    return false;
+  }
+  return cards.length >= Math.max(expected, 1) && now - state.since >= stableMs;
+}
+""".replace("__DISMISS_COOKIE_BANNER__", DISMISS_COOKIE_BANNER_JS.strip())
+
+
+# スクリーンショット出力の既定値（config.json の screenshot で上書き）
+DEFAULT_SCREENSHOT_OPTIONS = {
+    "format": "png",  # "png" / "jpeg" / "webp"
+    "quality": 80,  # jpeg・webp の品質（1-100）
+    "clip": "full_page",  # "full_page": ページ全体 / "results": 検索結果のグリッドのみ
+    "thumbnail_width": 0,  # 0より大きい場合、この幅に縮小したサムネイルも保存
+    "thumbnail_dir": None,  # サムネイルの保存先（省略時は <save_dir>/thumbs）
+}
+
+SCREENSHOT_EXTENSIONS = {"png": ".png", "jpeg": ".jpg", "webp": ".webp"}
+
+# 全ワールドカードを囲む矩形（ページ座標、余白付き）を返す。カードが無い場合は null
+RESULTS_CLIP_JS = """
+() => {
+  const cards = Array.from(document.querySelectorAll('a[href^="/w/"]'));
+  if (cards.length === 0) return null;
+  let left = Infinity, top = Infinity, right = -Infinity, bottom = -Infinity;
+  for (const card of cards) {
+    const rect = card.getBoundingClientRect();
+    left = Math.min(left, rect.left);
+    top = Math.min(top, rect.top);
+    right = Math.max(right, rect.right);
+    bottom = Math.max(bottom, rect.bottom);
+  }
+  const padding = 16;
+  const x = Math.max(0, left + window.scrollX - padding);
+  const y = Math.max(0, top + window.scrollY - padding);
+  return {x: x, y: y, width: right + window.scrollX + padding - x, height: bottom + window.scrollY + padding - y};
+}
+"""
+
+# 全ワールドカード（a[href^="/w/"]）の outerHTML をページ内の順序で返す（html_prune で使用）
+WORLD_CARDS_HTML_JS = """
+() => Array.from(document.querySelectorAll('a[href^="/w/"]'), card => card.outerHTML)
+"""
+
+
+# 全ワールドカードから (ワールドID, タイトル, 来場者数, いいね数) をページ内の順序で返す（world_records で使用）
+# analyze_html の抽出と同じ規則: タイトルは他の候補（11文字以上のdiv）を内側に含まないdivのうち最も長いテキスト、
+# 数値は♥（M60.004）・▶（M38.678）のsvgの後に来る最初の兄弟spanの数字（後のsvgを優先）
+WORLD_RECORDS_JS = """
+() => {
+  const SKIP = new Set(['script', 'style', 'template', 'rt', 'rp']);
+  // get_text(strip=True) と同じく、各テキストの前後の空白を除いて連結する
+  const textOf = node => {
+    let text = '';
+    for (const child of node.childNodes) {
+      if (child.nodeType === 3) text += child.nodeValue.trim();
+      else if (child.nodeType === 1 && !SKIP.has(child.tagName.toLowerCase())) text += textOf(child);
+    }
+    return text;
+  };
+  const parseCount = text => {
+    const match = text.replace(/,/g, '').match(/\\d+/);
+    return match ? parseInt(match[0], 10) : null;
+  };
+  const followingSpan = node => {
+    for (let sibling = node.nextElementSibling; sibling; sibling = sibling.nextElementSibling) {
+      if (sibling.tagName.toLowerCase() === 'span') return sibling;
+    }
+    return null;
+  };
+  const records = [];
+  for (const card of document.querySelectorAll('a[href^="/w/"]')) {
+    const candidates = [];
+    for (const div of card.querySelectorAll('div')) {
+      const text = textOf(div);
+      if (text.length > 10) candidates.push({div, text});
+    }
+    let title = null;
+    for (const {div, text} of candidates) {
+      if (candidates.some(other => other.div !== div && div.contains(other.div))) continue;
+      if (title === null || text.length > title.length) title = text;
+    }
+    if (title === null) continue;
+    // 見つからなかった数値は null にする（0 と区別するため）
+    const counts = {likes: null, visitors: null};
+    for (const svg of card.querySelectorAll('svg')) {
+      for (const path of svg.querySelectorAll('path')) {
+        const d = path.getAttribute('d') || '';
+        const key = d.startsWith('M60.004') ? 'likes' : d.startsWith('M38.678') ? 'visitors' : null;
+        if (!key) continue;
+        const span = followingSpan(svg);
+        const count = span ? parseCount(textOf(span)) : null;
+        if (count !== null) counts[key] = count;
+      }
+    }
+    const worldId = card.getAttribute('href').slice(3).split('?')[0].split('#')[0].replace(/^\\/+|\\/+$/g, '');
+    records.push({world_id: worldId, title: title, visitors: counts.visitors, likes: counts.likes});
+  }
+  return records;
+}
+"""
+
+
+def get_screenshot_options(config):
+    """config.json の screenshot を既定値とマージしてスクリーンショットの出力設定を返す"""
+    options = dict(DEFAULT_SCREENSHOT_OPTIONS)
+    options.update({key: value for key, value in config["screenshot"].items() if key in DEFAULT_SCREENSHOT_OPTIONS})
+    if options["format"] not in SCREENSHOT_EXTENSIONS:
+        raise ValueError(f"未対応のスクリーンショット形式です: {options['format']}")
+    return options
+
+
+def screenshot_kwargs(options, clip=None):
+    """page.screenshot に渡す引数を作成する（WebPはPNGで取得してから変換する）"""
+    kwargs = {"full_page": True}
+    if options["format"] == "jpeg":
+        kwargs["type"] = "jpeg"
+        kwargs["quality"] = options["quality"]
+    else:
+        kwargs["type"] = "png"
+    if clip:
+        kwargs["clip"] = clip
+    return kwargs
+
+
+def save_image(image, path, options):
+    """Pillowの画像を設定の形式で保存する"""
+    if options["format"] == "webp":
+        image.save(path, "WEBP", quality=options["quality"], method=4)
+    elif options["format"] == "jpeg":
+        image.convert("RGB").save(path, "JPEG", quality=options["quality"], optimize=True)
+    else:
+        image.save(path, "PNG", optimize=True)
+
+
+def write_screenshot(image_bytes, save_dir, basename, options):
+    """page.screenshot の結果を設定に従って保存し、(本体のパス, サムネイルのパス) を返す
+    WebPへの変換とサムネイルの作成にはPillowを使用する"""
+    path = f"{save_dir}/{basename}{SCREENSHOT_EXTENSIONS[options['format']]}"
+    if options["format"] == "webp":
+        from PIL import Image
+        save_image(Image.open(io.BytesIO(image_bytes)), path, options)
+    else:
+        with open(path, "wb") as f:
+            f.write(image_bytes)
+
+    thumbnail_path = None
+    if options["thumbnail_width"] > 0:
+        from PIL import Image
+        thumbnail_dir = options["thumbnail_dir"] or f"{save_dir}/thumbs"
+        os.makedirs(thumbnail_dir, exist_ok=True)
+        image = Image.open(io.BytesIO(image_bytes))
+        width = options["thumbnail_width"]
+        height = max(1, round(image.height * width / image.width))
+        thumbnail_path = f"{thumbnail_dir}/{basename}{SCREENSHOT_EXTENSIONS[options['format']]}"
+        save_image(image.resize((width, height), Image.LANCZOS), thumbnail_path, options)
+
+    return path, thumbnail_path
+
+
+def take_page_screenshot(page, save_dir, basename, options):
+    """設定に従ってスクリーンショットを取得・保存し、(本体のパス, サムネイルのパス) を返す"""
+    clip = None
+    if options["clip"] == "results":
+        clip = page.evaluate(RESULTS_CLIP_JS)
+        if clip is None:
+            print("警告: ワールドカードが見つからないため、ページ全体を保存します。")
+    image_bytes = page.screenshot(**screenshot_kwargs(options, clip))
+    return write_screenshot(image_bytes, save_dir, basename, options)
+
+
+def get_page_options(config, lean=None, api_config=None, prune=None):
+    """config.json の lean_fetch・api_capture・html_prune からページの取得方法の設定を作る（無効なものは None）
+    lean・prune を指定すると lean_fetch.enabled・html_prune.enabled の代わりに使い、
+    api_config を指定すると api_capture の代わりに使う"""
+    lean_config = config.get("lean_fetch", {})
+    if lean is None:
+        lean = lean_config.get("enabled", False)
+    if api_config is None:
+        api_config = config.get("api_capture", {})
+    prune_config = config.get("html_prune", {})
+    if prune is None:
+        prune = prune_config.get("enabled", False)
+    return {
+        "lean_fetch": lean_config if lean else None,
+        "api_capture": api_config if api_config.get("enabled", False) else None,
+        "html_prune": prune_config if prune else None,
+    }
+
+
+def stores_html(page_options):
+    """HTMLを保存するかどうか（api_capture.store が "json_only" の場合はAPIレスポンスだけを保存する）"""
+    api_config = page_options.get("api_capture")
+    return not (api_config and api_config.get("store", "both") == "json_only")
+
+
+def setup_lean_routing(page, lean_config):
+    """設定されたリソース種別・URLパターンのリクエストを遮断する
+    ワールドカードのDOM生成に必要なドキュメント・スクリプト・APIは通す
+    同期版・非同期版のどちらのページにも使える（非同期版では戻り値を await する）"""
+    block_types = set(lean_config.get("block_resource_types", []))
+    block_patterns = lean_config.get("block_url_patterns", [])
+
+    def handle_route(route):
+        request = route.request
+        # 非同期版では abort / continue_ がコルーチンを返し、Playwright がそれを待つ
+        if request.resource_type in block_types or any(pattern in request.url for pattern in block_patterns):
+            return route.abort()
+        return route.continue_()
+
+    return page.route("**/*", handle_route)
+
+
+def page_content_needed(prune_config, cards):
+    """ページ全体のHTML（page.content()）が必要かどうか
+    切り出さない場合・ワールドカードが無い場合・html_prune.full_page_dir にページ全体も保存する場合に必要"""
+    return not prune_config or not cards or bool(prune_config.get("full_page_dir"))
+
+
+def write_page_html(save_dir, basename, page_html, cards, html_storage, prune_config=None):
+    """取得したHTMLを保存し、(HTMLのパス, ページ全体のHTMLのパス) を返す
+    prune_config（html_prune）が有効でワールドカード（WORLD_CARDS_HTML_JS の結果）があれば、カードだけを残したHTMLを保存し、
+    full_page_dir を指定した場合はページ全体のHTMLもそのディレクトリに保存する（変化なしマーカーには置き換えない）
+    カードが無い場合は警告を出してページ全体のHTMLを保存する"""
+    full_page_path = None
+    if prune_config and cards:
+        html_content = build_pruned_html(cards)
+        full_page_dir = prune_config.get("full_page_dir")
+        if full_page_dir:
+            os.makedirs(full_page_dir, exist_ok=True)
+            full_page_path = write_html(f"{full_page_dir}/{basename}", page_html, html_storage)
+    else:
+        if prune_config:
+            print("警告: ワールドカードが見つからないため、ページ全体のHTMLを保存します。")
+        html_content = page_html
+    # html_storage.compression に従って圧縮して保存
+    return write_html(f"{save_dir}/{basename}", html_content, html_storage), full_page_path
+
+
+def start_api_capture(page, api_config):
+    """url_patternsに一致するJSONレスポンスを記録するリスナーを登録し、記録先のリストを返す
+    レスポンス本文はページ読み込み完了後に collect_api_responses（非同期版は collect_api_responses_async）で取得する
+    同期版・非同期版のどちらのページにも使える"""
+    patterns = api_config.get("url_patterns", [])
+    responses = []
+
+    def on_response(response):
+        if not any(pattern in response.url for pattern in patterns):
+            return
+        if "json" not in response.headers.get("content-type", ""):
+            return
+        responses.append(response)
+
+    page.on("response", on_response)
+    return responses
+
+
+def collect_api_responses(responses):
+    """記録したレスポンスの本文をJSONとして読み出す"""
+    collected = []
+    for response in responses:
+        try:
+            body = response.json()
+        except Exception as e:
+            print(f"警告: APIレスポンスの読み込みに失敗しました: {response.url} ({e})")
+            continue
+        collected.append({"url": response.url, "status": response.status, "body": body})
+    return collected
+
+
+def write_api_capture(save_dir, basename, url, timestamp, responses, api_config):
+    """collect_api_responses の結果を <save_dir>/<basename>.json に保存し、保存したパスを返す"""
+    json_path = f"{save_dir}/{basename}.json"
+    capture_data = {
+        "url": url,
+        "timestamp": timestamp,
+        "responses": responses,
+    }
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(capture_data, f, ensure_ascii=False)
+    if not responses:
+        print(f"警告: url_patterns に一致するAPIレスポンスがありませんでした: {api_config.get('url_patterns', [])}")
+    return json_path
+
+
+def validate_readiness(readiness):
+    """readiness の設定を確認して返す（strategy が未対応の値なら ValueError）"""
+    if readiness["strategy"] not in READINESS_STRATEGIES:
+        raise ValueError(f"readiness.strategy は {list(READINESS_STRATEGIES)} のいずれかを指定してください: {readiness['strategy']}")
+    return readiness
+
+
+def get_readiness_config(config):
+    """config.json の readiness を既定値とマージして返す"""
+    readiness = dict(DEFAULT_READINESS)
+    readiness.update(config.get("readiness", {}))
+    return validate_readiness(readiness)
+
+
+def prepare_page_steps(page, url, dismiss_cookie_banner=True, readiness=None):
+    """prepare_page と capture_async.prepare_page_async で共有する準備の手順
+    ページの操作を1つずつ yield する。同期版はそのまま次に進め、非同期版は await した結果を send し、例外は throw で戻す
+    読み込み開始から準備完了までのミリ秒を返す（タイムアウトした場合は None）"""
+    if readiness is None:
+        readiness = DEFAULT_READINESS
+    banner_labels = COOKIE_BANNER_LABELS if dismiss_cookie_banner else None
+    start = time.perf_counter()
+
+    if readiness["strategy"] == "networkidle":
+        yield page.goto(url)
+        yield page.wait_for_load_state("networkidle")
+        # 読み込みが終わった時点で表示されていれば閉じる（表示を待たない）
+        if banner_labels:
+            yield page.evaluate(DISMISS_COOKIE_BANNER_JS, banner_labels)
+        # 下部までスクロールして表示を更新
+        yield page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        yield page.wait_for_timeout(1500)
+    else:
+        yield page.goto(url, wait_until="domcontentloaded")
+        # 下部までスクロールして表示を更新
+        yield page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        # ワールドカードと♥・▶のカウンターが揃い、表示が安定するまで待つ（Cookieバナーは判定の中で閉じる）
+        try:
+            yield page.wait_for_function(
+                CARDS_READY_JS,
+                arg={"expected": readiness["expected_cards"], "stableMs": readiness["stable_ms"], "bannerLabels": banner_labels},
+                polling=readiness["poll_ms"],
+                timeout=readiness["timeout_ms"],
+            )
+        except Exception as e:
+            print(f"警告: {readiness['timeout_ms']}ms 以内にワールドカードが揃いませんでした。現在の状態で取得します: {e}")
+            return None
+
+    return int((time.perf_counter() - start) * 1000)
+
+
+def prepare_page(page, url, dismiss_cookie_banner=True, readiness=None):
+    """ページを開き、下部までスクロールし、Cookieバナーを閉じて準備完了を待つ（手順は prepare_page_steps）
+    Cookieバナーのスクリプトを遮断している場合は dismiss_cookie_banner=False でバナーを探さない
+    読み込み開始から準備完了までのミリ秒を返す（タイムアウトした場合は None）"""
+    steps = prepare_page_steps(page, url, dismiss_cookie_banner, readiness)
+    result = None
+    try:
+        while True:
+            # 同期版では yield の時点で操作が終わっているため、その結果を返して次に進める
+            result = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
+
+
+def record_world_counts(page, html_dir, snapshot, url, records_config):
+    """ブラウザ内でワールドごとの数値を抽出し、HTMLの保存先の記録ファイルに追記する
+    analyze_html.py はこの記録があればHTMLを解析せずに使う（抽出に失敗しても取得は続ける）"""
+    if not records_config["enabled"]:
+        return None
+    try:
+        worlds = page.evaluate(WORLD_RECORDS_JS)
+    except Exception as e:
+        print(f"警告: ブラウザ内での数値の抽出に失敗しました: {e}")
+        return None
+    return append_world_record(html_dir, snapshot, url, worlds, records_config)
+
+
+def record_capture_latency(readiness, name, url, timestamp, ready_ms):
+    """準備完了までの時間を readiness.latency_log（CSV）に追記する"""
+    log_path = readiness.get("latency_log")
+    if not log_path:
+        return
+    log_dir = os.path.dirname(log_path)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+    is_new = not os.path.exists(log_path)
+    with open(log_path, "a", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        if is_new:
+            writer.writerow(["timestamp", "target", "url", "strategy", "ready_ms"])
+        writer.writerow([timestamp, name, url, readiness["strategy"], "" if ready_ms is None else ready_ms])
+
+
+def capture():
+    """1回のページ読み込みでスクリーンショットとHTMLを取得する
+    両ファイルは同じタイムスタンプを共有し、同じ時点のページを表す"""
+    config = load_config()
+    screenshot_config = config["screenshot"]
+    url = screenshot_config["url"]
+    screenshot_dir = screenshot_config["save_dir"]
+    html_dir = "html"  # HTML保存ディレクトリ
+    readiness = get_readiness_config(config)
+    screenshot_options = get_screenshot_options(config)
+    dedup_config = get_dedup_config(config)
+    html_storage = get_html_storage_config(config)
+    records_config = get_world_records_config(config)
+    page_options = get_page_options(config)
+    api_config = page_options["api_capture"]
+    if page_options["lean_fetch"]:
+        print("警告: lean_fetch は画像も遮断するため、スクリーンショットを取得する capture.py では使用しません"
+              "（HTMLだけを取得する場合は fetch_html.py を使ってください）。")
+
+    # ディレクトリが無ければ作成
+    os.makedirs(screenshot_dir, exist_ok=True)
+    os.makedirs(html_dir, exist_ok=True)
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page(viewport={"width": 1920, "height": 1080})
+        api_responses = start_api_capture(page, api_config) if api_config else None
+        ready_ms = prepare_page(page, url, readiness=readiness)
+
+        timestamp = generate_timestamp()
+        record_capture_latency(readiness, "IPTeCA", url, timestamp, ready_ms)
+
+        # 同じページ状態からスクリーンショットとHTMLを取得
+        screenshot_path, _ = take_page_screenshot(page, screenshot_dir, f"IPTeCA_{timestamp}", screenshot_options)
+        html_path = None
+        if stores_html(page_options):
+            # html_prune が有効ならワールドカードだけを切り出す
+            prune_config = page_options["html_prune"]
+            cards = page.evaluate(WORLD_CARDS_HTML_JS) if prune_config else None
+            page_html = page.content() if page_content_needed(prune_config, cards) else None
+            html_path, _ = write_page_html(html_dir, f"IPTeCA_{timestamp}", page_html, cards, html_storage, prune_config)
+        record_world_counts(page, html_dir, f"IPTeCA_{timestamp}", url, records_config)
+        if api_config:
+            # APIレスポンスをJSONファイルに保存（analyze_html はHTMLの代わりにこれを読む）
+            write_api_capture(
+                html_dir, f"IPTeCA_{timestamp}", url, timestamp, collect_api_responses(api_responses), api_config
+            )
+
+        browser.close()
+
+    # 前回から変化が無ければマーカーに置き換える（HTMLが変化した場合はスクリーンショットも保存）
+    html_unchanged = False
+    if html_path:
+        html_path, html_unchanged = deduplicate_snapshot(html_path, dedup_config)
+    screenshot_path, _ = deduplicate_snapshot(
+        screenshot_path, dedup_config, force_changed=bool(html_path) and not html_unchanged
+    )
+
+    return screenshot_path, html_path
+
+
+if __name__ == "__main__":
+    try:
+        screenshot_path, html_path = capture()
+        print(f"Saved screenshot: {screenshot_path}")
+        if html_path:
+            print(f"Saved HTML: {html_path}")
+    except Exception as e:
+        print(f"エラーが発生しました: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,316 @@
+import os
+import sys
+import json
+import asyncio
+from playwright.async_api import async_playwright
+from snapshot_dedup import get_dedup_config, deduplicate_snapshot, DEFAULT_DEDUP
+from html_storage import get_html_storage_config, DEFAULT_HTML_STORAGE
+from capture_records import get_world_records_config, append_world_record, DEFAULT_WORLD_RECORDS
+from capture import (
+    generate_timestamp, get_readiness_config, validate_readiness, prepare_page_steps, get_page_options, stores_html,
+    setup_lean_routing, start_api_capture, write_api_capture, page_content_needed, write_page_html,
+    record_capture_latency, get_screenshot_options, screenshot_kwargs, write_screenshot, DEFAULT_READINESS,
+    DEFAULT_SCREENSHOT_OPTIONS, RESULTS_CLIP_JS, WORLD_RECORDS_JS, WORLD_CARDS_HTML_JS,
+)
+
+
+DEFAULT_CONCURRENCY = 3
+
+
+def load_config():
+    """config.json を読み込む"""
+    with open("config.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def get_targets(config):
+    """config.json から取得対象の一覧を作成する
+    capture.targets が無い場合は screenshot.url を単一の対象として扱う"""
+    capture_config = config.get("capture", {})
+    targets = capture_config.get("targets")
+    if not targets:
+        targets = [{
+            "name": "IPTeCA",
+            "url": config["screenshot"]["url"],
+            "screenshot_dir": config["screenshot"]["save_dir"],
+            "html_dir": "html",
+        }]
+
+    normalized = []
+    for target in targets:
+        name = target["name"]
+        normalized.append({
+            "name": name,
+            "url": target["url"],
+            # 保存先が指定されていない場合は対象ごとのサブディレクトリに保存
+            "screenshot_dir": target.get("screenshot_dir", os.path.join("screenshots", name)),
+            "html_dir": target.get("html_dir", os.path.join("html", name)),
+            "screenshot": target.get("screenshot", True),
+            "html": target.get("html", True),
+            "readiness": target.get("readiness", {}),
+        })
+        # 対象ごとの上書きも含めて readiness.strategy を確認する
+        validate_readiness(dict(DEFAULT_READINESS, **normalized[-1]["readiness"]))
+    return normalized
+
+
+async def prepare_page_async(page, url, dismiss_cookie_banner=True, readiness=None):
+    """ページを開き、下部までスクロールし、Cookieバナーを閉じて準備完了を待つ（非同期版、手順は prepare_page_steps）
+    読み込み開始から準備完了までのミリ秒を返す（タイムアウトした場合は None）"""
+    steps = prepare_page_steps(page, url, dismiss_cookie_banner, readiness)
+    result, error = None, None
+    while True:
+        try:
+            step = steps.throw(error) if error is not None else steps.send(result)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            result, error = await step, None
+        except Exception as e:
+            result, error = None, e
+
+
+async def take_page_screenshot_async(page, save_dir, basename, options):
+    """設定に従ってスクリーンショットを取得・保存し、(本体のパス, サムネイルのパス) を返す（非同期版）"""
+    clip = None
+    if options["clip"] == "results":
+        clip = await page.evaluate(RESULTS_CLIP_JS)
+        if clip is None:
+            print("警告: ワールドカードが見つからないため、ページ全体を保存します。")
+    image_bytes = await page.screenshot(**screenshot_kwargs(options, clip))
+    return write_screenshot(image_bytes, save_dir, basename, options)
+
+
+async def record_world_counts_async(page, html_dir, snapshot, url, records_config):
+    """ブラウザ内でワールドごとの数値を抽出し、HTMLの保存先の記録ファイルに追記する（非同期版）"""
+    if not records_config["enabled"]:
+        return None
+    try:
+        worlds = await page.evaluate(WORLD_RECORDS_JS)
+    except Exception as e:
+        print(f"警告: ブラウザ内での数値の抽出に失敗しました: {e}")
+        return None
+    return append_world_record(html_dir, snapshot, url, worlds, records_config)
+
+
+async def collect_api_responses_async(responses):
+    """記録したレスポンスの本文をJSONとして読み出す（非同期版）"""
+    collected = []
+    for response in responses:
+        try:
+            body = await response.json()
+        except Exception as e:
+            print(f"警告: APIレスポンスの読み込みに失敗しました: {response.url} ({e})")
+            continue
+        collected.append({"url": response.url, "status": response.status, "body": body})
+    return collected
+
+
+def warn_unsupported_page_options(targets, page_options):
+    """この取得方法では適用しないページの取得方法の設定を警告する（起動時に1回だけ表示する）"""
+    if not page_options:
+        return
+    if page_options.get("lean_fetch"):
+        names = [target["name"] for target in targets if target["screenshot"]]
+        if names:
+            print(f"警告: lean_fetch は画像も遮断するため、スクリーンショットを取得する対象には適用しません: {', '.join(names)}"
+                  "（HTMLだけを取得する対象は capture.targets で \"screenshot\": false を指定してください）")
+
+
+async def capture_target(
+    context, target, readiness=None, screenshot_options=None, dedup_config=None, html_storage=None, records_config=None,
+    page_options=None,
+):
+    """1つの対象についてスクリーンショットとHTMLを取得する
+    page_options（get_page_options の結果）の lean_fetch は、スクリーンショットを取得しない対象にだけ適用する
+    api_capture はHTMLを取得する対象に適用し、APIレスポンスをHTMLと同じ名前の .json に保存する
+    html_prune が有効な場合は、ワールドカードだけを残したHTMLを保存する"""
+    if readiness is None:
+        readiness = DEFAULT_READINESS
+    if screenshot_options is None:
+        screenshot_options = DEFAULT_SCREENSHOT_OPTIONS
+    if dedup_config is None:
+        dedup_config = DEFAULT_DEDUP
+    if html_storage is None:
+        html_storage = DEFAULT_HTML_STORAGE
+    if records_config is None:
+        records_config = DEFAULT_WORLD_RECORDS
+    if page_options is None:
+        page_options = {}
+    lean_config = page_options.get("lean_fetch") if not target["screenshot"] else None
+    api_config = page_options.get("api_capture") if target["html"] else None
+    result = {
+        "name": target["name"], "screenshot_path": None, "html_path": None, "json_path": None, "error": None, "ready_ms": None
+    }
+    page = await context.new_page()
+    try:
+        api_responses = start_api_capture(page, api_config) if api_config else None
+        # 対象ごとに期待するワールドカード数などを上書きできる
+        target_readiness = dict(readiness, **target.get("readiness", {}))
+        if lean_config:
+            await setup_lean_routing(page, lean_config)
+        # leanモードではCookieバナーのスクリプトも遮断されるため、閉鎖処理は行わない
+        result["ready_ms"] = await prepare_page_async(
+            page, target["url"], dismiss_cookie_banner=not lean_config, readiness=target_readiness
+        )
+
+        timestamp = generate_timestamp()
+        record_capture_latency(target_readiness, target["name"], target["url"], timestamp, result["ready_ms"])
+        if target["screenshot"]:
+            os.makedirs(target["screenshot_dir"], exist_ok=True)
+            result["screenshot_path"], _ = await take_page_screenshot_async(
+                page, target["screenshot_dir"], f"{target['name']}_{timestamp}", screenshot_options
+            )
+        if target["html"]:
+            os.makedirs(target["html_dir"], exist_ok=True)
+            if stores_html(page_options):
+                prune_config = page_options.get("html_prune")
+                cards = await page.evaluate(WORLD_CARDS_HTML_JS) if prune_config else None
+                page_html = await page.content() if page_content_needed(prune_config, cards) else None
+                result["html_path"], _ = write_page_html(
+                    target["html_dir"], f"{target['name']}_{timestamp}", page_html, cards, html_storage, prune_config
+                )
+            await record_world_counts_async(
+                page, target["html_dir"], f"{target['name']}_{timestamp}", target["url"], records_config
+            )
+            if api_config:
+                # APIレスポンスをJSONファイルに保存（analyze_html はHTMLの代わりにこれを読む）
+                result["json_path"] = write_api_capture(
+                    target["html_dir"], f"{target['name']}_{timestamp}", target["url"], timestamp,
+                    await collect_api_responses_async(api_responses), api_config,
+                )
+    finally:
+        await page.close()
+
+    # 前回から変化が無ければマーカーに置き換える（HTMLが変化した場合はスクリーンショットも保存）
+    html_unchanged = False
+    if result["html_path"]:
+        result["html_path"], html_unchanged = deduplicate_snapshot(result["html_path"], dedup_config)
+    if result["screenshot_path"]:
+        result["screenshot_path"], _ = deduplicate_snapshot(
+            result["screenshot_path"], dedup_config, force_changed=bool(result["html_path"]) and not html_unchanged
+        )
+    return result
+
+
+async def _worker(
+    context, queue, results, readiness, screenshot_options, dedup_config, html_storage, records_config, page_options
+):
+    """ブラウザコンテキストを1つ使い、キューから対象を順に処理する"""
+    while True:
+        try:
+            index, target = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        try:
+            results[index] = await capture_target(
+                context,
+                target,
+                readiness=readiness,
+                screenshot_options=screenshot_options,
+                dedup_config=dedup_config,
+                html_storage=html_storage,
+                records_config=records_config,
+                page_options=page_options,
+            )
+        except Exception as e:
+            print(f"警告: {target['name']} の取得に失敗しました: {e}")
+            results[index] = {
+                "name": target["name"], "screenshot_path": None, "html_path": None, "json_path": None, "error": str(e),
+                "ready_ms": None,
+            }
+
+
+async def capture_with_contexts(
+    contexts, targets, readiness=None, screenshot_options=None, dedup_config=None, html_storage=None, records_config=None,
+    page_options=None,
+):
+    """与えられたブラウザコンテキストで全対象を並列取得する（並列数はコンテキスト数）
+    結果はtargetsと同じ順序で返す"""
+    queue = asyncio.Queue()
+    for index, target in enumerate(targets):
+        queue.put_nowait((index, target))
+    results = [None] * len(targets)
+    await asyncio.gather(*(
+        _worker(
+            context, queue, results, readiness, screenshot_options, dedup_config, html_storage, records_config, page_options
+        )
+        for context in contexts
+    ))
+    return results
+
+
+async def new_capture_context(browser):
+    """取得用のブラウザコンテキストを作成する"""
+    return await browser.new_context(viewport={"width": 1920, "height": 1080})
+
+
+async def capture_all(
+    targets, concurrency=DEFAULT_CONCURRENCY, readiness=None, screenshot_options=None, dedup_config=None, html_storage=None,
+    records_config=None, page_options=None,
+):
+    """1つのChromiumプロセス内で、最大concurrency個のコンテキストを使って全対象を並列取得する
+    結果はtargetsと同じ順序で返す"""
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            worker_count = max(1, min(concurrency, len(targets)))
+            contexts = [await new_capture_context(browser) for _ in range(worker_count)]
+            results = await capture_with_contexts(
+                contexts,
+                targets,
+                readiness=readiness,
+                screenshot_options=screenshot_options,
+                dedup_config=dedup_config,
+                html_storage=html_storage,
+                records_config=records_config,
+                page_options=page_options,
+            )
+        finally:
+            await browser.close()
+
+    return results
+
+
+def run_capture():
+    """config.json の対象をすべて取得する"""
+    config = load_config()
+    targets = get_targets(config)
+    concurrency = config.get("capture", {}).get("concurrency", DEFAULT_CONCURRENCY)
+    page_options = get_page_options(config)
+    warn_unsupported_page_options(targets, page_options)
+    print(f"{len(targets)} 件の対象を並列数 {concurrency} で取得します。")
+    return asyncio.run(capture_all(
+        targets,
+        concurrency=concurrency,
+        readiness=get_readiness_config(config),
+        screenshot_options=get_screenshot_options(config),
+        dedup_config=get_dedup_config(config),
+        html_storage=get_html_storage_config(config),
+        records_config=get_world_records_config(config),
+        page_options=page_options,
+    ))
+
+
+if __name__ == "__main__":
+    try:
+        results = run_capture()
+        failed = False
+        for result in results:
+            if result["error"]:
+                failed = True
+                print(f"[{result['name']}] 失敗: {result['error']}")
+                continue
+            if result["screenshot_path"]:
+                print(f"[{result['name']}] Saved screenshot: {result['screenshot_path']}")
+            if result["html_path"]:
+                print(f"[{result['name']}] Saved HTML: {result['html_path']}")
+            if result["json_path"]:
+                print(f"[{result['name']}] Saved JSON: {result['json_path']}")
+        if failed:
+            sys.exit(1)
+    except Exception as e:
+        print(f"エラーが発生しました: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
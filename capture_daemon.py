@@ -0,0 +1,269 @@
+import sys
+import json
+import asyncio
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from playwright.async_api import async_playwright
+from capture import get_readiness_config, get_screenshot_options, get_page_options
+from snapshot_dedup import get_dedup_config
+from html_storage import get_html_storage_config
+from capture_records import get_world_records_config
+from capture_async import (
+    get_targets, capture_with_contexts, new_capture_context, warn_unsupported_page_options, DEFAULT_CONCURRENCY,
+)
+
+
+DEFAULT_MAX_CAPTURES_PER_BROWSER = 200
+DEFAULT_CONTEXT_MAX_USES = 20
+
+# cron式の各フィールドの範囲（分・時・日・月・曜日）
+CRON_FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+
+def load_config():
+    """config.json を読み込む"""
+    with open("config.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def parse_cron_field(field, min_value, max_value):
+    """cron式の1フィールド（*, */n, a-b, a-b/n, カンマ区切り）を値の集合に変換する"""
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_str = part.split("/", 1)
+            step = int(step_str)
+        if part == "*":
+            start, end = min_value, max_value
+        elif "-" in part:
+            start_str, end_str = part.split("-", 1)
+            start, end = int(start_str), int(end_str)
+        else:
+            start = int(part)
+            end = max_value if step > 1 else start
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def parse_cron(expression):
+    """5フィールドのcron式（分 時 日 月 曜日）を解析する"""
+    fields = expression.split()
+    if len(fields) != 5:
+        raise ValueError(f"cron式は5フィールドで指定してください: {expression}")
+    minutes, hours, days, months, weekdays = (
+        parse_cron_field(field, low, high) for field, (low, high) in zip(fields, CRON_FIELD_RANGES)
+    )
+    # 曜日の7は日曜日（0）として扱う
+    if 7 in parse_cron_field(fields[4], 0, 7):
+        weekdays.add(0)
+    return {
+        "minutes": minutes,
+        "hours": hours,
+        "days": days,
+        "months": months,
+        "weekdays": weekdays,
+        "days_restricted": fields[2] != "*",
+        "weekdays_restricted": fields[4] != "*",
+    }
+
+
+def _cron_day_matches(cron, dt):
+    """日付がcron式の日・月・曜日の条件を満たすか（日と曜日が両方指定された場合はいずれか一致で可）"""
+    if dt.month not in cron["months"]:
+        return False
+    day_ok = dt.day in cron["days"]
+    weekday_ok = (dt.weekday() + 1) % 7 in cron["weekdays"]
+    if cron["days_restricted"] and cron["weekdays_restricted"]:
+        return day_ok or weekday_ok
+    return day_ok and weekday_ok
+
+
+def next_cron_time(cron, after):
+    """after より後で cron式に一致する最初の時刻を返す"""
+    dt = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = dt + timedelta(days=366 * 4)
+    while dt < limit:
+        if not _cron_day_matches(cron, dt):
+            dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+            continue
+        if dt.hour not in cron["hours"]:
+            dt = (dt + timedelta(hours=1)).replace(minute=0)
+            continue
+        if dt.minute not in cron["minutes"]:
+            dt += timedelta(minutes=1)
+            continue
+        return dt
+    raise ValueError("cron式に一致する時刻が見つかりませんでした")
+
+
+def build_schedules(config, targets):
+    """daemon.schedules から実行スケジュールの一覧を作成する
+    各スケジュールは cron（JSTのcron式）または interval_sec（秒間隔）と、対象名の一覧 targets（省略時は全対象）を持つ"""
+    targets_by_name = {target["name"]: target for target in targets}
+    schedules = []
+    for schedule_config in config.get("daemon", {}).get("schedules", []):
+        names = schedule_config.get("targets")
+        schedule = {
+            "targets": [targets_by_name[name] for name in names] if names else list(targets),
+            "cron": parse_cron(schedule_config["cron"]) if "cron" in schedule_config else None,
+            "interval_sec": schedule_config.get("interval_sec"),
+            "next_run": None,
+        }
+        if schedule["cron"] is None and not schedule["interval_sec"]:
+            raise ValueError(f"スケジュールには cron か interval_sec を指定してください: {schedule_config}")
+        schedules.append(schedule)
+    return schedules
+
+
+def compute_next_run(schedule, now):
+    """スケジュールの次回実行時刻を計算する"""
+    if schedule["cron"] is not None:
+        return next_cron_time(schedule["cron"], now)
+    return now + timedelta(seconds=schedule["interval_sec"])
+
+
+class CaptureDaemon:
+    """Chromiumを起動したまま保持し、スケジュールに従って取得を繰り返す常駐プロセス
+    一定回数の取得後やブラウザのクラッシュ後はブラウザを再起動し、コンテキストは一定回数ごとに作り直す"""
+
+    def __init__(self, config):
+        daemon_config = config.get("daemon", {})
+        self.targets = get_targets(config)
+        self.schedules = build_schedules(config, self.targets)
+        self.concurrency = config.get("capture", {}).get("concurrency", DEFAULT_CONCURRENCY)
+        self.readiness = get_readiness_config(config)
+        self.screenshot_options = get_screenshot_options(config)
+        self.dedup_config = get_dedup_config(config)
+        self.html_storage = get_html_storage_config(config)
+        self.records_config = get_world_records_config(config)
+        self.page_options = get_page_options(config)
+        warn_unsupported_page_options(self.targets, self.page_options)
+        self.max_captures_per_browser = daemon_config.get("max_captures_per_browser", DEFAULT_MAX_CAPTURES_PER_BROWSER)
+        self.context_max_uses = daemon_config.get("context_max_uses", DEFAULT_CONTEXT_MAX_USES)
+        self.jst = ZoneInfo("Asia/Tokyo")
+        self.playwright = None
+        self.browser = None
+        self.contexts = []  # [コンテキスト, 使用回数] のリスト
+        self.capture_count = 0
+
+    async def _launch_browser(self):
+        """ブラウザを起動する"""
+        self.browser = await self.playwright.chromium.launch(headless=True)
+        self.contexts = []
+        self.capture_count = 0
+        print("ブラウザを起動しました。")
+
+    async def _close_browser(self):
+        """ブラウザを終了する（クラッシュ済みの場合も含む）"""
+        if self.browser is not None:
+            try:
+                await self.browser.close()
+            except Exception:
+                pass
+        self.browser = None
+        self.contexts = []
+
+    async def _get_contexts(self, count):
+        """使用回数の上限に達したコンテキストを作り直し、count個のコンテキストを返す"""
+        if self.browser is None or not self.browser.is_connected():
+            await self._close_browser()
+            await self._launch_browser()
+
+        fresh = []
+        for context, uses in self.contexts:
+            if uses >= self.context_max_uses:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            else:
+                fresh.append([context, uses])
+        while len(fresh) < count:
+            fresh.append([await new_capture_context(self.browser), 0])
+        self.contexts = fresh
+        return self.contexts[:count]
+
+    async def run_job(self, targets):
+        """対象を取得する。失敗時はブラウザを再起動して次回に備える"""
+        try:
+            entries = await self._get_contexts(max(1, min(self.concurrency, len(targets))))
+            results = await capture_with_contexts(
+                [context for context, _ in entries],
+                targets,
+                readiness=self.readiness,
+                screenshot_options=self.screenshot_options,
+                dedup_config=self.dedup_config,
+                html_storage=self.html_storage,
+                records_config=self.records_config,
+                page_options=self.page_options,
+            )
+        except Exception as e:
+            print(f"エラー: 取得中にブラウザが異常終了しました。再起動します: {e}")
+            await self._close_browser()
+            return []
+
+        for entry in entries:
+            entry[1] += 1
+        self.capture_count += len(targets)
+
+        for result in results:
+            if result["error"]:
+                print(f"[{result['name']}] 失敗: {result['error']}")
+            else:
+                saved = [path for path in (result["screenshot_path"], result["html_path"], result["json_path"]) if path]
+                print(f"[{result['name']}] Saved: {', '.join(saved)}（準備完了: {result['ready_ms']}ms）")
+
+        if not self.browser.is_connected():
+            print("ブラウザとの接続が切れました。再起動します。")
+            await self._close_browser()
+        elif self.capture_count >= self.max_captures_per_browser:
+            print(f"取得回数が {self.max_captures_per_browser} 回に達したため、ブラウザを再起動します。")
+            await self._close_browser()
+        return results
+
+    async def run(self):
+        """スケジュールに従って取得を繰り返す"""
+        if not self.schedules:
+            raise ValueError("config.json の daemon.schedules が設定されていません。")
+
+        now = datetime.now(self.jst)
+        for schedule in self.schedules:
+            schedule["next_run"] = compute_next_run(schedule, now)
+
+        async with async_playwright() as p:
+            self.playwright = p
+            await self._launch_browser()
+            try:
+                while True:
+                    next_run = min(schedule["next_run"] for schedule in self.schedules)
+                    wait_sec = (next_run - datetime.now(self.jst)).total_seconds()
+                    if wait_sec > 0:
+                        print(f"次回の取得: {next_run.strftime('%Y-%m-%d %H:%M:%S')} JST")
+                        await asyncio.sleep(wait_sec)
+
+                    now = datetime.now(self.jst)
+                    due = [schedule for schedule in self.schedules if schedule["next_run"] <= now]
+                    # 同時刻に実行されるスケジュールの対象はまとめて1回だけ取得する
+                    targets = []
+                    for schedule in due:
+                        for target in schedule["targets"]:
+                            if target not in targets:
+                                targets.append(target)
+                        schedule["next_run"] = compute_next_run(schedule, now)
+                    await self.run_job(targets)
+            finally:
+                await self._close_browser()
+
+
+if __name__ == "__main__":
+    try:
+        daemon = CaptureDaemon(load_config())
+        asyncio.run(daemon.run())
+    except KeyboardInterrupt:
+        print("常駐取得を終了しました。")
+    except Exception as e:
+        print(f"エラーが発生しました: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
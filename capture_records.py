@@ -0,0 +1,79 @@
+import os
+import json
+
+# ブラウザ内抽出の記録の既定値（config.json の world_records で上書き）
+DEFAULT_WORLD_RECORDS = {
+    "enabled": True,
+    "filename": "world_records.jsonl",  # HTMLの保存先ディレクトリ内に作成する
+    # 取得時にSQLiteのデータベースにも書き込むか（analysis.storage が "sqlite" で、取得と解析が同じ環境で動く場合のみ）
+    # 取得と解析を別の環境で動かす場合（GitHub Actions など）、取得側のデータベースは解析側に届かないため false にする
+    "write_sqlite": False,
+    # 取得1回分のゾーンデータも書き込むSQLiteのデータベース（write_sqlite が有効な場合に設定される）
+    "sqlite_path": None,
+    "zones": [],  # ゾーンの短い名前（config.json の zones）
+}
+
+
+def get_world_records_config(config):
+    """config.json の world_records を既定値とマージして返す"""
+    records_config = dict(DEFAULT_WORLD_RECORDS)
+    records_config.update(config.get("world_records", {}))
+    analysis_config = config.get("analysis", {})
+    if records_config["write_sqlite"] and analysis_config.get("storage") == "sqlite":
+        # sqlite_store は pandas を使うため、SQLiteに書き込む場合だけ読み込む（取得だけの環境に pandas は不要）
+        from sqlite_store import DEFAULT_SQLITE_PATH
+        records_config["sqlite_path"] = analysis_config.get("sqlite_path") or DEFAULT_SQLITE_PATH
+        records_config["zones"] = [zone["short_name"] for zone in config.get("zones", []) if zone.get("short_name")]
+    return records_config
+
+
+def get_world_records_path(html_dir, records_config=None):
+    """HTMLの保存先ディレクトリに対応する記録ファイルのパス"""
+    if records_config is None:
+        records_config = DEFAULT_WORLD_RECORDS
+    return os.path.join(html_dir, records_config["filename"])
+
+
+def append_world_record(html_dir, snapshot, url, worlds, records_config=None):
+    """取得1回分のワールドごとの数値を記録ファイルに1行（JSON）追記し、記録ファイルのパスを返す
+    snapshot は拡張子を除いたスナップショット名（例: IPTeCA_20260130_181446_JST）
+    worlds は WORLD_RECORDS_JS の結果（world_id・title・visitors・likes のリスト、見つからなかった数値は None）"""
+    records_path = get_world_records_path(html_dir, records_config)
+    if not worlds:
+        print("警告: ブラウザ内でワールドカードの数値を抽出できませんでした。ページの構造が変わった可能性があります。")
+    else:
+        missing = [world["title"] for world in worlds if world["visitors"] is None or world["likes"] is None]
+        if missing:
+            print(f"警告: 来場者数またはいいね数を抽出できなかったワールドがあります: {', '.join(missing)}")
+    record = {"snapshot": snapshot, "url": url, "worlds": worlds}
+    os.makedirs(html_dir, exist_ok=True)
+    # 1行を1回の write で追記する（複数の取得プロセスが同時に追記しても行が混ざらない）
+    with open(records_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    if worlds and records_config is not None and records_config.get("sqlite_path"):
+        # 解析（analyze_html）と同時に動いても、データベースへの書き込みは順番に行われる（WALモード）
+        # 抽出できなかった取得は書き込まず、analyze_html がHTMLを解析した結果を書き込む
+        try:
+            from sqlite_store import write_capture
+            write_capture(records_config["sqlite_path"], snapshot, worlds, records_config["zones"])
+        except Exception as e:
+            print(f"警告: SQLiteのデータベースに書き込めませんでした（記録ファイルには保存済み）: {e}")
+    return records_path
+
+
+def load_world_records(records_path):
+    """記録ファイルを読み込み、スナップショット名 → ワールドのリストの辞書を返す（ファイルが無い場合は空）
+    同じスナップショットの記録が複数ある場合は後のものを使い、壊れた行は読み飛ばす"""
+    records = {}
+    if not records_path or not os.path.exists(records_path):
+        return records
+    with open(records_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                records[record["snapshot"]] = record["worlds"]
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"警告: {records_path} の {line_number} 行目を読み込めませんでした: {e}")
+    return records
@@ -0,0 +1,175 @@
+import os
+import json
+import hashlib
+import pandas as pd
+
+
+class AppendOnlyCsvStore:
+    """追記のみで更新するCSVのデータストア
+    実行ごとに1回だけ読み込み、キー列の組ごとに比較列の値を記録した索引を作る。
+    追加する行のうち、キーが無いものと比較列の値が変わったものだけをファイル末尾に追記する（既存の行は書き換えない）。
+    同じキーの行が複数ある場合は後の行を使う（古い行が一定の割合を超えたら compact で書き直す）"""
+
+    def __init__(self, path, key_columns, compare_columns, encoding="utf-8-sig", compact_ratio=0.25, compact_min_rows=100):
+        self.path = path
+        self.key_columns = key_columns
+        self.compare_columns = compare_columns
+        self.encoding = encoding
+        self.compact_ratio = compact_ratio  # 古い行（後の行で置き換えられた行）の割合がこれを超えたら書き直す
+        self.compact_min_rows = compact_min_rows
+        self.frame = None  # ファイルの全行（読み込み順、追記した行を含む）
+        self.index = {}  # キー → 比較列の値（最後の行のもの）
+        self.appended = 0
+        self.skipped = 0
+
+    def _keys(self, df):
+        """キー列を連結した文字列のSeries"""
+        keys = df[self.key_columns[0]].astype(str)
+        for column in self.key_columns[1:]:
+            keys = keys + "\x1f" + df[column].astype(str)
+        return keys
+
+    def _signatures(self, df):
+        """比較列の値を連結した文字列のSeries（数値は整数に揃え、欠損は0として比較する）"""
+        signature = pd.Series("", index=df.index)
+        for column in self.compare_columns:
+            if column in df.columns:
+                values = pd.to_numeric(df[column], errors="coerce").fillna(0).round().astype("int64").astype(str)
+            else:
+                values = pd.Series("0", index=df.index)
+            signature = signature + "\x1f" + values
+        return signature
+
+    def load(self):
+        """ファイルを読み込んで索引を作り、全行のDataFrameを返す（ファイルが無い場合は None）"""
+        if not os.path.exists(self.path):
+            self.frame = None
+            self.index = {}
+            return None
+        self.frame = pd.read_csv(self.path, encoding=self.encoding)
+        self.index = dict(zip(self._keys(self.frame), self._signatures(self.frame)))
+        return self.frame
+
+    def latest(self):
+        """キーごとに最後の行だけを残したDataFrame（ファイルの順序のまま）"""
+        if self.frame is None:
+            return None
+        return self.frame.drop_duplicates(subset=self.key_columns, keep="last")
+
+    def append(self, df_new):
+        """新しい行のうち、未登録のキーと値が変わったキーの行だけを追記し、追記した行数を返す"""
+        keys = self._keys(df_new)
+        signatures = self._signatures(df_new)
+        changed = pd.Series(
+            [self.index.get(key) != signature for key, signature in zip(keys, signatures)], index=df_new.index, dtype=bool
+        )
+        df_append = df_new[changed]
+        self.skipped += len(df_new) - len(df_append)
+        if df_append.empty:
+            return 0
+
+        if self.frame is None:
+            self.frame = df_append.reset_index(drop=True)
+            self._rewrite(self.frame)
+        elif set(df_append.columns) - set(self.frame.columns):
+            # 列が増えた場合（ゾーンの追加など）はヘッダーを変えるため全体を書き直す
+            self.frame = pd.concat([self.frame, df_append], ignore_index=True)
+            self._rewrite(self.frame)
+        else:
+            self._ensure_trailing_newline()
+            df_append = df_append.reindex(columns=self.frame.columns)
+            df_append.to_csv(self.path, mode="a", header=False, index=False, encoding=self.encoding)
+            self.frame = pd.concat([self.frame, df_append], ignore_index=True)
+        self.index.update(zip(keys[changed], signatures[changed]))
+        self.appended += len(df_append)
+
+        superseded = len(self.frame) - len(self.index)
+        if superseded >= self.compact_min_rows and superseded > len(self.frame) * self.compact_ratio:
+            self.compact()
+        return len(df_append)
+
+    def compact(self, sort_by=None):
+        """同じキーの古い行を除いてファイルを書き直す（sort_by を指定すると並べ替える）"""
+        if self.frame is None:
+            return
+        df = self.latest()
+        if sort_by:
+            df = df.sort_values(sort_by, kind="stable")
+        self.frame = df.reset_index(drop=True)
+        self._rewrite(self.frame)
+        print(f"データストアを整理しました: {self.path}（{len(self.frame)} 行）")
+
+    def _rewrite(self, df):
+        """ファイル全体を書き直す（一時ファイルに書いてから置き換える）"""
+        store_dir = os.path.dirname(self.path)
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        df.to_csv(temp_path, index=False, encoding=self.encoding)
+        os.replace(temp_path, self.path)
+
+    def _ensure_trailing_newline(self):
+        """手動で編集したファイルの末尾に改行が無い場合に補う（追記した行が前の行に繋がらないように）"""
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) not in (b"\n", b"\r"):
+                f.write(b"\n")
+
+
+class SnapshotDigests:
+    """スナップショットごとに、前回データストアに書き込んだ抽出結果のダイジェストを記録するファイル
+    内容が前回と同じスナップショットを見分け、新しいスナップショットと値が変わったスナップショットだけをデータストアに渡すために使う。
+    scope（ゾーンの設定など、書き込む行の内容を決めるもの）が変わった場合は記録全体を無効にする。
+    データストアは行を削除しないため、HTMLが削除されたスナップショットの記録も残す"""
+
+    def __init__(self, path, scope=""):
+        self.path = path
+        self.scope = scope
+        self.digests = {}
+        self.pending = {}  # 今回書き込むスナップショットのダイジェスト（save で記録に反映する）
+        self.unchanged = 0
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"警告: スナップショットの記録の読み込みに失敗しました。全件を書き込みます: {e}")
+                data = {}
+            if data.get("scope") == scope:
+                self.digests = data.get("snapshots", {})
+
+    @staticmethod
+    def digest(value):
+        """JSONにできる値（抽出結果など）のダイジェスト（辞書の順序も含める）"""
+        text = json.dumps(value, ensure_ascii=False)
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+    def changed(self, key, digest):
+        """key のスナップショットが前回書き込んだ内容から変わったか（新しい場合も True、save まで記録は変えない）"""
+        if self.digests.get(key) == digest:
+            self.unchanged += 1
+            return False
+        self.pending[key] = digest
+        return True
+
+    def clear(self):
+        """記録をすべて無効にする（データストアを作り直す場合に、全件を書き込むため）"""
+        self.digests = {}
+
+    def save(self):
+        """今回書き込んだスナップショットのダイジェストを記録に反映して保存する（データストアへの書き込み後に呼ぶ）"""
+        if not self.path:
+            return
+        self.digests.update(self.pending)
+        self.pending = {}
+        store_dir = os.path.dirname(self.path)
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"scope": self.scope, "snapshots": dict(sorted(self.digests.items()))}, f, ensure_ascii=False, indent=0)
+            f.write("\n")
+        os.replace(temp_path, self.path)
@@ -0,0 +1,104 @@
+import os
+import json
+import hashlib
+
+
+class ExtractionIndex:
+    """解析済みファイルの抽出結果を保持する永続インデックス
+    ファイル名ごとにサイズ・内容のハッシュ・抽出結果を記録し、内容が変わらないファイルは再解析しない
+    更新日時はチェックアウトのたびに変わるため保存せず、同じプロセス内で同じファイルを再び参照する場合の省略にだけ使う
+    （ファイルに保存する内容は解析対象が変わらない限り同じになり、内容が変わらない場合はファイルを書き換えない）
+    抽出処理のバージョン（extractor_version）が変わった場合はインデックス全体を無効にする
+    base_dir（解析対象のファイルがあるディレクトリ）を指定すると、保存時にそこに無くなったファイルの項目を除く"""
+
+    def __init__(self, path, extractor_version, base_dir=None):
+        self.path = path
+        self.extractor_version = extractor_version
+        self.base_dir = base_dir
+        self.entries = {}
+        self._pending = {}  # lookup で見つからなかったファイルのサイズ・ハッシュ（store で使用）
+        self._checked = {}  # このプロセスで確認済みのファイル → (サイズ, 更新日時)
+        self.changed = False  # 保存が必要か
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    index_data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"警告: 抽出インデックスの読み込みに失敗しました。全件を解析します: {e}")
+                index_data = {}
+            if index_data.get("extractor_version") == extractor_version:
+                self.entries = index_data.get("files", {})
+                for entry in self.entries.values():
+                    # 以前のインデックスに保存していた更新日時は使わない
+                    self.changed |= entry.pop("mtime", None) is not None
+            else:
+                self.changed = True
+            if index_data and index_data.get("extractor_version") != extractor_version:
+                print(f"抽出処理のバージョンが変わったため、抽出インデックスを作り直します: {index_data.get('extractor_version')} → {extractor_version}")
+
+    @staticmethod
+    def _file_hash(file_path):
+        """ファイル内容のSHA-256"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def lookup(self, file_path):
+        """file_path の記録済みの抽出結果を返す（インデックスに無い・内容が変わった場合は None）
+        サイズと内容のハッシュが一致すれば再利用する（同じプロセスで確認済みのファイルは、サイズと更新日時が同じならハッシュを求めない）"""
+        key = os.path.basename(file_path)
+        stat = os.stat(file_path)
+        entry = self.entries.get(key)
+        if entry and self._checked.get(file_path) == (stat.st_size, stat.st_mtime):
+            self.hits += 1
+            return entry["result"]
+
+        file_hash = self._file_hash(file_path)
+        if entry and entry["size"] == stat.st_size and entry["sha256"] == file_hash:
+            self._checked[file_path] = (stat.st_size, stat.st_mtime)
+            self.hits += 1
+            return entry["result"]
+
+        self._pending[key] = {"size": stat.st_size, "sha256": file_hash}
+        return None
+
+    def store(self, file_path, result):
+        """lookup で見つからなかった file_path の抽出結果を記録する"""
+        key = os.path.basename(file_path)
+        self.entries[key] = dict(self._pending.pop(key), result=result)
+        stat = os.stat(file_path)
+        self._checked[file_path] = (stat.st_size, stat.st_mtime)
+        self.changed = True
+        self.misses += 1
+
+    def get_or_extract(self, file_path, extract):
+        """file_path の抽出結果を返す。インデックスに無い・内容が変わった場合のみ extract(file_path) を実行する"""
+        result = self.lookup(file_path)
+        if result is None:
+            result = extract(file_path)
+            self.store(file_path, result)
+        return result
+
+    def save(self):
+        """インデックスを保存する（base_dir から削除されたファイルの項目は除く）
+        今回参照しなかったファイル（since / until の範囲外など）の項目は残す。内容が変わらない場合は書き換えない"""
+        if not self.path:
+            return
+        files = {
+            key: self.entries[key] for key in sorted(self.entries)
+            if self.base_dir is None or os.path.exists(os.path.join(self.base_dir, key))
+        }
+        if not self.changed and len(files) == len(self.entries) and os.path.exists(self.path):
+            return
+        index_dir = os.path.dirname(self.path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"extractor_version": self.extractor_version, "files": files}, f, ensure_ascii=False, indent=1)
+            f.write("\n")
+        self.entries = files
+        self.changed = False
@@ -1,9 +1,15 @@
 import os
 import sys
 import json
-from datetime import datetime
-from zoneinfo import ZoneInfo
 from playwright.sync_api import sync_playwright
+from snapshot_dedup import get_dedup_config, deduplicate_snapshot
+from html_storage import get_html_storage_config
+from capture_records import get_world_records_config
+from capture import (
+    prepare_page, generate_timestamp, get_readiness_config, get_page_options, stores_html, setup_lean_routing,
+    start_api_capture, collect_api_responses, write_api_capture, page_content_needed, write_page_html,
+    record_capture_latency, record_world_counts, WORLD_CARDS_HTML_JS,
+)
 
 
 def load_config():
@@ -12,12 +18,35 @@ def load_config():
         return json.load(f)
 
 
-def fetch_html():
-    """HTMLを取得する"""
+def load_page(page, url, lean_config=None, readiness=None):
+    """ページを読み込み、準備完了までのミリ秒を返す
+    lean_configが指定された場合は不要なリソースを遮断して読み込む"""
+    if lean_config is not None:
+        setup_lean_routing(page, lean_config)
+        # Cookieバナーのスクリプトも遮断されるため、閉鎖処理は行わない
+        return prepare_page(page, url, dismiss_cookie_banner=False, readiness=readiness)
+    return prepare_page(page, url, readiness=readiness)
+
+
+def fetch_html(lean=None, url=None, save_dir="html", api_config=None, readiness=None, prune=None):
+    """HTMLを取得する
+    lean=True の場合は config.json の lean_fetch に従って不要なリソースを遮断する（省略時は lean_fetch.enabled）
+    prune=True の場合はワールドカードだけを残したHTMLを保存する（省略時は html_prune.enabled）
+    html_prune.full_page_dir を指定すると、ページ全体のHTMLもそのディレクトリに保存する
+    api_capture が有効な場合は一致したAPIレスポンスを同名の .json に保存する（store が "json_only" ならHTMLは保存しない）
+    world_records が有効な場合はブラウザ内で抽出したワールドごとの数値を save_dir の記録ファイルに追記する
+    保存したファイルのパスのリストを返す"""
     config = load_config()
-    screenshot_config = config["screenshot"]
-    url = screenshot_config["url"]
-    save_dir = "html"  # HTML保存ディレクトリ
+    if url is None:
+        url = config["screenshot"]["url"]
+    page_options = get_page_options(config, lean=lean, api_config=api_config, prune=prune)
+    api_config = page_options["api_capture"]
+    if readiness is None:
+        readiness = get_readiness_config(config)
+    prune_config = page_options["html_prune"]
+    html_storage = get_html_storage_config(config)
+    records_config = get_world_records_config(config)
+    saved_files = []
     
     # ディレクトリが無ければ作成
     os.makedirs(save_dir, exist_ok=True)
@@ -25,42 +54,47 @@ def fetch_html():
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True)
         page = browser.new_page(viewport={"width": 1920, "height": 1080})
-        page.goto(url)
-        page.wait_for_load_state("networkidle")
-        
-        # Cookieバナーの閉鎖処理
-        for selector in ["text=Allow all", "text=すべて許可"]:
-            try:
-                page.click(selector, timeout=3000)
-                break
-            except:
-                pass
-        
-        # 下部までスクロールして表示を更新
-        page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        page.wait_for_timeout(1500)
+        api_responses = start_api_capture(page, api_config) if api_config else None
+        ready_ms = load_page(page, url, page_options["lean_fetch"], readiness=readiness)
         
-        # 日本時間（JST）でYYYYMMDD_HHMMSS_JST形式のタイムスタンプを生成
-        jst = ZoneInfo("Asia/Tokyo")
-        timestamp = datetime.now(jst).strftime("%Y%m%d_%H%M%S_JST")
-        filename = f"{save_dir}/IPTeCA_{timestamp}.html"
+        timestamp = generate_timestamp()
+        record_capture_latency(readiness, "IPTeCA", url, timestamp, ready_ms)
+        # ブラウザ内でワールドごとの数値を抽出して記録する（HTMLを保存しない場合も記録する）
+        record_world_counts(page, save_dir, f"IPTeCA_{timestamp}", url, records_config)
         
-        # HTMLコンテンツを取得
-        html_content = page.content()
+        if stores_html(page_options):
+            # HTMLコンテンツを取得（prune の場合はワールドカードだけを切り出す）
+            cards = page.evaluate(WORLD_CARDS_HTML_JS) if prune_config else None
+            page_html = page.content() if page_content_needed(prune_config, cards) else None
+            filename, full_page_path = write_page_html(
+                save_dir, f"IPTeCA_{timestamp}", page_html, cards, html_storage, prune_config
+            )
+            if full_page_path:
+                saved_files.append(full_page_path)
+            
+            # 前回から変化が無ければマーカーに置き換える
+            filename, _ = deduplicate_snapshot(filename, get_dedup_config(config))
+            saved_files.append(filename)
         
-        # HTMLファイルに保存
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(html_content)
+        if api_config:
+            # APIレスポンスをJSONファイルに保存
+            saved_files.append(write_api_capture(
+                save_dir, f"IPTeCA_{timestamp}", url, timestamp, collect_api_responses(api_responses), api_config
+            ))
         
         browser.close()
     
-    return filename
+    return saved_files
 
 
 if __name__ == "__main__":
     try:
-        filename = fetch_html()
-        print(f"Saved HTML: {filename}")
+        saved_files = fetch_html(
+            lean=True if "--lean" in sys.argv[1:] else None,
+            prune=True if "--prune" in sys.argv[1:] else None,
+        )
+        for filename in saved_files:
+            print(f"Saved: {filename}")
     except Exception as e:
         print(f"エラーが発生しました: {e}")
         import traceback
@@ -0,0 +1,111 @@
+import io
+import gzip
+
+
+# 圧縮方式ごとのHTMLファイルの拡張子
+HTML_STORAGE_EXTENSIONS = {
+    "none": ".html",
+    "gzip": ".html.gz",
+    "zstd": ".html.zst",
+}
+
+# 読み込み可能なHTMLファイルの拡張子（長いものから順に判定する）
+HTML_EXTENSIONS = tuple(sorted(HTML_STORAGE_EXTENSIONS.values(), key=len, reverse=True))
+
+# HTML保存の既定値（config.json の html_storage で上書き）
+DEFAULT_HTML_STORAGE = {
+    "compression": "none",  # "none" / "gzip" / "zstd"
+    "level": None,  # 圧縮レベル（None は各方式の既定値: gzip 9, zstd 3）
+}
+
+
+def get_html_storage_config(config):
+    """config.json の html_storage を既定値とマージして返す"""
+    storage = dict(DEFAULT_HTML_STORAGE)
+    storage.update(config.get("html_storage", {}))
+    if storage["compression"] not in HTML_STORAGE_EXTENSIONS:
+        raise ValueError(f"html_storage.compression は {list(HTML_STORAGE_EXTENSIONS)} のいずれかを指定してください: {storage['compression']}")
+    return storage
+
+
+def is_html_path(path):
+    """HTMLファイル（圧縮済みを含む）のパスかどうか"""
+    return path.endswith(HTML_EXTENSIONS)
+
+
+def strip_html_extension(path):
+    """HTMLファイルのパスから拡張子（.html / .html.gz / .html.zst）を除いたものを返す"""
+    for ext in HTML_EXTENSIONS:
+        if path.endswith(ext):
+            return path[:-len(ext)]
+    return path
+
+
+def _zstandard():
+    """zstandard モジュールを読み込む（zstd を使う場合のみ必要）"""
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd形式のHTMLを扱うには zstandard が必要です: pip install zstandard")
+    return zstandard
+
+
+def compress_html(html_content, compression, level=None):
+    """HTML文字列を指定の方式で圧縮したバイト列を返す"""
+    data = html_content.encode("utf-8")
+    if compression == "gzip":
+        # mtime=0 で同じ内容からは同じバイト列になるようにする
+        return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+    if compression == "zstd":
+        return _zstandard().ZstdCompressor(level=3 if level is None else level).compress(data)
+    return data
+
+
+def write_html(base_path, html_content, storage=None):
+    """HTMLを html_storage の設定に従って保存し、保存したパスを返す
+    base_path は拡張子を除いたパス（例: html/IPTeCA_20260101_000000_JST）"""
+    storage = storage or DEFAULT_HTML_STORAGE
+    path = base_path + HTML_STORAGE_EXTENSIONS[storage["compression"]]
+    with open(path, "wb") as f:
+        f.write(compress_html(html_content, storage["compression"], storage.get("level")))
+    return path
+
+
+def open_html(path):
+    """HTMLファイル（.html / .html.gz / .html.zst）をテキストストリームとして開く"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".zst"):
+        raw = open(path, "rb")
+        reader = _zstandard().ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(reader, encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def read_html(path):
+    """HTMLファイル（.html / .html.gz / .html.zst）を文字列として読み込む"""
+    with open_html(path) as f:
+        return f.read()
+
+
+# ワールドカードだけを残したHTML（html_prune）の外枠
+PRUNED_HTML_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><meta name="ipteca-pruned" content="world-cards"></head>
+<body>
+{cards}
+</body></html>
+"""
+
+
+def build_pruned_html(card_html_list):
+    """ワールドカード（a[href^="/w/"]）のHTML断片のリストから最小限のHTML文書を作成する"""
+    return PRUNED_HTML_TEMPLATE.format(cards="\n".join(card_html_list))
+
+
+def prune_html(html_content):
+    """保存済みのページ全体のHTMLからワールドカードだけを残したHTMLを作成する
+    取得時にブラウザ内で行う切り出し（capture.WORLD_CARDS_HTML_JS）と同じ内容を、保存済みのHTMLに対して行う"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html_content, "html.parser")
+    cards = soup.find_all("a", href=lambda x: x and x.startswith("/w/"))
+    return build_pruned_html([str(card) for card in cards])
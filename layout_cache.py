@@ -0,0 +1,102 @@
+import os
+import json
+import hashlib
+
+
+def layout_fingerprint(family, tokens):
+    """カードの骨格（要素ごとの親の位置・タグ名・class・pathのdの先頭）からレイアウトの指紋を作る
+    family は解析器の系統（"bs4" / "selectolax"）で、要素の位置の数え方が異なるため指紋を分ける"""
+    digest = hashlib.sha1("\n".join(tokens).encode("utf-8")).hexdigest()[:20]
+    return f"{family}:{digest}"
+
+
+# 以前のキャッシュファイルに含まれていた、位置以外の項目（読み込み時に除く）
+LEGACY_ENTRY_KEYS = ("first_seen", "hits")
+
+
+class LayoutCache:
+    """カードのレイアウト（指紋）ごとに、タイトル・いいね数・来場者数の要素の位置を記録するキャッシュ
+    サイトの再デプロイまでカードの構造は変わらないため、既知のレイアウトのカードは全体の探索を省略して直接読む
+    位置はカード内の要素を文書順に数えた番号（カード自身が0、該当する要素が無い場合は None）
+    ファイルにはレイアウト → 位置の対応だけを保存し、ヒット数・ミス数と新しいレイアウトの最初のファイルは表示にだけ使う
+    （内容が変わらない限りファイルを書き換えないため）"""
+
+    def __init__(self, path=None, entries=None):
+        self.path = path
+        self.entries = {} if entries is None else entries
+        self.hits = {}  # 指紋ごとのヒット数（今回の実行分）
+        self.misses = 0
+        self.new_entries = {}  # 今回新しく記録したレイアウト → 最初に見つかったファイル（表示用）
+        self.source = None  # 解析中のファイル（新しいレイアウトの表示に使う）
+        self.changed = False  # 保存が必要か
+        if entries is None and path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    layouts = json.load(f).get("layouts", {})
+            except (OSError, ValueError) as e:
+                print(f"警告: レイアウトキャッシュの読み込みに失敗しました。作り直します: {e}")
+                layouts = {}
+            for fingerprint, entry in layouts.items():
+                positions = {key: value for key, value in entry.items() if key not in LEGACY_ENTRY_KEYS}
+                self.changed |= positions != entry
+                self.entries[fingerprint] = positions
+
+    def lookup(self, fingerprint):
+        """記録済みの位置を返す（未知のレイアウトは None）"""
+        entry = self.entries.get(fingerprint)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits[fingerprint] = self.hits.get(fingerprint, 0) + 1
+        return entry
+
+    def reject(self, fingerprint):
+        """lookup で返した記録がカードの内容と合わなかった場合に、ヒットをミスとして数え直す"""
+        self.hits[fingerprint] -= 1
+        self.misses += 1
+
+    def store(self, fingerprint, positions):
+        """未知のレイアウト（または記録と合わなかったレイアウト）で全体を探索した結果の位置を記録する"""
+        self.entries[fingerprint] = dict(positions)
+        self.new_entries.setdefault(fingerprint, self.source)
+        self.changed = True
+
+    def delta(self):
+        """ワーカープロセスでの結果（新しいレイアウト・ヒット数・ミス数）を親プロセスに返すための辞書"""
+        new = {fingerprint: (self.entries[fingerprint], source) for fingerprint, source in self.new_entries.items()}
+        return {"new": new, "hits": self.hits, "misses": self.misses}
+
+    def merge(self, delta):
+        """delta() の結果を取り込む（同じレイアウトを複数のワーカーが記録した場合は先のものを使う）"""
+        for fingerprint, (positions, source) in delta["new"].items():
+            if fingerprint not in self.new_entries:
+                self.entries[fingerprint] = positions
+                self.new_entries[fingerprint] = source
+                self.changed = True
+        for fingerprint, count in delta["hits"].items():
+            self.hits[fingerprint] = self.hits.get(fingerprint, 0) + count
+        self.misses += delta["misses"]
+
+    def report(self):
+        """ヒット・ミスの集計を表示する"""
+        hits = sum(self.hits.values())
+        total = hits + self.misses
+        rate = hits / total * 100 if total else 0.0
+        print(
+            f"レイアウトキャッシュ: ヒット {hits} 枚、ミス {self.misses} 枚（ヒット率 {rate:.1f}%）、"
+            f"新しいレイアウト {len(self.new_entries)} 件、記録済み {len(self.entries)} 件"
+        )
+        for fingerprint, source in self.new_entries.items():
+            print(f"  新しいレイアウト {fingerprint}（{source}）")
+
+    def save(self):
+        """レイアウト → 位置の対応を保存する（新しいレイアウトが無い場合は書き換えない）"""
+        if not self.path or not self.changed:
+            return
+        cache_dir = os.path.dirname(self.path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"layouts": self.entries}, f, ensure_ascii=False, indent=1)
+            f.write("\n")
+        self.changed = False
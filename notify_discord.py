@@ -2,8 +2,10 @@ import os
 import sys
 import json
 import glob
+import mimetypes
 from datetime import datetime, timezone, timedelta
 import requests
+from snapshot_dedup import UNCHANGED_SUFFIX, resolve_snapshot
 
 
 def load_config():
@@ -12,10 +14,16 @@ def load_config():
         return json.load(f)
 
 
-def get_latest_screenshot(save_dir):
-    """save_dir 以下の *.png ファイルを列挙して最新ファイルを取得"""
-    pattern = os.path.join(save_dir, "*.png")
-    files = glob.glob(pattern)
+# スクリーンショットとして扱う拡張子（config.json の screenshot.format に対応）
+SCREENSHOT_EXTENSIONS = [".png", ".jpg", ".webp"]
+
+
+def get_latest_screenshot_entry(save_dir):
+    """save_dir 以下のスクリーンショット（*.png, *.jpg, *.webp）と変化なしマーカー（*.same）を列挙して最新の取得を返す"""
+    files = []
+    for ext in SCREENSHOT_EXTENSIONS:
+        files.extend(glob.glob(os.path.join(save_dir, f"*{ext}")))
+        files.extend(glob.glob(os.path.join(save_dir, f"*{ext}{UNCHANGED_SUFFIX}")))
     
     if not files:
         return None
@@ -25,6 +33,14 @@ def get_latest_screenshot(save_dir):
     return latest_file
 
 
+def get_latest_screenshot(save_dir):
+    """最新のスクリーンショットの画像ファイルを取得（変化なしマーカーの場合は参照先の画像）"""
+    latest_entry = get_latest_screenshot_entry(save_dir)
+    if latest_entry is None:
+        return None
+    return resolve_snapshot(latest_entry)
+
+
 def get_jst_timezone():
     """JST（UTC+9）のtimezoneを取得"""
     return timezone(timedelta(hours=9))
@@ -53,8 +69,9 @@ def send_discord(title: str, body_md: str, image_path: str = None):
         # 画像ファイルがある場合はmultipart/form-dataで送信
         if image_path and os.path.exists(image_path):
             with open(image_path, "rb") as f:
+                mime_type = mimetypes.guess_type(image_path)[0] or "image/png"
                 files = {
-                    "file": (os.path.basename(image_path), f, "image/png")
+                    "file": (os.path.basename(image_path), f, mime_type)
                 }
                 data = {
                     "content": content
@@ -99,8 +116,9 @@ def check_and_notify():
         print("通知は無効化されています。スキップします。")
         return
     
-    # 最新ファイルを取得
-    latest_file = get_latest_screenshot(save_dir)
+    # 最新の取得を取得（変化なしマーカーの場合は参照先の画像を添付する）
+    latest_entry = get_latest_screenshot_entry(save_dir)
+    latest_file = resolve_snapshot(latest_entry) if latest_entry else None
     
     if latest_file is None:
         # ファイルが一つも無ければ「失敗（ファイルなし）」扱い
@@ -109,8 +127,8 @@ def check_and_notify():
         send_discord(title, body_md, image_path=None)
         return
     
-    # 最新ファイルの mtime を UTC として取得
-    mtime_utc = datetime.utcfromtimestamp(os.path.getmtime(latest_file))
+    # 最新の取得の mtime を UTC として取得
+    mtime_utc = datetime.utcfromtimestamp(os.path.getmtime(latest_entry))
     mtime_utc = mtime_utc.replace(tzinfo=timezone.utc)
     
     # 現在時刻（UTC）との差分秒 age_sec を計算
@@ -127,7 +145,7 @@ def check_and_notify():
         title = "Clusterスクリーンショット監視：成功"
         body_md = (
             f"スクリーンショットが正常に取得されています。\n\n"
-            f"- **ファイル**: `{latest_file}`\n"
+            f"- **ファイル**: `{latest_entry}`\n"
             f"- **取得時刻（JST）**: {file_jst_str}\n"
             f"- **チェック時刻（JST）**: {check_jst_str}\n"
             f"- **経過時間**: {int(age_sec)}秒"
@@ -137,12 +155,15 @@ def check_and_notify():
         title = "Clusterスクリーンショット監視：失敗（新しいファイルなし）"
         body_md = (
             f"最新のスクリーンショットが {time_window_sec} 秒以内に作成されていません。\n\n"
-            f"- **ファイル**: `{latest_file}`\n"
+            f"- **ファイル**: `{latest_entry}`\n"
             f"- **取得時刻（JST）**: {file_jst_str}\n"
             f"- **チェック時刻（JST）**: {check_jst_str}\n"
             f"- **経過時間**: {int(age_sec)}秒（閾値: {time_window_sec}秒）"
         )
     
+    if latest_entry != latest_file:
+        body_md += f"\n- **前回から変化なし**: `{os.path.basename(latest_file)}` と同じ内容です"
+    
     # 最新のスクリーンショットファイルを添付
     send_discord(title, body_md, image_path=latest_file)
 
@@ -0,0 +1,195 @@
+import os
+from zoneinfo import ZoneInfo
+import pandas as pd
+
+# 月ごとのパーティション（<dataset_dir>/month=YYYY-MM/data.parquet）に分けて保存する
+PARTITION_COLUMN = "month"
+PARTITION_FILENAME = "data.parquet"
+# 同じ取得とみなすキー（CSVの filename と date_str の組に相当）
+KEY_COLUMNS = ["filename", "date"]
+# 保存する日時の型（スキーマの timestamp[ns, tz=Asia/Tokyo] に対応）
+DATETIME_DTYPE = "datetime64[ns, Asia/Tokyo]"
+
+
+def _require_pyarrow():
+    """pyarrow を読み込む（インストールされていない場合は分かりやすいエラーにする）"""
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet形式のデータストアには pyarrow が必要です: pip install pyarrow")
+    return pyarrow
+
+
+def _months(dates):
+    """日時（JST）の列から、パーティションの月（YYYY-MM）の列を作る"""
+    return dates.dt.strftime("%Y-%m")
+
+
+def _partition_path(dataset_dir, month):
+    return os.path.join(dataset_dir, f"{PARTITION_COLUMN}={month}", PARTITION_FILENAME)
+
+
+def _schema(zone_columns):
+    """保存する列の型（日時はJSTのタイムスタンプ、ゾーンデータは int32）"""
+    pa = _require_pyarrow()
+    fields = [
+        ("filename", pa.string()),
+        ("date", pa.timestamp("ns", tz="Asia/Tokyo")),
+        ("file_date", pa.timestamp("ns", tz="Asia/Tokyo")),
+        ("file_path", pa.string()),
+    ]
+    fields += [(column, pa.int32()) for column in zone_columns]
+    return pa.schema(fields)
+
+
+def _normalize(frame, zone_columns):
+    """typed_frame の結果を保存する列と型に揃える（日時はナノ秒のJST、ゾーンデータの欠損は0）"""
+    df = pd.DataFrame({
+        "filename": frame["filename"].astype(str),
+        "date": frame["date"].astype(DATETIME_DTYPE),
+        "file_date": frame["file_date"].fillna(frame["date"]).astype(DATETIME_DTYPE),
+        "file_path": frame["file_path"].astype("string"),
+    })
+    for column in zone_columns:
+        values = frame[column] if column in frame.columns else 0
+        df[column] = pd.to_numeric(values, errors="coerce").fillna(0).round().astype("int32")
+    return df
+
+
+def _write_partition(dataset_dir, month, df, zone_columns):
+    """1か月分を日時順に並べて書き出す（一時ファイルに書いてから置き換える）"""
+    pa = _require_pyarrow()
+    path = _partition_path(dataset_dir, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df = df.sort_values("date", kind="stable")
+    table = pa.Table.from_pandas(df, schema=_schema(zone_columns), preserve_index=False)
+    temp_path = path + ".tmp"
+    pa.parquet.write_table(table, temp_path)
+    os.replace(temp_path, path)
+
+
+def _dataset(dataset_dir, zone_columns=None):
+    """月ごとのパーティションをまとめたデータセット
+    zone_columns を指定すると、その列を持たない古いパーティション（ゾーンの追加前など）は欠損として読む"""
+    pa = _require_pyarrow()
+    partitioning = pa.dataset.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive")
+    schema = None
+    if zone_columns is not None:
+        schema = _schema(zone_columns).append(pa.field(PARTITION_COLUMN, pa.string()))
+    return pa.dataset.dataset(dataset_dir, format="parquet", partitioning=partitioning, schema=schema)
+
+
+def zone_columns_of(dataset_dir):
+    """保存済みのデータストアのゾーンデータの列（データが無い場合は空のリスト）"""
+    if not exists(dataset_dir):
+        return []
+    return [name for name in _dataset(dataset_dir).schema.names if name.endswith(("_visitors", "_likes"))]
+
+
+def exists(dataset_dir):
+    """データストアにパーティションが1つ以上あるかどうか"""
+    if not os.path.isdir(dataset_dir):
+        return False
+    return any(
+        entry.startswith(f"{PARTITION_COLUMN}=") and os.path.exists(os.path.join(dataset_dir, entry, PARTITION_FILENAME))
+        for entry in os.listdir(dataset_dir)
+    )
+
+
+def read_parquet_store(dataset_dir, since=None, until=None, columns=None, zone_columns=None):
+    """データストアを読み込み、typed_frame と同じ列のDataFrameを返す（データが無い場合は None）
+    since / until（JSTのdatetime、両端を含む）を指定すると、範囲外の月のパーティションは開かず、
+    ファイル内も行グループの統計で読み飛ばす（述語のプッシュダウン）
+    zone_columns を指定すると、その列を持たないパーティションの値は0として読む"""
+    if not exists(dataset_dir):
+        return None
+    pa = _require_pyarrow()
+    ds = pa.dataset
+    timestamp = pa.timestamp("ns", tz="Asia/Tokyo")
+    jst = ZoneInfo("Asia/Tokyo")
+    condition = None
+    for bound, op in ((since, "ge"), (until, "le")):
+        if bound is None:
+            continue
+        bound = pd.Timestamp(bound).tz_convert(jst) if pd.Timestamp(bound).tzinfo else pd.Timestamp(bound, tz=jst)
+        month = bound.strftime("%Y-%m")
+        date_field = ds.field("date")
+        month_field = ds.field(PARTITION_COLUMN)
+        value = pa.scalar(bound, type=timestamp)
+        if op == "ge":
+            part = (month_field >= month) & (date_field >= value)
+        else:
+            part = (month_field <= month) & (date_field <= value)
+        condition = part if condition is None else condition & part
+
+    dataset = _dataset(dataset_dir, zone_columns)
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name != PARTITION_COLUMN]
+    df = dataset.to_table(columns=columns, filter=condition).to_pandas()
+    for column in zone_columns or []:
+        if column in df.columns:
+            df[column] = df[column].fillna(0).astype("int32")
+    return df.sort_values("date", kind="stable").reset_index(drop=True) if "date" in df.columns else df
+
+
+def upsert_parquet_store(dataset_dir, frame, zone_columns):
+    """typed_frame の行をデータストアに加える（同じ filename と date の行は置き換える）
+    新しい行を含む月のパーティションだけを読み直して書き出すため、1回の更新の費用は履歴の長さによらない
+    追加・置き換えた行数を返す"""
+    if frame is None or len(frame) == 0:
+        return 0
+    df_new = _normalize(frame, zone_columns)
+    df_new = df_new.drop_duplicates(subset=KEY_COLUMNS, keep="last")
+    changed = 0
+    for month, df_month in df_new.groupby(_months(df_new["date"]), sort=True):
+        path = _partition_path(dataset_dir, month)
+        if os.path.exists(path):
+            df_existing = _normalize(pd.read_parquet(path), zone_columns)
+            merged = pd.concat([df_existing, df_month], ignore_index=True)
+            merged = merged.drop_duplicates(subset=KEY_COLUMNS, keep="last")
+            # 値が変わらない場合は書き出さない（file_date は比較しない）
+            compare = KEY_COLUMNS + zone_columns
+            unchanged = merged[compare].merge(df_existing[compare], how="inner", on=compare)
+            month_changed = len(merged) - len(unchanged)
+            if month_changed == 0 and len(merged) == len(df_existing):
+                continue
+        else:
+            merged = df_month
+            month_changed = len(df_month)
+        _write_partition(dataset_dir, month, merged, zone_columns)
+        changed += month_changed
+    return changed
+
+
+def import_csv_frame(dataset_dir, frame, zone_columns, replace=False):
+    """CSVから読み込んだ typed_frame をデータストアに取り込む
+    replace=True の場合は既存のパーティションをすべて削除してから書き出す（CSVを正とする）"""
+    if replace and os.path.isdir(dataset_dir):
+        for entry in os.listdir(dataset_dir):
+            path = os.path.join(dataset_dir, entry, PARTITION_FILENAME)
+            if entry.startswith(f"{PARTITION_COLUMN}=") and os.path.exists(path):
+                os.remove(path)
+                os.rmdir(os.path.dirname(path))
+    return upsert_parquet_store(dataset_dir, frame, zone_columns)
+
+
+def export_csv_frame(dataset_dir, zone_columns=None):
+    """データストアの全行を、html_data.csv と同じ列（日時の文字列を含む）のDataFrameにする"""
+    df = read_parquet_store(dataset_dir, zone_columns=zone_columns)
+    if df is None:
+        return None
+    out = pd.DataFrame({
+        "filename": df["filename"],
+        "date_str": df["date"].dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "date_only": df["date"].dt.strftime("%Y-%m-%d"),
+        "time_only": df["date"].dt.strftime("%H:%M:%S"),
+        "hour": df["date"].dt.hour,
+        "file_date_str": df["file_date"].dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "file_path": df["file_path"],
+    })
+    for column in df.columns:
+        if column.endswith(("_visitors", "_likes")):
+            out[column] = df[column]
+    return out
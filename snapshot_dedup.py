@@ -0,0 +1,132 @@
+import os
+import re
+import json
+import glob
+import hashlib
+from html_storage import HTML_EXTENSIONS, is_html_path, read_html
+
+
+# 前回から変化が無かった取得を表すマーカーファイルの拡張子（例: IPTeCA_..._JST.html.same）
+UNCHANGED_SUFFIX = ".same"
+
+# 変化検出の既定値（config.json の dedup で上書き）
+DEFAULT_DEDUP = {
+    "enabled": False,
+    "phash_size": 16,  # 知覚ハッシュ（dHash）の一辺のサイズ（ビット数は phash_size * phash_size）
+    "phash_threshold": 0,  # この値以下のハミング距離なら同じ画像とみなす
+}
+
+# 取得ファイル名（<接頭辞>_YYYYMMDD_HHMMSS_JST<拡張子>）
+CAPTURE_FILENAME_PATTERN = re.compile(r"^(.+)_(\d{8}_\d{6})_JST(\.[A-Za-z0-9.]+)$")
+
+# ワールドカード（a[href^="/w/"]）の要素
+WORLD_CARD_PATTERN = re.compile(r'<a\b[^>]*\bhref="/w/[^"]*"[^>]*>.*?</a>', re.S)
+TAG_PATTERN = re.compile(r"<[^>]+>")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def get_dedup_config(config):
+    """config.json の dedup を既定値とマージして返す"""
+    dedup = dict(DEFAULT_DEDUP)
+    dedup.update(config.get("dedup", {}))
+    return dedup
+
+
+def html_fingerprint(html_content):
+    """HTMLの正規化ハッシュを計算する
+    ワールドカードのリンク先とテキスト（タイトル・作者・♥・▶の数値）だけを対象にするため、
+    スクリプトのURLやクラス名など取得ごとに変わる部分は無視される"""
+    cards = []
+    for card in WORLD_CARD_PATTERN.findall(html_content):
+        href = re.search(r'href="(/w/[^"]*)"', card).group(1)
+        text = WHITESPACE_PATTERN.sub(" ", TAG_PATTERN.sub(" ", card)).strip()
+        cards.append(f"{href}\t{text}")
+    return hashlib.sha256("\n".join(cards).encode("utf-8")).hexdigest()
+
+
+def image_fingerprint(image_path, hash_size=16):
+    """画像の知覚ハッシュ（dHash）を16進文字列で返す"""
+    from PIL import Image
+    with Image.open(image_path) as image:
+        pixels = list(image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS).getdata())
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+
+def hamming_distance(hash_a, hash_b):
+    """16進文字列のハッシュ同士のハミング距離"""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+
+
+def resolve_snapshot(path):
+    """マーカーファイルであれば参照先の実ファイルのパスを、そうでなければそのまま返す"""
+    if not path.endswith(UNCHANGED_SUFFIX):
+        return path
+    with open(path, "r", encoding="utf-8") as f:
+        marker = json.load(f)
+    return os.path.join(os.path.dirname(path), marker["same_as"])
+
+
+def find_previous_snapshot(path):
+    """path と同じディレクトリ・接頭辞・拡張子を持つ、直前の取得（実ファイルに解決済み）を返す
+    HTMLは圧縮方式（.html / .html.gz / .html.zst）が異なっても同じ系列として扱う"""
+    match = CAPTURE_FILENAME_PATTERN.match(os.path.basename(path))
+    if not match:
+        return None
+    prefix, timestamp, ext = match.groups()
+    directory = os.path.dirname(path)
+    extensions = HTML_EXTENSIONS if ext in HTML_EXTENSIONS else (ext,)
+    paths = []
+    for candidate_ext in extensions:
+        paths += glob.glob(os.path.join(directory, f"{glob.escape(prefix)}_*_JST{candidate_ext}"))
+        paths += glob.glob(os.path.join(directory, f"{glob.escape(prefix)}_*_JST{candidate_ext}{UNCHANGED_SUFFIX}"))
+    candidates = []
+    for candidate in paths:
+        candidate_match = CAPTURE_FILENAME_PATTERN.match(os.path.basename(candidate).removesuffix(UNCHANGED_SUFFIX))
+        if candidate_match and candidate_match.group(1) == prefix and candidate_match.group(2) < timestamp:
+            candidates.append((candidate_match.group(2), candidate))
+    if not candidates:
+        return None
+    previous = resolve_snapshot(max(candidates)[1])
+    return previous if os.path.exists(previous) else None
+
+
+def _fingerprint(path, dedup_config):
+    """ファイルの種類に応じたフィンガープリントを返す（HTML: 正規化ハッシュ、画像: 知覚ハッシュ）"""
+    if is_html_path(path):
+        return html_fingerprint(read_html(path))
+    return image_fingerprint(path, dedup_config["phash_size"])
+
+
+def deduplicate_snapshot(path, dedup_config, force_changed=False):
+    """保存直後の取得ファイルを直前の取得と比較し、変化が無ければマーカーファイルに置き換える
+    最終的なパス（変化があれば path、無ければマーカーのパス）と、変化が無かったかどうかを返す
+    force_changed=True の場合は比較せずに保存する（同時に取得したHTMLが変化していた場合など）"""
+    if not dedup_config.get("enabled") or force_changed:
+        return path, False
+
+    previous = find_previous_snapshot(path)
+    if previous is None:
+        return path, False
+
+    current_fp = _fingerprint(path, dedup_config)
+    previous_fp = _fingerprint(previous, dedup_config)
+    if is_html_path(path):
+        unchanged = current_fp == previous_fp
+    else:
+        unchanged = hamming_distance(current_fp, previous_fp) <= dedup_config["phash_threshold"]
+    if not unchanged:
+        return path, False
+
+    marker_path = path + UNCHANGED_SUFFIX
+    with open(marker_path, "w", encoding="utf-8") as f:
+        json.dump({"same_as": os.path.basename(previous), "fingerprint": current_fp}, f, ensure_ascii=False)
+        f.write("\n")
+    os.remove(path)
+    print(f"前回から変化が無いため、{os.path.basename(previous)} を参照するマーカーを保存しました: {marker_path}")
+    return marker_path, True
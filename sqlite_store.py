@@ -0,0 +1,290 @@
+import os
+import re
+import sqlite3
+import contextlib
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import pandas as pd
+
+# analysis.storage が "sqlite" の場合のデータベースの既定の場所（config.json の analysis.sqlite_path で変更できる）
+DEFAULT_SQLITE_PATH = os.path.join("graphs", "html_data.sqlite")
+# 他のプロセスが書き込み中の場合に待つ最大時間（ミリ秒）
+BUSY_TIMEOUT_MS = 30000
+SNAPSHOT_TIMESTAMP_PATTERN = re.compile(r"(\d{8}_\d{6})")
+
+# 日時はUNIX時間（秒）の整数で保存する（読み込み時にJSTに変換する）
+# ゾーン名は zones に1回だけ保存し、measurements はゾーンのIDで参照する（行と索引を小さく保つ）
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL,
+    taken_at INTEGER NOT NULL,
+    file_date INTEGER,
+    file_path TEXT,
+    source TEXT NOT NULL,
+    UNIQUE (filename, taken_at)
+);
+CREATE INDEX IF NOT EXISTS snapshots_taken_at ON snapshots (taken_at);
+CREATE TABLE IF NOT EXISTS zones (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS measurements (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    zone_id INTEGER NOT NULL REFERENCES zones (id),
+    taken_at INTEGER NOT NULL,
+    visitors INTEGER NOT NULL,
+    likes INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, zone_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS measurements_zone_taken_at ON measurements (zone_id, taken_at);
+"""
+
+
+def connect(db_path):
+    """データベースに接続する（WALモード、無ければ作成する）
+    WALモードでは読み込みが書き込みを待たないため、取得（capture）と解析（analyze_html）が同時に動いても
+    解析は開始時点の一貫した内容を読み、書き込み同士は BUSY_TIMEOUT_MS まで順番を待つ"""
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    # トランザクションは _write_transaction で明示的に始める
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+@contextlib.contextmanager
+def _write_transaction(conn):
+    """書き込みのトランザクション（開始時に書き込みのロックを取り、途中で他の書き込みと入れ替わらないようにする）"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _to_epoch(values):
+    """日時（JST）の列をUNIX時間（秒）の列にする（欠損は None）"""
+    values = pd.to_datetime(values)
+    seconds = (values - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)
+    return seconds.astype(object).where(values.notna(), None)
+
+
+def _from_epoch(values):
+    """UNIX時間（秒）の列をJSTの日時の列にする"""
+    return pd.to_datetime(values, unit="s", utc=True).dt.tz_convert(ZoneInfo("Asia/Tokyo"))
+
+
+def _bound_epoch(bound):
+    """since / until（タイムゾーンの無い日時はJSTとみなす）をUNIX時間（秒）にする"""
+    bound = pd.Timestamp(bound)
+    if bound.tzinfo is None:
+        bound = bound.tz_localize(ZoneInfo("Asia/Tokyo"))
+    return int(bound.timestamp())
+
+
+def _range_condition(column, since, until):
+    """日時の範囲（両端を含む）の条件とパラメータ（範囲の指定が無い場合は空）"""
+    clauses = []
+    params = []
+    for bound, op in ((since, ">="), (until, "<=")):
+        if bound is not None:
+            clauses.append(f"{column} {op} ?")
+            params.append(_bound_epoch(bound))
+    return clauses, params
+
+
+def _zone_ids(conn, zone_names):
+    """ゾーン名 → ゾーンのIDの辞書（無いゾーンは追加する）"""
+    conn.executemany("INSERT INTO zones (name) VALUES (?) ON CONFLICT (name) DO NOTHING", [(zone,) for zone in zone_names])
+    return {name: zone_id for zone_id, name in conn.execute("SELECT id, name FROM zones") if name in zone_names}
+
+
+def exists(db_path):
+    """データベースにスナップショットが1件以上あるかどうか"""
+    if not os.path.exists(db_path):
+        return False
+    with contextlib.closing(connect(db_path)) as conn:
+        return conn.execute("SELECT 1 FROM snapshots LIMIT 1").fetchone() is not None
+
+
+def upsert_sqlite_store(db_path, frame, zone_names, source="analysis"):
+    """typed_frame の行（ゾーンごとの列 <ゾーン>_visitors・<ゾーン>_likes）をデータベースに加える
+    filename と取得日時の組が同じスナップショットはゾーンデータだけを置き換える
+    （file_date・file_path は最初の値を残す。取得時に書き込んだ行の file_path は解析時に補う）
+    新しい行と値が変わった行の数を返す"""
+    if frame is None or len(frame) == 0:
+        return 0
+    df = pd.DataFrame({
+        "filename": frame["filename"].astype(str),
+        "taken_at": _to_epoch(frame["date"]),
+        "file_date": _to_epoch(frame["file_date"].fillna(frame["date"])),
+        "file_path": frame["file_path"].astype(object).where(frame["file_path"].notna(), None),
+    })
+    for zone in zone_names:
+        for metric in ("visitors", "likes"):
+            column = f"{zone}_{metric}"
+            values = frame[column] if column in frame.columns else 0
+            df[column] = pd.to_numeric(values, errors="coerce").fillna(0).round().astype("int64")
+    df = df.drop_duplicates(subset=["filename", "taken_at"], keep="last")
+
+    with contextlib.closing(connect(db_path)) as conn, _write_transaction(conn):
+        zone_ids = _zone_ids(conn, zone_names)
+        conn.executemany(
+            "INSERT INTO snapshots (filename, taken_at, file_date, file_path, source) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (filename, taken_at) DO UPDATE SET file_path = excluded.file_path"
+            " WHERE snapshots.file_path IS NULL AND excluded.file_path IS NOT NULL",
+            zip(df["filename"], df["taken_at"], df["file_date"], df["file_path"], [source] * len(df)),
+        )
+        # 対象の期間のスナップショットのIDと、保存済みのゾーンデータ
+        low, high = int(df["taken_at"].min()), int(df["taken_at"].max())
+        ids = {
+            (filename, taken_at): snapshot_id
+            for snapshot_id, filename, taken_at in conn.execute(
+                "SELECT id, filename, taken_at FROM snapshots WHERE taken_at BETWEEN ? AND ?", (low, high)
+            )
+        }
+        existing = {
+            (snapshot_id, zone_id): (visitors, likes)
+            for snapshot_id, zone_id, visitors, likes in conn.execute(
+                "SELECT m.snapshot_id, m.zone_id, m.visitors, m.likes FROM snapshots s"
+                " CROSS JOIN measurements m ON m.snapshot_id = s.id WHERE s.taken_at BETWEEN ? AND ?",
+                (low, high),
+            )
+        }
+        changes = []
+        changed_snapshots = set()
+        snapshot_ids = [ids[key] for key in zip(df["filename"], df["taken_at"])]
+        for zone in zone_names:
+            zone_id = zone_ids[zone]
+            for snapshot_id, taken_at, visitors, likes in zip(
+                snapshot_ids, df["taken_at"], df[f"{zone}_visitors"].tolist(), df[f"{zone}_likes"].tolist()
+            ):
+                if existing.get((snapshot_id, zone_id)) != (visitors, likes):
+                    changes.append((snapshot_id, zone_id, taken_at, visitors, likes))
+                    changed_snapshots.add(snapshot_id)
+        conn.executemany(
+            "INSERT INTO measurements (snapshot_id, zone_id, taken_at, visitors, likes) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (snapshot_id, zone_id) DO UPDATE SET visitors = excluded.visitors, likes = excluded.likes",
+            changes,
+        )
+    return len(changed_snapshots)
+
+
+def write_capture(db_path, snapshot, worlds, zone_names, file_path=None):
+    """取得1回分のブラウザ内抽出の結果（world_records の worlds）を、ゾーンごとの数値としてデータベースに書き込む
+    ゾーンの対応付けは analyze_html.zone_data_from_worlds と同じ（同じワールドIDは後のカードを使い、
+    ワールド名にゾーンの短い名前を含むものをそのゾーンとする。見つからないゾーン・数値（None）は0）"""
+    match = SNAPSHOT_TIMESTAMP_PATTERN.search(snapshot)
+    if not match:
+        raise ValueError(f"スナップショット名から取得日時を読み取れません: {snapshot}")
+    jst = ZoneInfo("Asia/Tokyo")
+    taken_at = datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").replace(tzinfo=jst)
+    latest = {}
+    for world in worlds:
+        latest.pop(world["world_id"], None)
+        latest[world["world_id"]] = world
+    row = {
+        "filename": snapshot + ".html",
+        "date": taken_at,
+        "file_date": datetime.now(jst),
+        "file_path": file_path,
+    }
+    for world in latest.values():
+        for zone in zone_names:
+            if zone in world["title"]:
+                row[f"{zone}_visitors"] = world["visitors"] if world["visitors"] is not None else 0
+                row[f"{zone}_likes"] = world["likes"] if world["likes"] is not None else 0
+                break
+    return upsert_sqlite_store(db_path, pd.DataFrame([row]), zone_names, source="capture")
+
+
+def read_sqlite_store(db_path, zone_names, since=None, until=None):
+    """データベースを読み込み、typed_frame と同じ列（ゾーンごとの <ゾーン>_visitors・<ゾーン>_likes）の
+    DataFrameを取得日時順に返す（データが無い場合は None）
+    since / until（JSTのdatetime、両端を含む）を指定すると、snapshots の取得日時の索引でその範囲だけを読む"""
+    if not exists(db_path):
+        return None
+    clauses, params = _range_condition("s.taken_at", since, until)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    with contextlib.closing(connect(db_path)) as conn:
+        # 2つの SELECT が同じ時点の内容を読むように、1つの読み込みトランザクションにする
+        conn.execute("BEGIN")
+        snapshots = pd.read_sql_query(
+            f"SELECT s.id, s.filename, s.taken_at, s.file_date, s.file_path FROM snapshots s{where} ORDER BY s.taken_at, s.id",
+            conn, params=params,
+        )
+        # CROSS JOIN で snapshots を外側に固定する（期間を指定した場合に取得日時の索引から範囲のスナップショットだけを辿る）
+        measurements = pd.read_sql_query(
+            "SELECT m.snapshot_id, m.zone_id, m.visitors, m.likes FROM snapshots s"
+            f" CROSS JOIN measurements m ON m.snapshot_id = s.id{where}",
+            conn, params=params,
+        )
+        zones = dict(conn.execute("SELECT id, name FROM zones"))
+        conn.execute("COMMIT")
+
+    df = pd.DataFrame({
+        "filename": snapshots["filename"],
+        "date": _from_epoch(snapshots["taken_at"]),
+        "file_date": _from_epoch(snapshots["file_date"].fillna(snapshots["taken_at"])),
+        "file_path": snapshots["file_path"],
+    })
+    # ゾーンごとの行を、スナップショットの行・ゾーンごとの列に並べ替える（無いゾーンは0）
+    measurements["zone"] = measurements.pop("zone_id").map(zones)
+    wide = measurements.pivot(index="snapshot_id", columns="zone", values=["visitors", "likes"])
+    for zone in zone_names:
+        for metric in ("visitors", "likes"):
+            values = wide[(metric, zone)] if (metric, zone) in wide.columns else pd.Series(dtype="int64")
+            df[f"{zone}_{metric}"] = values.reindex(snapshots["id"]).fillna(0).astype("int64").to_numpy()
+    return df
+
+
+def zone_series(db_path, zone, since=None, until=None):
+    """1つのゾーンの来場者数・いいね数を取得日時順に返す（列は date・visitors・likes）
+    measurements の (zone_id, taken_at) の索引だけで範囲を読むため、他のゾーンや範囲外の行は読まない"""
+    clauses, params = _range_condition("m.taken_at", since, until)
+    where = " WHERE " + " AND ".join(["z.name = ?"] + clauses)
+    query = (
+        "SELECT m.taken_at, m.visitors, m.likes FROM zones z JOIN measurements m ON m.zone_id = z.id"
+        f"{where} ORDER BY m.taken_at"
+    )
+    with contextlib.closing(connect(db_path)) as conn:
+        df = pd.read_sql_query(query, conn, params=[zone] + params)
+    df.insert(0, "date", _from_epoch(df.pop("taken_at")))
+    return df
+
+
+def import_csv_frame(db_path, frame, zone_names, replace=False):
+    """CSVから読み込んだ typed_frame をデータベースに取り込む
+    replace=True の場合は既存のスナップショットをすべて削除してから書き込む（CSVを正とする）"""
+    if replace and os.path.exists(db_path):
+        with contextlib.closing(connect(db_path)) as conn, _write_transaction(conn):
+            conn.execute("DELETE FROM measurements")
+            conn.execute("DELETE FROM snapshots")
+    return upsert_sqlite_store(db_path, frame, zone_names, source="csv")
+
+
+def export_csv_frame(db_path, zone_names):
+    """データベースの全行を、html_data.csv と同じ列（日時の文字列を含む）のDataFrameにする"""
+    df = read_sqlite_store(db_path, zone_names)
+    if df is None:
+        return None
+    out = pd.DataFrame({
+        "filename": df["filename"],
+        "date_str": df["date"].dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "date_only": df["date"].dt.strftime("%Y-%m-%d"),
+        "time_only": df["date"].dt.strftime("%H:%M:%S"),
+        "hour": df["date"].dt.hour,
+        "file_date_str": df["file_date"].dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "file_path": df["file_path"],
+    })
+    for zone in zone_names:
+        for metric in ("visitors", "likes"):
+            out[f"{zone}_{metric}"] = df[f"{zone}_{metric}"]
+    return out
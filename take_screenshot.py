@@ -1,9 +1,9 @@
 import os
 import sys
 import json
-from datetime import datetime
-from zoneinfo import ZoneInfo
 from playwright.sync_api import sync_playwright
+from snapshot_dedup import get_dedup_config, deduplicate_snapshot
+from capture import prepare_page, generate_timestamp, get_readiness_config, record_capture_latency, get_screenshot_options, take_page_screenshot
 
 
 def load_config():
@@ -18,6 +18,8 @@ def take_screenshot():
     screenshot_config = config["screenshot"]
     url = screenshot_config["url"]
     save_dir = screenshot_config["save_dir"]
+    readiness = get_readiness_config(config)
+    screenshot_options = get_screenshot_options(config)
     
     # ディレクトリが無ければ作成
     os.makedirs(save_dir, exist_ok=True)
@@ -25,28 +27,16 @@ def take_screenshot():
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True)
         page = browser.new_page(viewport={"width": 1920, "height": 1080})
-        page.goto(url)
-        page.wait_for_load_state("networkidle")
+        ready_ms = prepare_page(page, url, readiness=readiness)
         
-        # Cookieバナーの閉鎖処理
-        for selector in ["text=Allow all", "text=すべて許可"]:
-            try:
-                page.click(selector, timeout=3000)
-                break
-            except:
-                pass
-        
-        # 下部までスクロールして表示を更新
-        page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        page.wait_for_timeout(1500)
-        
-        # 日本時間（JST）でYYYYMMDD_HHMMSS_JST形式のタイムスタンプを生成
-        jst = ZoneInfo("Asia/Tokyo")
-        timestamp = datetime.now(jst).strftime("%Y%m%d_%H%M%S_JST")
-        filename = f"{save_dir}/IPTeCA_{timestamp}.png"
-        page.screenshot(path=filename, full_page=True)
+        timestamp = generate_timestamp()
+        record_capture_latency(readiness, "IPTeCA", url, timestamp, ready_ms)
+        filename, _ = take_page_screenshot(page, save_dir, f"IPTeCA_{timestamp}", screenshot_options)
         browser.close()
     
+    # 前回から変化が無ければマーカーに置き換える
+    filename, _ = deduplicate_snapshot(filename, get_dedup_config(config))
+    
     return filename
 
 
@@ -0,0 +1,119 @@
+"""ワールドカード1枚あたりの抽出コストを計測する
+
+html/ の実際のワールドカード（a[href^="/w/"]）を対象に、
+以前の処理（divごとに get_text を呼び、SVGのpathごとに親要素の子を走査する）と、
+現在の1回の走査で集める処理（analyze_html._scan_card_bs4）のカード1枚あたりの時間を比較する。
+両者の結果（タイトル・来場者数・いいね数）が全カードで一致することも確認する。
+HTMLの解析（木の構築）は計測に含めない。
+
+使い方:
+    python tools/bench_card_extraction.py [--limit N] [--repeat N]
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup, SoupStrainer
+from html_storage import HTML_EXTENSIONS, read_html
+from analyze_html import _scan_card_bs4, _is_world_href, _parse_count
+
+
+def _span_after_svg(svg):
+    """以前の処理と同じ方法で、svgの後に来る最初のspanを探す"""
+    parent = svg.parent
+    found_span = svg.find_next_sibling("span")
+    if not found_span:
+        svg_index = None
+        for i, child in enumerate(parent.children):
+            if child == svg:
+                svg_index = i
+                break
+        if svg_index is not None:
+            for i, child in enumerate(parent.children):
+                if i > svg_index and child.name == "span":
+                    found_span = child
+                    break
+    return found_span
+
+
+def reference_scan_card(card):
+    """以前の処理: divごとに get_text でテキストを求めて並べ替え、pathごとにspanを探す
+    （タイトルの規則は現在の処理と同じ）"""
+    candidates = []
+    for div in card.find_all("div", recursive=True):
+        text = div.get_text(strip=True)
+        if text and len(text) > 10:
+            candidates.append((div, text))
+    # 他の候補を内側に含むdiv（カード全体を囲むdivなど）は除く
+    candidate_ids = {id(div) for div, _ in candidates}
+    title_candidates = [
+        (len(text), text) for div, text in candidates
+        if not any(id(inner) in candidate_ids for inner in div.find_all("div"))
+    ]
+    if not title_candidates:
+        return None
+    title_candidates.sort(reverse=True, key=lambda x: x[0])
+    name = title_candidates[0][1]
+
+    likes = 0
+    visitors = 0
+    for svg in card.find_all("svg", recursive=True):
+        for path in svg.find_all("path", recursive=True):
+            d_attr = path.get("d", "")
+            if d_attr.startswith("M60.004") or d_attr.startswith("M38.678"):
+                found_span = _span_after_svg(svg)
+                count = _parse_count(found_span.get_text(strip=True)) if found_span else None
+                if count is None:
+                    continue
+                if d_attr.startswith("M60.004"):
+                    likes = count
+                else:
+                    visitors = count
+    return name, visitors, likes
+
+
+def time_per_card(cards, scan, repeat):
+    """全カードを repeat 回処理し、(カード1枚あたりのマイクロ秒, 結果のリスト) を返す"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [scan(card) for card in cards]
+    return (time.perf_counter() - start) / (repeat * len(cards)) * 1e6, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ワールドカード1枚あたりの抽出コストを計測する")
+    parser.add_argument("--dir", default="html", help="カードを読み込むHTMLのディレクトリ")
+    parser.add_argument("--limit", type=int, default=30, help="使用するファイル数（0は全件、新しい順）")
+    parser.add_argument("--repeat", type=int, default=5, help="計測の繰り返し回数")
+    args = parser.parse_args()
+
+    files = sorted(p for ext in HTML_EXTENSIONS for p in glob.glob(os.path.join(args.dir, f"*{ext}")))
+    if args.limit:
+        files = files[-args.limit:]
+    cards = []
+    for path in files:
+        soup = BeautifulSoup(read_html(path), "html.parser", parse_only=SoupStrainer("a", href=_is_world_href))
+        cards.extend(soup.find_all("a", href=_is_world_href))
+    if not cards:
+        print(f"エラー: {args.dir} にワールドカードを含むHTMLファイルがありません。")
+        sys.exit(1)
+
+    print(f"対象: {len(files)} 件のHTMLから {len(cards)} 枚のカード（{args.repeat} 回の平均）")
+    before_us, before = time_per_card(cards, reference_scan_card, args.repeat)
+    after_us, after = time_per_card(cards, _scan_card_bs4, args.repeat)
+    print(f"  以前の処理（divごとの get_text）: {before_us:8.1f} µs/カード")
+    print(f"  1回の走査（_scan_card_bs4）     : {after_us:8.1f} µs/カード（{before_us / after_us:.1f}x）")
+
+    mismatched = sum(1 for a, b in zip(before, after) if a != b)
+    if mismatched:
+        print(f"不一致: {mismatched} 枚のカードで結果が異なります。")
+        sys.exit(1)
+    print("一致: すべてのカードで結果が一致しました。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""グラフ作成段階の処理時間とピークメモリを、データの渡し方ごとに計測する
+
+analyze_html のグラフ作成段階（CSVの読み込みから5つの create_*_graph まで）を次の2通りで実行する：
+    records  load_from_csv の行の辞書のリストを日時で並べ替え、各グラフに渡す（グラフごとにDataFrameを作り直す以前の流れ）
+    frame    load_frame_from_csv の型付きDataFrameから graph_frame を1回だけ作り、すべてのグラフで共有する
+処理時間は --repeat 回の中央値、ピークメモリは tracemalloc で別に1回計測する（Pythonのヒープのみ）。
+--skip-save を付けると画像の書き出し（savefig）を省き、データの準備と描画だけを比べる。
+--rows を指定すると、実際のCSVの代わりに tools/bench_load_csv.py と同じ合成CSVを使う。
+
+使い方:
+    python tools/bench_graph_stage.py [--csv graphs/html_data.csv] [--rows 20000] [--repeat 3] [--skip-save]
+"""
+import os
+import sys
+import io
+import time
+import argparse
+import warnings
+import tempfile
+import statistics
+import contextlib
+import tracemalloc
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+# 日本語フォントが無い環境でグラフごとに大量に出る警告は表示しない
+warnings.filterwarnings("ignore", message="Glyph .* missing from font")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analyze_html
+from bench_load_csv import synthetic_csv
+
+
+def draw_graphs(data, output_dir, events):
+    analyze_html.create_timeline_graph(data, output_dir)
+    analyze_html.create_daily_count_graph(data, output_dir)
+    analyze_html.create_hourly_distribution_graph(data, output_dir)
+    analyze_html.create_zone_visitors_graph(data, output_dir, events=events)
+    analyze_html.create_zone_likes_graph(data, output_dir, events=events)
+
+
+def run_records(csv_path, output_dir, events):
+    data = analyze_html.load_from_csv(csv_path)
+    data.sort(key=lambda x: x["date"])
+    draw_graphs(data, output_dir, events)
+
+
+def run_frame(csv_path, output_dir, events):
+    data = analyze_html.graph_frame(analyze_html.load_frame_from_csv(csv_path))
+    draw_graphs(data, output_dir, events)
+
+
+def measure(func, args, repeat):
+    """(処理時間の中央値, ピークメモリのバイト数) を返す（関数内の print は表示しない）"""
+    runs = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(*args)
+            runs.append(time.perf_counter() - start)
+        tracemalloc.start()
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return statistics.median(runs), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="グラフ作成段階の処理時間とピークメモリを計測する")
+    parser.add_argument("--csv", default=os.path.join("graphs", "html_data.csv"), help="読み込むCSVファイル")
+    parser.add_argument("--rows", type=int, help="合成CSVの行数（指定した場合は --csv を使わない）")
+    parser.add_argument("--repeat", type=int, default=3, help="計測回数（中央値を使用）")
+    parser.add_argument("--skip-save", action="store_true", help="画像の書き出し（savefig）を省く")
+    args = parser.parse_args()
+
+    if args.skip_save:
+        plt.savefig = lambda *a, **k: None
+    events = analyze_html.load_events("events.json")
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_path = args.csv
+        if args.rows:
+            csv_path = os.path.join(work_dir, "html_data.csv")
+            synthetic_csv(csv_path, args.rows)
+        print(f"CSV: {csv_path if not args.rows else f'合成 {args.rows} 行'}、計測回数: {args.repeat}、savefig: {'なし' if args.skip_save else 'あり'}")
+        print(f"{'mode':<10}{'sec':>9}{'peak MB':>10}")
+        results = {}
+        for name, func in (("records", run_records), ("frame", run_frame)):
+            sec, peak = measure(func, (csv_path, os.path.join(work_dir, "graphs"), events), args.repeat)
+            results[name] = (sec, peak)
+            print(f"{name:<10}{sec:>9.3f}{peak / 1024 / 1024:>10.1f}")
+    (records_sec, records_peak), (frame_sec, frame_peak) = results["records"], results["frame"]
+    print(f"処理時間: {frame_sec / records_sec - 1:+.1%}、ピークメモリ: {frame_peak / records_peak - 1:+.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""通常モードとleanモードのHTML取得を比較するベンチマーク
+
+保存済みのHTMLスナップショットをローカルのHTTPサーバーで配信し、
+ページ準備完了までの時間と転送バイト数をモードごとに計測する。
+
+使い方:
+    python tools/bench_lean_fetch.py [HTMLファイル] [--runs N]
+"""
+import os
+import sys
+import json
+import glob
+import argparse
+import time
+import statistics
+import threading
+import functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright.sync_api import sync_playwright
+from fetch_html import load_config, load_page
+from capture import get_readiness_config
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """アクセスログを出力しないハンドラ"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(directory):
+    """指定ディレクトリを配信するHTTPサーバーをバックグラウンドで起動する"""
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def measure(browser, url, lean_config, readiness):
+    """1回分の読み込みを行い、準備完了までの秒数と転送バイト数を返す"""
+    context = browser.new_context(viewport={"width": 1920, "height": 1080})
+    page = context.new_page()
+    transferred = {"bytes": 0, "requests": 0}
+
+    def on_request_finished(request):
+        try:
+            sizes = request.sizes()
+            transferred["bytes"] += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+            transferred["requests"] += 1
+        except Exception:
+            pass
+
+    page.on("requestfinished", on_request_finished)
+    start = time.perf_counter()
+    load_page(page, url, lean_config, readiness=readiness)
+    elapsed = time.perf_counter() - start
+    card_count = page.locator('a[href^="/w/"]').count()
+    context.close()
+    return elapsed, transferred["bytes"], transferred["requests"], card_count
+
+
+def run_benchmark(html_path, runs=5):
+    """通常モードとleanモードをそれぞれruns回計測して結果を返す"""
+    config = load_config()
+    lean_config = config.get("lean_fetch", {})
+    readiness = get_readiness_config(config)
+    server = start_server(os.path.dirname(os.path.abspath(html_path)))
+    url = f"http://127.0.0.1:{server.server_address[1]}/{os.path.basename(html_path)}"
+
+    results = {}
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            for mode, mode_config in [("normal", None), ("lean", lean_config)]:
+                samples = [measure(browser, url, mode_config, readiness) for _ in range(runs)]
+                results[mode] = {
+                    "ready_sec_median": statistics.median(s[0] for s in samples),
+                    "bytes_median": statistics.median(s[1] for s in samples),
+                    "requests_median": statistics.median(s[2] for s in samples),
+                    "cards": samples[-1][3],
+                }
+            browser.close()
+    finally:
+        server.shutdown()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="通常モードとleanモードのHTML取得を比較する")
+    parser.add_argument("html_path", nargs="?", help="配信するHTMLスナップショット（省略時は html/ の最新ファイル）")
+    parser.add_argument("--runs", type=int, default=5, help="各モードの計測回数")
+    args = parser.parse_args()
+
+    html_path = args.html_path
+    if not html_path:
+        files = sorted(glob.glob(os.path.join("html", "*.html")))
+        if not files:
+            print("エラー: html/ フォルダにHTMLファイルがありません。")
+            sys.exit(1)
+        html_path = files[-1]
+    runs = args.runs
+
+    print(f"対象: {html_path}（各モード {runs} 回）")
+    results = run_benchmark(html_path, runs=runs)
+
+    print(f"{'mode':<8}{'ready(s)':>10}{'bytes':>14}{'requests':>10}{'cards':>7}")
+    for mode, r in results.items():
+        print(f"{mode:<8}{r['ready_sec_median']:>10.2f}{int(r['bytes_median']):>14,}{int(r['requests_median']):>10}{r['cards']:>7}")
+    print(json.dumps(results, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
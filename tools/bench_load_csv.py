@@ -0,0 +1,209 @@
+"""load_from_csv の日時の正規化・型変換の処理時間を、大きな合成CSVで計測する
+
+HTMLの行（YYYY-MM-DD HH:MM:SS）と手動の行（スラッシュ区切り・秒の無い時刻・日付のみ・空の日時）を
+混ぜた --rows 行のCSVを一時ディレクトリに作り、次の3つを比較する：
+    legacy      行ごとのループ（iterrows）で正規化する以前の実装（行の辞書のリストを返す）
+    frame       analyze_html.load_frame_from_csv（列全体の文字列操作で正規化し、型付きのDataFrameを返す）
+    records     analyze_html.load_from_csv（frame を行の辞書のリストに変換する）
+両者の結果（行ごとの filename・date・file_date・file_path・ゾーンデータ）が一致することも確認する。
+
+使い方:
+    python tools/bench_load_csv.py [--rows 100000] [--repeat 3] [--skip-legacy]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyze_html import ZONE_SHORT_NAMES, normalize_datetime_str, load_from_csv, load_frame_from_csv
+
+
+def legacy_records_from_frame(df):
+    """行ごとのループ（iterrows）で変換する以前の実装（比較用）"""
+    df = df.copy()
+    jst = ZoneInfo("Asia/Tokyo")
+    
+    # 日時文字列を正規化
+    for idx, row in df.iterrows():
+        filename = row.get("filename", "")
+        date_str = normalize_datetime_str(row.get("date_str"), filename)
+        if date_str:
+            df.at[idx, "date_str"] = date_str
+        
+        # file_date_strが空の場合は、date_strと同じ値を使用
+        file_date_str = row.get("file_date_str")
+        if pd.isna(file_date_str) or str(file_date_str).strip() == "":
+            df.at[idx, "file_date_str"] = df.at[idx, "date_str"]
+        else:
+            file_date_str = normalize_datetime_str(file_date_str, filename)
+            if file_date_str:
+                df.at[idx, "file_date_str"] = file_date_str
+    
+    # 日時文字列をdatetimeオブジェクトに変換
+    try:
+        df["date"] = pd.to_datetime(df["date_str"], errors="coerce").dt.tz_localize(jst, ambiguous="infer")
+    except Exception as e:
+        print(f"警告: 日時の変換でエラーが発生しました: {e}")
+        # フォールバック: ファイル名から日時を抽出
+        for idx, row in df.iterrows():
+            if pd.isna(df.at[idx, "date"]):
+                filename = row.get("filename", "")
+                if filename.startswith("IPTeCA_"):
+                    try:
+                        if filename.endswith("_JST.html"):
+                            timestamp_str = filename.replace("IPTeCA_", "").replace("_JST.html", "")
+                        elif filename.endswith("_JST.png"):
+                            timestamp_str = filename.replace("IPTeCA_", "").replace("_JST.png", "")
+                        elif filename.endswith("_JST.json"):
+                            timestamp_str = filename.replace("IPTeCA_", "").replace("_JST.json", "")
+                        else:
+                            continue
+                        dt = datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
+                        df.at[idx, "date"] = dt.replace(tzinfo=jst)
+                    except Exception:
+                        pass
+    
+    try:
+        df["file_date"] = pd.to_datetime(df["file_date_str"], errors="coerce").dt.tz_localize(jst, ambiguous="infer")
+        # file_dateがNaNの場合は、dateと同じ値を使用
+        df["file_date"] = df["file_date"].fillna(df["date"])
+    except Exception as e:
+        print(f"警告: file_dateの変換でエラーが発生しました: {e}")
+        df["file_date"] = df["date"]
+    
+    # dateがNaNの行を除外
+    df = df.dropna(subset=["date"])
+    
+    # データ形式を統一（ゾーンデータも含める）
+    data = []
+    for _, row in df.iterrows():
+        row_data = {
+            "filename": row["filename"],
+            "date": row["date"],
+            "file_date": row["file_date"],
+            "file_path": row["file_path"]
+        }
+        
+        # ゾーンデータを追加
+        for zone_name in ZONE_SHORT_NAMES:
+            visitors_col = f"{zone_name}_visitors"
+            likes_col = f"{zone_name}_likes"
+            if visitors_col in df.columns:
+                # NaNの場合は0に変換
+                value = row.get(visitors_col, 0)
+                row_data[visitors_col] = 0 if pd.isna(value) else float(value)
+            if likes_col in df.columns:
+                value = row.get(likes_col, 0)
+                row_data[likes_col] = 0 if pd.isna(value) else float(value)
+        
+        data.append(row_data)
+    
+    return data
+
+
+def synthetic_csv(path, rows, seed=0):
+    """HTMLの行と書式の異なる手動の行を混ぜた合成CSVを書き出す"""
+    rng = random.Random(seed)
+    start = datetime(2025, 11, 1)
+    records = []
+    for i in range(rows):
+        dt = start + timedelta(minutes=10 * i, seconds=rng.randrange(60))
+        stamp = dt.strftime("%Y%m%d_%H%M%S")
+        kind = rng.random()
+        if kind < 0.9:
+            # 解析したHTMLの行
+            filename = f"IPTeCA_{stamp}_JST.html"
+            date_str = dt.strftime("%Y-%m-%d %H:%M:%S")
+            file_date_str = (dt + timedelta(minutes=1)).strftime("%Y-%m-%d %H:%M:%S")
+            file_path = f"html/{filename}"
+        else:
+            # 手動で入力した行（書式がまちまち）
+            filename = f"IPTeCA_{stamp}_JST.png"
+            date_str = rng.choice([
+                f"{dt.year}/{dt.month:02d}/{dt.day:02d} {dt.hour}:{dt.minute:02d}",
+                dt.strftime("%Y/%m/%d %H:%M:%S"),
+                dt.strftime("%Y-%m-%d"),
+                "",
+            ])
+            file_date_str = rng.choice(["", f"{dt.year}/{dt.month}/{dt.day} {dt.hour}:{dt.minute:02d}", date_str])
+            file_path = f"screenshots/{filename}"
+        row = {
+            "filename": filename,
+            "date_str": date_str,
+            "date_only": dt.strftime("%Y-%m-%d"),
+            "time_only": dt.strftime("%H:%M:%S"),
+            "hour": dt.hour,
+            "file_date_str": file_date_str,
+            "file_path": file_path,
+        }
+        for zone_name in ZONE_SHORT_NAMES:
+            row[f"{zone_name}_visitors"] = "" if rng.random() < 0.01 else 100 + i // 10
+            row[f"{zone_name}_likes"] = "" if rng.random() < 0.01 else i // 100
+        records.append(row)
+    pd.DataFrame(records).to_csv(path, index=False, encoding="utf-8-sig")
+
+
+def legacy_load_from_csv(csv_path):
+    return legacy_records_from_frame(pd.read_csv(csv_path, encoding="utf-8-sig"))
+
+
+def measure(func, path, repeat):
+    """func(path) を repeat 回実行し、(秒数の中央値, 最後の結果) を返す"""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(path)
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs), result
+
+
+def comparable(records):
+    """比較用に、値の型（0 と 0.0 など）を揃えたDataFrameにする"""
+    df = pd.DataFrame(records)
+    for column in df.columns:
+        if column.endswith(("_visitors", "_likes")):
+            df[column] = df[column].astype("float64")
+    return df.reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="load_from_csv の処理時間を合成CSVで計測する")
+    parser.add_argument("--rows", type=int, default=100000, help="合成CSVの行数")
+    parser.add_argument("--repeat", type=int, default=3, help="計測回数（中央値を使用）")
+    parser.add_argument("--skip-legacy", action="store_true", help="以前の実装を計測しない（比較もしない）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_path = os.path.join(work_dir, "html_data.csv")
+        synthetic_csv(csv_path, args.rows)
+        print(f"合成CSV: {args.rows} 行（{os.path.getsize(csv_path) / 1024 / 1024:.1f} MB）")
+
+        frame_sec, _ = measure(load_frame_from_csv, csv_path, args.repeat)
+        vectorized_sec, vectorized = measure(load_from_csv, csv_path, args.repeat)
+        print(f"{'loader':<12}{'sec':>9}{'rows/s':>12}")
+        print(f"{'frame':<12}{frame_sec:>9.3f}{len(vectorized) / frame_sec:>12.0f}")
+        print(f"{'records':<12}{vectorized_sec:>9.3f}{len(vectorized) / vectorized_sec:>12.0f}")
+        if args.skip_legacy:
+            return
+        legacy_sec, legacy = measure(legacy_load_from_csv, csv_path, 1)
+        print(f"{'legacy':<12}{legacy_sec:>9.3f}{len(legacy) / legacy_sec:>12.0f}  （1回のみ）")
+        print(f"速度比（legacy / frame）: {legacy_sec / frame_sec:.1f}x、（legacy / records）: {legacy_sec / vectorized_sec:.1f}x")
+
+    if comparable(legacy).equals(comparable(vectorized)):
+        print(f"結果は一致しました（{len(vectorized)} 行）")
+    else:
+        print("エラー: 以前の実装と結果が一致しません")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""get_html_files の並列解析（プロセスプール）のワーカー数ごとの処理速度を計測する
+
+抽出インデックスを使わずに html/ の全件を解析し、ワーカー数ごとの件数/秒と、
+結果（行の順序・値）が1ワーカーの場合と完全に一致することを確認する。
+全件の再解析（サイトのマークアップ変更時など）にかかる時間の目安に使う。
+
+使い方:
+    python tools/bench_parallel_extraction.py [--workers 1 2 4] [--chunksize 8] [--backend html.parser]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyze_html import get_html_files, PARSER_BACKENDS, DEFAULT_PARSER_BACKEND, DEFAULT_CHUNKSIZE
+
+
+def comparable(rows):
+    """比較用に、実行ごとに変わらない列だけを残す"""
+    return [{key: value for key, value in row.items() if key not in ("date", "file_date")} for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="get_html_files の並列解析の処理速度を計測する")
+    parser.add_argument("--dir", default="html", help="解析するHTMLのディレクトリ")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, os.cpu_count() or 1], help="計測するワーカー数")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="ワーカーに一度に渡すファイル数")
+    parser.add_argument("--backend", default=DEFAULT_PARSER_BACKEND, choices=PARSER_BACKENDS, help="解析バックエンド")
+    args = parser.parse_args()
+
+    print(f"CPUコア数: {os.cpu_count()}、バックエンド: {args.backend}、chunksize: {args.chunksize}")
+    print(f"{'workers':>8}{'files':>7}{'sec':>8}{'files/s':>9}{'speedup':>9}  result")
+
+    reference = None
+    base_sec = None
+    for workers in sorted(set(args.workers)):
+        start = time.perf_counter()
+        rows = get_html_files(args.dir, workers=workers, chunksize=args.chunksize, backend=args.backend)
+        sec = time.perf_counter() - start
+        if reference is None:
+            reference, base_sec = comparable(rows), sec
+        status = "一致" if comparable(rows) == reference else "不一致"
+        print(f"{workers:>8}{len(rows):>7}{sec:>8.2f}{len(rows) / sec:>9.1f}{base_sec / sec:>8.1f}x  {status}")
+        if status != "一致":
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
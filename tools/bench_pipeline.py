@@ -0,0 +1,222 @@
+"""解析パイプライン（analyze_html.py）の各段階の処理時間を計測し、基準値と比較する
+
+コミット済みの html/ と graphs/html_data.csv を使い、次の段階を別々に計測する：
+    setup_japanese_font / extract_zone_data_from_html（全ファイル） / get_html_files（インデックス無し） /
+    save_to_csv / load_from_csv / html_data_store（1回の読み込み・追記・グラフ用の行への変換） /
+    graph_frame（グラフで共有するDataFrameの作成） / create_*_graph（グラフごと、共有のDataFrameを渡す）
+各段階を --repeat 回実行して最小値と中央値を求め、結果をJSONに書き出す。
+基準値のファイル（--baseline）があれば段階ごとに最小値（他の処理による揺れを受けにくい）を比較し、
+基準値より --threshold（割合）を超えて、かつ --min-delta 秒以上遅くなった段階があれば終了コード1で終了する。
+CSVとグラフは一時ディレクトリに書き出すため、graphs/ は変更しない。
+
+基準値は計測したマシンに依存するため、CPUのモデル・コア数・解析バックエンドを基準値に記録し、
+一致しないマシンでは比較結果を参考として表示するだけにする（終了コードは0）。
+比較するマシンでは --update-baseline を付けて作り直すこと。
+
+使い方:
+    python tools/bench_pipeline.py [--repeat 5] [--output bench_pipeline_results.json]
+    python tools/bench_pipeline.py --update-baseline
+"""
+import os
+import sys
+import io
+import json
+import glob
+import time
+import shutil
+import argparse
+import warnings
+import platform
+import tempfile
+import statistics
+import contextlib
+from datetime import datetime
+
+import matplotlib
+matplotlib.use("Agg")
+# 日本語フォントが無い環境でグラフごとに大量に出る警告は表示しない
+warnings.filterwarnings("ignore", message="Glyph .* missing from font")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analyze_html
+from html_storage import HTML_EXTENSIONS
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_pipeline_baseline.json")
+# 基準値と比較できるマシンかどうかの判定に使う項目
+MACHINE_KEYS = ("cpu_model", "cpu_count", "parser_backend")
+
+
+def cpu_model():
+    """CPUのモデル名（/proc/cpuinfo が無い環境では platform.processor()）"""
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def measure(func, repeat):
+    """func を repeat 回実行し、各回の秒数のリストを返す（関数内の print は表示しない）"""
+    runs = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            runs.append(time.perf_counter() - start)
+    return runs
+
+
+def build_stages(html_dir, csv_path, work_dir):
+    """計測する段階の (名前, 関数, 処理件数) のリストを返す"""
+    html_files = sorted(p for ext in HTML_EXTENSIONS for p in glob.glob(os.path.join(html_dir, f"*{ext}")))
+    with contextlib.redirect_stdout(io.StringIO()):
+        html_data = analyze_html.get_html_files(html_dir)
+        csv_data = analyze_html.load_from_csv(csv_path)
+        events = analyze_html.load_events("events.json")
+    # analyze_html と同じく、グラフには1回だけ作った共有のDataFrameを渡す
+    graph_data = analyze_html.graph_frame(analyze_html.load_frame_from_csv(csv_path))
+
+    # save_to_csv は既存のCSVへの追記（マージ）になるよう、毎回コミット済みのCSVを複製してから保存する
+    work_csv = os.path.join(work_dir, "html_data.csv")
+
+    def run_save_to_csv():
+        shutil.copyfile(csv_path, work_csv)
+        analyze_html.save_to_csv(html_data, work_dir, work_csv)
+
+    # analyze_html と同じく、1回読み込んで追記し、メモリ上の全行からグラフ用の行を作る
+    store_csv = os.path.join(work_dir, "store_html_data.csv")
+
+    def run_html_data_store():
+        shutil.copyfile(csv_path, store_csv)
+        store = analyze_html.html_data_store(store_csv)
+        store.load()
+        store.append(analyze_html.csv_frame(html_data))
+        analyze_html.records_from_frame(store.latest())
+
+    def run_extract():
+        for path in html_files:
+            analyze_html.extract_zone_data_from_html(path)
+
+    graph_dir = os.path.join(work_dir, "graphs")
+    return [
+        ("setup_japanese_font", analyze_html.setup_japanese_font, 1),
+        ("extract_zone_data_from_html", run_extract, len(html_files)),
+        ("get_html_files", lambda: analyze_html.get_html_files(html_dir), len(html_files)),
+        ("save_to_csv", run_save_to_csv, len(html_data)),
+        ("load_from_csv", lambda: analyze_html.load_from_csv(csv_path), len(csv_data)),
+        ("html_data_store", run_html_data_store, len(html_data)),
+        ("graph_frame", lambda: analyze_html.graph_frame(analyze_html.load_frame_from_csv(csv_path)), len(graph_data)),
+        ("create_timeline_graph", lambda: analyze_html.create_timeline_graph(graph_data, graph_dir), len(graph_data)),
+        ("create_daily_count_graph", lambda: analyze_html.create_daily_count_graph(graph_data, graph_dir), len(graph_data)),
+        ("create_hourly_distribution_graph", lambda: analyze_html.create_hourly_distribution_graph(graph_data, graph_dir), len(graph_data)),
+        ("create_zone_visitors_graph", lambda: analyze_html.create_zone_visitors_graph(graph_data, graph_dir, events=events), len(graph_data)),
+        ("create_zone_likes_graph", lambda: analyze_html.create_zone_likes_graph(graph_data, graph_dir, events=events), len(graph_data)),
+    ]
+
+
+def compare(stages, baseline_stages, threshold, min_delta):
+    """基準値と最小値どうしで比較し、段階ごとの (名前, 判定, 基準値に対する比) のリストを返す"""
+    results = []
+    for name, stage in stages.items():
+        base = baseline_stages.get(name)
+        if not base or "min_sec" not in base:
+            results.append((name, "新規", None))
+            continue
+        ratio = stage["min_sec"] / base["min_sec"] if base["min_sec"] else None
+        delta = stage["min_sec"] - base["min_sec"]
+        regressed = ratio is not None and ratio > 1 + threshold and delta >= min_delta
+        results.append((name, "悪化" if regressed else "OK", ratio))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="解析パイプラインの各段階の処理時間を計測し、基準値と比較する")
+    parser.add_argument("--dir", default="html", help="解析するHTMLのディレクトリ")
+    parser.add_argument("--csv", default=os.path.join("graphs", "html_data.csv"), help="読み込むCSVファイル")
+    parser.add_argument("--repeat", type=int, default=5, help="段階ごとの計測回数（最小値で比較）")
+    parser.add_argument("--stages", nargs="+", help="計測する段階（省略時は全段階）")
+    parser.add_argument("--output", default="bench_pipeline_results.json", help="計測結果を書き出すJSONファイル")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="比較する基準値のJSONファイル")
+    parser.add_argument("--threshold", type=float, default=0.5, help="悪化とみなす基準値からの増加の割合")
+    parser.add_argument("--min-delta", type=float, default=0.1, help="悪化とみなす最小の差（秒）")
+    parser.add_argument("--update-baseline", action="store_true", help="計測結果で基準値を上書きする")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.csv):
+        print(f"エラー: CSVファイルが見つかりません: {args.csv}")
+        sys.exit(1)
+
+    machine = {"cpu_model": cpu_model(), "cpu_count": os.cpu_count(), "parser_backend": analyze_html.DEFAULT_PARSER_BACKEND}
+    print(f"CPU: {machine['cpu_model']}（{machine['cpu_count']} コア）、バックエンド: {machine['parser_backend']}、計測回数: {args.repeat}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        stage_list = build_stages(args.dir, args.csv, work_dir)
+        if args.stages:
+            unknown = set(args.stages) - {name for name, _, _ in stage_list}
+            if unknown:
+                print(f"エラー: 不明な段階です: {', '.join(sorted(unknown))}")
+                sys.exit(1)
+            stage_list = [stage for stage in stage_list if stage[0] in args.stages]
+
+        stages = {}
+        for name, func, items in stage_list:
+            runs = measure(func, args.repeat)
+            stages[name] = {
+                "median_sec": statistics.median(runs),
+                "min_sec": min(runs),
+                "runs": runs,
+                "items": items,
+            }
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        **machine,
+        "repeat": args.repeat,
+        "stages": stages,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+    baseline_stages = {}
+    comparable = True
+    if not args.update_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        baseline_stages = baseline.get("stages", {})
+        differs = [key for key in MACHINE_KEYS if baseline.get(key) != machine[key]]
+        if differs:
+            comparable = False
+            print(f"基準値は別のマシンで計測されたため、比較結果は参考です（{', '.join(f'{key}: {baseline.get(key)}' for key in differs)}）")
+
+    print(f"{'stage':<34}{'items':>7}{'median s':>10}{'min s':>9}{'base min':>10}{'ratio':>8}  result")
+    comparison = compare(stages, baseline_stages, args.threshold, args.min_delta)
+    for name, status, ratio in comparison:
+        if status == "悪化" and not comparable:
+            status = "悪化（参考）"
+        stage = stages[name]
+        base = baseline_stages.get(name, {}).get("min_sec")
+        print(
+            f"{name:<34}{stage['items']:>7}{stage['median_sec']:>10.3f}{stage['min_sec']:>9.3f}"
+            f"{(f'{base:.3f}' if base is not None else '-'):>10}{(f'{ratio:.2f}x' if ratio is not None else '-'):>8}  {status}"
+        )
+    print(f"計測結果を保存しました: {args.output}")
+
+    if args.update_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"基準値を更新しました: {args.baseline}")
+        return
+
+    regressed = [name for name, status, _ in comparison if status == "悪化"]
+    if regressed and comparable:
+        print(f"処理時間が基準値より {args.threshold:.0%} を超えて悪化しました: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
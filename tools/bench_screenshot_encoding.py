@@ -0,0 +1,81 @@
+"""スクリーンショットの保存形式ごとのサイズと変換時間を比較する
+
+screenshots/ の既存PNGを各設定（PNG最適化・JPEG・WebPの品質別、サムネイル）で再エンコードし、
+合計サイズ・元のPNGに対する比率・1枚あたりの変換時間を表示する。
+検索結果グリッドへの切り抜き（clip: "results"）はページのDOMが必要なため対象外。
+
+使い方:
+    python tools/bench_screenshot_encoding.py [--limit N]
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from capture import save_image, SCREENSHOT_EXTENSIONS
+
+# 比較する設定（表示名, 形式, 品質, サムネイルの幅）
+SETTINGS = [
+    ("png (optimize)", "png", None, 0),
+    ("jpeg q85", "jpeg", 85, 0),
+    ("jpeg q75", "jpeg", 75, 0),
+    ("jpeg q60", "jpeg", 60, 0),
+    ("webp q85", "webp", 85, 0),
+    ("webp q75", "webp", 75, 0),
+    ("webp q60", "webp", 60, 0),
+    ("thumbnail 480 webp q75", "webp", 75, 480),
+]
+
+
+def encode_corpus(files, image_format, quality, thumbnail_width, work_dir):
+    """全ファイルを指定の設定で保存し、(合計バイト数, 合計秒数) を返す"""
+    options = {"format": image_format, "quality": quality}
+    total_bytes = 0
+    total_sec = 0.0
+    for i, file_path in enumerate(files):
+        out_path = os.path.join(work_dir, f"{i}{SCREENSHOT_EXTENSIONS[image_format]}")
+        start = time.perf_counter()
+        image = Image.open(file_path)
+        if thumbnail_width:
+            height = max(1, round(image.height * thumbnail_width / image.width))
+            image = image.resize((thumbnail_width, height), Image.LANCZOS)
+        save_image(image, out_path, options)
+        total_sec += time.perf_counter() - start
+        total_bytes += os.path.getsize(out_path)
+        os.remove(out_path)
+    return total_bytes, total_sec
+
+
+def main():
+    parser = argparse.ArgumentParser(description="スクリーンショットの保存形式ごとのサイズと変換時間を比較する")
+    parser.add_argument("--dir", default="screenshots", help="比較に使うPNGのディレクトリ")
+    parser.add_argument("--limit", type=int, default=0, help="使用するファイル数の上限（0は全件、新しい順）")
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(args.dir, "*.png")))
+    if args.limit:
+        files = files[-args.limit:]
+    if not files:
+        print(f"エラー: {args.dir} にPNGファイルがありません。")
+        sys.exit(1)
+
+    original_bytes = sum(os.path.getsize(f) for f in files)
+    print(f"対象: {len(files)} 枚、元のPNG合計 {original_bytes / 1024 / 1024:.1f} MB（1枚平均 {original_bytes / len(files) / 1024:.0f} KB）")
+    print(f"{'setting':<24}{'total MB':>10}{'avg KB':>9}{'ratio':>8}{'ms/img':>9}")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for label, image_format, quality, thumbnail_width in SETTINGS:
+            total_bytes, total_sec = encode_corpus(files, image_format, quality, thumbnail_width, work_dir)
+            print(
+                f"{label:<24}{total_bytes / 1024 / 1024:>10.1f}{total_bytes / len(files) / 1024:>9.0f}"
+                f"{total_bytes / original_bytes:>8.2f}{total_sec / len(files) * 1000:>9.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
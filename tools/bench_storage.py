@@ -0,0 +1,164 @@
+"""時系列データの保存形式（CSV・Parquet・SQLite）ごとに、読み込み・更新の処理時間とファイルサイズを計測する
+
+実際のCSV（または --rows 行の合成CSV、tools/bench_load_csv.py と同じもの）を一時ディレクトリのParquetとSQLiteに取り込み、
+次の処理を比較する（処理時間は --repeat 回の中央値）：
+    csv full        load_frame_from_csv（CSV全体を読み込み、日時を正規化して型付きのDataFrameにする）
+    parquet full    read_parquet_store（すべての月のパーティションを読み込む）
+    parquet month   read_parquet_store で最後の1か月だけを読む（範囲外のパーティションは開かない）
+    csv append      AppendOnlyCsvStore の読み込みと最後の1日分の行の追記
+    parquet upsert  upsert_parquet_store で最後の1日分の行を更新する（その月のパーティションだけを書き直す）
+    sqlite full     read_sqlite_store（すべてのスナップショットを読み込み、ゾーンごとの列に並べ替える）
+    sqlite month    read_sqlite_store で最後の1か月だけを読む（snapshots の取得日時の索引）
+    sqlite zone     zone_series で1つのゾーンの最後の1か月だけを読む（measurements の (zone, taken_at) の索引）
+    sqlite upsert   upsert_sqlite_store で最後の1日分の行を更新する
+CSV全体と、Parquet・SQLiteの全行の読み込み結果が一致することも確認する。
+
+使い方:
+    python tools/bench_storage.py [--csv graphs/html_data.csv] [--rows 100000] [--repeat 5]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import contextlib
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parquet_store
+import sqlite_store
+from analyze_html import load_frame_from_csv, csv_frame, html_data_store, zone_columns, ZONE_SHORT_NAMES
+from bench_load_csv import synthetic_csv
+
+
+def timed(func, repeat, setup=None):
+    """func の処理時間の中央値と、最後の戻り値を返す（setup は計測の前に毎回呼ぶ）"""
+    runs = []
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = func()
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs), result
+
+
+def sqlite_size(db_path):
+    """データベースのサイズ（WALの内容を書き戻してから測る）"""
+    with contextlib.closing(sqlite_store.connect(db_path)) as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(db_path)
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV・Parquet・SQLite の読み込み・更新の処理時間を計測する")
+    parser.add_argument("--csv", default=os.path.join("graphs", "html_data.csv"), help="読み込むCSVファイル")
+    parser.add_argument("--rows", type=int, help="合成CSVの行数（指定した場合は --csv を使わない）")
+    parser.add_argument("--repeat", type=int, default=5, help="計測回数（中央値を使用）")
+    args = parser.parse_args()
+
+    columns = zone_columns()
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_path = os.path.join(work_dir, "html_data.csv")
+        if args.rows:
+            synthetic_csv(csv_path, args.rows)
+        else:
+            shutil.copyfile(args.csv, csv_path)
+        dataset_dir = os.path.join(work_dir, "html_data.parquet")
+        frame = load_frame_from_csv(csv_path)
+        parquet_store.import_csv_frame(dataset_dir, frame, columns)
+        db_path = os.path.join(work_dir, "html_data.sqlite")
+        sqlite_store.import_csv_frame(db_path, frame, ZONE_SHORT_NAMES)
+
+        last = frame["date"].max()
+        month_start = last.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        # 最後の1日分の行（値を変えて更新する）
+        recent = frame[frame["date"] >= last - pd.Timedelta(days=1)].copy()
+        recent[columns] = recent[columns] + 1
+
+        print(f"CSV: {args.csv if not args.rows else f'合成 {args.rows} 行'}（{len(frame)} 行）、計測回数: {args.repeat}")
+        print(f"サイズ: CSV {os.path.getsize(csv_path) / 1024:.0f} KB、Parquet {dir_size(dataset_dir) / 1024:.0f} KB"
+              f"（{len(os.listdir(dataset_dir))} パーティション）、SQLite {sqlite_size(db_path) / 1024:.0f} KB")
+        print(f"{'operation':<16}{'sec':>9}{'rows':>9}")
+
+        results = {}
+        results["csv full"] = timed(lambda: load_frame_from_csv(csv_path), args.repeat)
+        results["parquet full"] = timed(lambda: parquet_store.read_parquet_store(dataset_dir, zone_columns=columns), args.repeat)
+        results["parquet month"] = timed(
+            lambda: parquet_store.read_parquet_store(dataset_dir, since=month_start, zone_columns=columns), args.repeat
+        )
+        results["sqlite full"] = timed(lambda: sqlite_store.read_sqlite_store(db_path, ZONE_SHORT_NAMES), args.repeat)
+        results["sqlite month"] = timed(
+            lambda: sqlite_store.read_sqlite_store(db_path, ZONE_SHORT_NAMES, since=month_start), args.repeat
+        )
+        results["sqlite zone"] = timed(
+            lambda: sqlite_store.zone_series(db_path, ZONE_SHORT_NAMES[0], since=month_start), args.repeat
+        )
+
+        csv_backup = os.path.join(work_dir, "html_data.csv.orig")
+        shutil.copyfile(csv_path, csv_backup)
+        recent_csv = csv_frame(recent.to_dict("records"))
+
+        def csv_append():
+            store = html_data_store(csv_path)
+            store.load()
+            return store.append(recent_csv)
+
+        results["csv append"] = timed(csv_append, args.repeat, setup=lambda: shutil.copyfile(csv_backup, csv_path))
+        dataset_backup = os.path.join(work_dir, "html_data.parquet.orig")
+        shutil.copytree(dataset_dir, dataset_backup)
+
+        def restore_dataset():
+            shutil.rmtree(dataset_dir)
+            shutil.copytree(dataset_backup, dataset_dir)
+
+        results["parquet upsert"] = timed(
+            lambda: parquet_store.upsert_parquet_store(dataset_dir, recent, columns), args.repeat, setup=restore_dataset
+        )
+        db_backup = os.path.join(work_dir, "html_data.sqlite.orig")
+        sqlite_size(db_path)
+        shutil.copyfile(db_path, db_backup)
+
+        def restore_database():
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+            shutil.copyfile(db_backup, db_path)
+
+        results["sqlite upsert"] = timed(
+            lambda: sqlite_store.upsert_sqlite_store(db_path, recent, ZONE_SHORT_NAMES), args.repeat, setup=restore_database
+        )
+
+        for name, (sec, result) in results.items():
+            rows = result if isinstance(result, int) else len(result)
+            print(f"{name:<16}{sec:>9.4f}{rows:>9}")
+
+        csv_sec = results["csv full"][0]
+        print("速度比（csv full / 各読み込み）: " + "、".join(
+            f"{name} {csv_sec / results[name][0]:.1f}x" for name in ("parquet full", "parquet month", "sqlite full", "sqlite month", "sqlite zone")
+        ))
+
+        # 結果の一致を確認（同じ filename と日時の行は後の行を使う）
+        expected = parquet_store._normalize(frame, columns).drop_duplicates(subset=parquet_store.KEY_COLUMNS, keep="last")
+        expected = expected.sort_values("date", kind="stable").reset_index(drop=True)
+        mismatched = [
+            name for name in ("parquet full", "sqlite full")
+            if not expected.equals(parquet_store._normalize(results[name][1], columns))
+        ]
+        if mismatched:
+            print(f"警告: CSV と {'・'.join(mismatched)} の読み込み結果が一致しません")
+            sys.exit(1)
+        print(f"結果は一致しました（{len(expected)} 行）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""レイアウトキャッシュ（layout_cache.py）を使った抽出結果が、全体を探索した場合と一致することを確認する
+
+html/ の全件について、バックエンドごとに次の3通りで iter_world_cards を実行し、
+カードごとの (ワールドID, タイトル, 来場者数, いいね数) が完全に一致するかを比較する：
+    キャッシュなし / 空のキャッシュ（初回: 全体を探索して記録） / 記録済みのキャッシュ（2回目: 記録した位置だけを読む）
+HTMLの読み込み・木の構築を除いたカードの処理時間と、キャッシュのヒット率も表示する。
+キャッシュはメモリ上だけで使い、graphs/layout_cache.json は変更しない。
+
+使い方:
+    python tools/check_layout_cache.py [--dir html] [--backends selectolax html.parser+strainer]
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analyze_html
+from analyze_html import PARSER_BACKENDS, DEFAULT_PARSER_BACKEND
+from html_storage import HTML_EXTENSIONS, read_html
+from layout_cache import LayoutCache
+
+
+def parse_tree(html_content, backend):
+    """バックエンドの木を構築し、カードを列挙する関数と組にして返す"""
+    if backend == "selectolax":
+        from selectolax.lexbor import LexborHTMLParser
+        return LexborHTMLParser(html_content), analyze_html._iter_world_cards_selectolax
+    features, _, option = backend.partition("+")
+    parse_only = analyze_html.SoupStrainer("a", href=analyze_html._is_world_href) if option == "strainer" else None
+    return analyze_html.BeautifulSoup(html_content, features, parse_only=parse_only), analyze_html._iter_world_cards_bs4
+
+
+def run(trees, layouts):
+    """構築済みの木からカードを列挙し、(結果のリスト, 秒数) を返す"""
+    start = time.perf_counter()
+    results = [list(iter_cards(tree, layouts)) for tree, iter_cards in trees]
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="レイアウトキャッシュを使った抽出結果が全体の探索と一致するかを確認する")
+    parser.add_argument("--dir", default="html", help="解析するHTMLのディレクトリ")
+    backends = [backend for backend in PARSER_BACKENDS if backend != "stream"]
+    parser.add_argument("--backends", nargs="+", default=[DEFAULT_PARSER_BACKEND], choices=backends, help="確認するバックエンド")
+    args = parser.parse_args()
+
+    html_files = sorted(p for ext in HTML_EXTENSIONS for p in glob.glob(os.path.join(args.dir, f"*{ext}")))
+    contents = [read_html(path) for path in html_files]
+    cards = None
+    print(f"{'backend':<22}{'run':<8}{'sec':>8}{'ms/card':>9}{'hits':>7}{'misses':>8}{'layouts':>9}  result")
+
+    mismatched = False
+    for backend in args.backends:
+        trees = [parse_tree(content, backend) for content in contents]
+        reference, base_sec = run(trees, None)
+        cards = sum(len(result) for result in reference)
+        print(f"{backend:<22}{'none':<8}{base_sec:>8.3f}{base_sec / cards * 1000:>9.3f}{'-':>7}{'-':>8}{'-':>9}  基準")
+
+        layouts = LayoutCache()
+        for label in ("cold", "warm"):
+            layouts.hits, layouts.misses, layouts.new_entries = {}, 0, {}
+            results, sec = run(trees, layouts)
+            status = "一致" if results == reference else "不一致"
+            mismatched = mismatched or status != "一致"
+            print(
+                f"{backend:<22}{label:<8}{sec:>8.3f}{sec / cards * 1000:>9.3f}{sum(layouts.hits.values()):>7}"
+                f"{layouts.misses:>8}{len(layouts.entries):>9}  {status}"
+            )
+
+    print(f"{len(html_files)} ファイル、{cards} 枚のカード")
+    if mismatched:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
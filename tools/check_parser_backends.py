@@ -0,0 +1,77 @@
+"""HTML解析バックエンドごとの抽出結果の一致と解析速度を確認する
+
+html/ の全HTMLを各バックエンド（analyze_html.PARSER_BACKENDS）で解析し、
+基準の html.parser と抽出結果（ワールドID・タイトル・来場者数・いいね数）が完全に一致するかを比較する。
+あわせて、バックエンドごとの解析速度（件/秒、MB/秒）を表示する。
+ファイルの読み込み・展開は計測に含めない。
+
+使い方:
+    python tools/check_parser_backends.py [--dir html] [--limit N] [--backends lxml selectolax ...]
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_storage import HTML_EXTENSIONS, read_html
+from analyze_html import PARSER_BACKENDS, DEFAULT_PARSER_BACKEND, iter_world_cards
+
+REFERENCE_BACKEND = "html.parser"
+
+
+def extract_all(contents, backend):
+    """全HTMLを backend で解析し、(ファイルごとの抽出結果のリスト, 合計秒数) を返す"""
+    results = []
+    start = time.perf_counter()
+    for html_content in contents:
+        results.append(list(iter_world_cards(html_content, backend)))
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML解析バックエンドごとの抽出結果の一致と解析速度を確認する")
+    parser.add_argument("--dir", default="html", help="確認するHTMLのディレクトリ")
+    parser.add_argument("--limit", type=int, default=0, help="確認するファイル数の上限（0は全件、新しい順）")
+    parser.add_argument("--backends", nargs="+", default=PARSER_BACKENDS, choices=PARSER_BACKENDS, help="確認するバックエンド")
+    args = parser.parse_args()
+
+    files = sorted(p for ext in HTML_EXTENSIONS for p in glob.glob(os.path.join(args.dir, f"*{ext}")))
+    if args.limit:
+        files = files[-args.limit:]
+    if not files:
+        print(f"エラー: {args.dir} にHTMLファイルがありません。")
+        sys.exit(1)
+
+    contents = [read_html(path) for path in files]
+    total_mb = sum(len(html_content.encode("utf-8")) for html_content in contents) / 1024 / 1024
+    print(f"対象: {len(files)} 件（{total_mb:.1f} MB）、基準: {REFERENCE_BACKEND}、既定: {DEFAULT_PARSER_BACKEND}")
+    print(f"{'backend':<22}{'files/s':>9}{'MB/s':>8}{'ms/file':>9}{'speedup':>9}  result")
+
+    expected, reference_sec = extract_all(contents, REFERENCE_BACKEND)
+    failed = False
+    for backend in [REFERENCE_BACKEND] + [b for b in args.backends if b != REFERENCE_BACKEND]:
+        if backend == REFERENCE_BACKEND:
+            results, sec = expected, reference_sec
+        else:
+            try:
+                results, sec = extract_all(contents, backend)
+            except ImportError as e:
+                print(f"{backend:<22}{'-':>9}{'-':>8}{'-':>9}{'-':>9}  スキップ（{e}）")
+                continue
+        mismatched = [os.path.basename(path) for path, a, b in zip(files, expected, results) if a != b]
+        status = "一致" if not mismatched else f"不一致 {len(mismatched)} 件（例: {mismatched[0]}）"
+        failed = failed or bool(mismatched)
+        print(
+            f"{backend:<22}{len(files) / sec:>9.1f}{total_mb / sec:>8.1f}{sec / len(files) * 1000:>9.1f}"
+            f"{reference_sec / sec:>8.1f}x  {status}"
+        )
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
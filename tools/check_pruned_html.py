@@ -0,0 +1,80 @@
+"""ワールドカードだけを残したHTML（html_prune）で解析結果が変わらないことを確認する
+
+html/ の各HTMLからワールドカード（a[href^="/w/"]）だけを切り出した最小限のHTMLを作成し、
+extract_zone_data_from_html の結果が元のHTMLと完全に一致するかを全件で比較する。
+あわせて、切り出し前後のファイルサイズと解析時間の合計を表示する。
+
+使い方:
+    python tools/check_pruned_html.py [--dir html] [--limit N]
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_storage import HTML_EXTENSIONS, read_html, prune_html
+from analyze_html import extract_zone_data_from_html
+
+
+def timed_extraction(path):
+    """抽出結果と解析時間（秒）を返す"""
+    start = time.perf_counter()
+    zone_data = extract_zone_data_from_html(path)
+    return zone_data, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ワールドカードだけを残したHTMLで解析結果が変わらないことを確認する")
+    parser.add_argument("--dir", default="html", help="確認するHTMLのディレクトリ")
+    parser.add_argument("--limit", type=int, default=0, help="確認するファイル数の上限（0は全件、新しい順）")
+    args = parser.parse_args()
+
+    files = sorted(p for ext in HTML_EXTENSIONS for p in glob.glob(os.path.join(args.dir, f"*{ext}")))
+    if args.limit:
+        files = files[-args.limit:]
+    if not files:
+        print(f"エラー: {args.dir} にHTMLファイルがありません。")
+        sys.exit(1)
+
+    mismatches = []
+    empty = 0
+    bytes_full = bytes_pruned = 0
+    sec_full = sec_pruned = 0.0
+    with tempfile.TemporaryDirectory() as work_dir:
+        pruned_path = os.path.join(work_dir, "pruned.html")
+        for path in files:
+            html_content = read_html(path)
+            pruned_content = prune_html(html_content)
+            with open(pruned_path, "w", encoding="utf-8") as f:
+                f.write(pruned_content)
+
+            full_data, full_sec = timed_extraction(path)
+            pruned_data, pruned_sec = timed_extraction(pruned_path)
+            if full_data != pruned_data:
+                mismatches.append((os.path.basename(path), full_data, pruned_data))
+            if not full_data:
+                empty += 1
+
+            bytes_full += len(html_content.encode("utf-8"))
+            bytes_pruned += len(pruned_content.encode("utf-8"))
+            sec_full += full_sec
+            sec_pruned += pruned_sec
+
+    print(f"対象: {len(files)} 件（ゾーンデータを含まないファイル: {empty} 件）")
+    print(f"  サイズ: ページ全体 {bytes_full / 1024 / 1024:.1f} MB → 切り出し後 {bytes_pruned / 1024 / 1024:.1f} MB（{bytes_pruned / bytes_full:.1%}）")
+    print(f"  解析時間: ページ全体 {sec_full / len(files) * 1000:.1f} ms/件 → 切り出し後 {sec_pruned / len(files) * 1000:.1f} ms/件")
+    if mismatches:
+        for filename, full_data, pruned_data in mismatches:
+            print(f"不一致: {filename}")
+            print(f"  ページ全体: {full_data}")
+            print(f"  切り出し後: {pruned_data}")
+        sys.exit(1)
+    print("一致: すべてのファイルで解析結果が一致しました。")
+
+
+if __name__ == "__main__":
+    main()
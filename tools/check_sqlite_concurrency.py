@@ -0,0 +1,132 @@
+"""SQLiteのデータストアに複数のプロセスが同時に書き込み・読み込みしても、取りこぼしやエラーが無いことを確認する
+
+一時ディレクトリのデータベースに対して、次のプロセスを同時に動かす：
+    取得（--writers 個）  capture_records.append_world_record と同じ write_capture で、1回分ずつ --captures 回書き込む
+    解析（1個）           analyze_html と同じ upsert_sqlite_store で、--batch 行ずつまとめて書き込む
+    読み込み（メイン）    read_sqlite_store で全行を繰り返し読み、行数が減らないこと（途中の状態が見えないこと）を確認する
+終了後、すべての行がそろっていること（件数と値）を確認し、書き込みの所要時間の分布を表示する。
+
+使い方:
+    python tools/check_sqlite_concurrency.py [--writers 4] [--captures 200] [--batch 500]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlite_store
+from analyze_html import ZONES, ZONE_SHORT_NAMES
+
+JST = ZoneInfo("Asia/Tokyo")
+START = datetime(2026, 1, 1, tzinfo=JST)
+
+
+def capture_writer(db_path, writer, captures, queue):
+    """取得プロセス：取得1回分ずつ書き込み、書き込みごとの所要時間（秒）を返す"""
+    durations = []
+    for i in range(captures):
+        stamp = (START + timedelta(minutes=writer * captures + i)).strftime("%Y%m%d_%H%M%S")
+        worlds = [
+            {"world_id": zone.get("number", zone["short_name"]), "title": zone.get("name", zone["short_name"]),
+             "visitors": 1000 + i, "likes": writer}
+            for zone in ZONES
+        ]
+        start = time.perf_counter()
+        sqlite_store.write_capture(db_path, f"IPTeCA_{stamp}_JST", worlds, ZONE_SHORT_NAMES)
+        durations.append(time.perf_counter() - start)
+    queue.put(("capture", durations))
+
+
+def analysis_writer(db_path, rows, batch, queue):
+    """解析プロセス：取得とは別の期間の行を batch 行ずつまとめて書き込む"""
+    durations = []
+    for offset in range(0, rows, batch):
+        dates = [START - timedelta(days=365) + timedelta(minutes=i) for i in range(offset, min(offset + batch, rows))]
+        frame = pd.DataFrame({
+            "filename": [f"IPTeCA_{date.strftime('%Y%m%d_%H%M%S')}_JST.html" for date in dates],
+            "date": dates,
+            "file_date": dates,
+            "file_path": None,
+        })
+        for zone in ZONE_SHORT_NAMES:
+            frame[f"{zone}_visitors"] = 1
+            frame[f"{zone}_likes"] = 0
+        start = time.perf_counter()
+        sqlite_store.upsert_sqlite_store(db_path, frame, ZONE_SHORT_NAMES)
+        durations.append(time.perf_counter() - start)
+    queue.put(("analysis", durations))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLiteのデータストアへの同時書き込み・読み込みを確認する")
+    parser.add_argument("--writers", type=int, default=4, help="同時に書き込む取得プロセスの数")
+    parser.add_argument("--captures", type=int, default=200, help="取得プロセスごとの書き込み回数")
+    parser.add_argument("--batch", type=int, default=500, help="解析プロセスが一度に書き込む行数")
+    args = parser.parse_args()
+
+    analysis_rows = args.batch * 10
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "html_data.sqlite")
+        sqlite_store.connect(db_path).close()
+        queue = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=capture_writer, args=(db_path, writer, args.captures, queue))
+            for writer in range(args.writers)
+        ]
+        processes.append(multiprocessing.Process(target=analysis_writer, args=(db_path, analysis_rows, args.batch, queue)))
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+
+        # 書き込み中に読み込む（行数は減らず、1回の読み込みはある時点の一貫した内容になる）
+        reads = 0
+        previous = 0
+        errors = []
+        while any(process.is_alive() for process in processes):
+            df = sqlite_store.read_sqlite_store(db_path, ZONE_SHORT_NAMES)
+            count = 0 if df is None else len(df)
+            if count < previous:
+                errors.append(f"読み込んだ行数が減りました: {previous} → {count}")
+            previous = count
+            reads += 1
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+            if process.exitcode != 0:
+                errors.append(f"プロセス {process.pid} が終了コード {process.exitcode} で終了しました")
+        elapsed = time.perf_counter() - start
+
+        df = sqlite_store.read_sqlite_store(db_path, ZONE_SHORT_NAMES)
+        expected = args.writers * args.captures + analysis_rows
+        if len(df) != expected:
+            errors.append(f"行数が一致しません: {len(df)} 行（期待値 {expected} 行）")
+        captured = df[df["date"] >= START]
+        if not (captured[f"{ZONE_SHORT_NAMES[0]}_visitors"] >= 1000).all():
+            errors.append("取得プロセスの値が正しく書き込まれていません")
+
+        print(f"取得 {args.writers} プロセス × {args.captures} 回、解析 {analysis_rows} 行（{args.batch} 行ずつ）、"
+              f"読み込み {reads} 回: {elapsed:.2f} 秒")
+        for name in ("capture", "analysis"):
+            durations = sorted(d for kind, values in results if kind == name for d in values)
+            if durations:
+                p95 = durations[int(len(durations) * 0.95) - 1] if len(durations) >= 20 else durations[-1]
+                print(f"  {name:<9} 書き込み {len(durations):>5} 回: 中央値 {statistics.median(durations) * 1000:.1f} ms、"
+                      f"95% {p95 * 1000:.1f} ms、最大 {durations[-1] * 1000:.1f} ms")
+    if errors:
+        for error in errors:
+            print(f"エラー: {error}")
+        sys.exit(1)
+    print(f"すべての行がそろっています（{expected} 行）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""取得時の記録（world_records.jsonl）に欠けた数値やゾーンがある場合に、HTMLの抽出結果で補われることを確認する
+
+実際のスナップショット（--file、省略時は --dir の最新のHTML）を一時ディレクトリに取得時刻を変えて3つ複製し、
+それぞれに次の記録を付けて get_html_files で読み込む（記録の数値はHTMLの値に1を足し、記録が使われたことを見分ける）：
+    null     1つ目のゾーンのワールドの来場者数を null にした記録  → そのゾーンはHTMLの値、他のゾーンは記録の値
+    missing  1つ目のゾーンのワールドを除いた記録                  → そのゾーンはHTMLの値、他のゾーンは記録の値
+    complete すべての数値がそろった記録                          → すべてのゾーンが記録の値（HTMLは解析しない）
+
+使い方:
+    python tools/check_world_records.py [--dir html] [--file html/IPTeCA_YYYYMMDD_HHMMSS_JST.html]
+"""
+import os
+import sys
+import glob
+import json
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_storage import HTML_EXTENSIONS, strip_html_extension
+from analyze_html import get_html_files, extract_worlds_from_html, zone_data_from_worlds, _match_zone_name
+
+# 複製するスナップショットの取得時刻と、付ける記録の種類
+CASES = {
+    "20200101_000000": "null",
+    "20200101_000100": "missing",
+    "20200101_000200": "complete",
+}
+
+
+def build_record(html_worlds, case, target_zone):
+    """HTMLの抽出結果から記録（world_records の worlds）を作る（数値はHTMLの値に1を足す）"""
+    record = []
+    for world_id, world in html_worlds.items():
+        zone = _match_zone_name(world["title"])
+        entry = {"world_id": world_id, "title": world["title"], "visitors": world["visitors"] + 1, "likes": world["likes"] + 1}
+        if zone == target_zone and case == "missing":
+            continue
+        if zone == target_zone and case == "null":
+            entry["visitors"] = None
+        record.append(entry)
+    return record
+
+
+def expected_zones(html_zones, case, target_zone):
+    """ゾーンごとの期待値（欠けたゾーンはHTMLの値、それ以外は記録の値）"""
+    expected = {}
+    for zone, values in html_zones.items():
+        if zone == target_zone and case != "complete":
+            expected[zone] = dict(values)
+        else:
+            expected[zone] = {"visitors": values["visitors"] + 1, "likes": values["likes"] + 1}
+    return expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="取得時の記録に欠けた数値やゾーンがある場合の補完を確認する")
+    parser.add_argument("--dir", default="html", help="スナップショットを探すディレクトリ")
+    parser.add_argument("--file", help="使用するスナップショット（省略時は --dir の最新のHTML）")
+    args = parser.parse_args()
+
+    source = args.file
+    if source is None:
+        files = sorted(p for ext in HTML_EXTENSIONS for p in glob.glob(os.path.join(args.dir, f"*{ext}")))
+        if not files:
+            print(f"エラー: {args.dir} にHTMLファイルがありません。")
+            sys.exit(1)
+        source = files[-1]
+    html_worlds = extract_worlds_from_html(source)
+    html_zones = zone_data_from_worlds(html_worlds)
+    if not html_zones:
+        print(f"エラー: {source} からゾーンのデータを抽出できませんでした。")
+        sys.exit(1)
+    target_zone = next(iter(html_zones))
+    extension = source[len(strip_html_extension(source)):]
+    print(f"スナップショット: {source}（{len(html_worlds)} ワールド、欠けさせるゾーン: {target_zone}）")
+
+    errors = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        records_path = os.path.join(work_dir, "world_records.jsonl")
+        with open(records_path, "w", encoding="utf-8") as f:
+            for stamp, case in CASES.items():
+                snapshot = f"IPTeCA_{stamp}_JST"
+                shutil.copyfile(source, os.path.join(work_dir, snapshot + extension))
+                record = {"snapshot": snapshot, "url": None, "worlds": build_record(html_worlds, case, target_zone)}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        rows = {row["filename"]: row for row in get_html_files(work_dir, records_path=records_path, workers=1)}
+        for stamp, case in CASES.items():
+            row = rows.get(f"IPTeCA_{stamp}_JST.html")
+            if row is None:
+                errors.append(f"{case}: 行がありません")
+                continue
+            actual = zone_data_from_worlds(row["worlds"])
+            expected = expected_zones(html_zones, case, target_zone)
+            status = "一致" if actual == expected else "不一致"
+            print(f"  {case:<9}{status}")
+            if actual != expected:
+                errors.append(f"{case}: 期待値 {expected}、結果 {actual}")
+
+    if errors:
+        for error in errors:
+            print(f"エラー: {error}")
+        sys.exit(1)
+    print("記録に欠けた数値・ゾーンはHTMLの値で補われ、そろった記録はそのまま使われました。")
+
+
+if __name__ == "__main__":
+    main()
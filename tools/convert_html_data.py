@@ -0,0 +1,72 @@
+"""html_data.csv と Parquet・SQLite のデータストアを相互に変換する
+
+config.json の analysis.storage を "parquet" にした場合、analyze_html は時系列データを月ごとのパーティションに分けた
+Parquetのデータセット（graphs/html_data.parquet/）に、"sqlite" にした場合はSQLiteのデータベース（analysis.sqlite_path、
+既定は graphs/html_data.sqlite）に保存し、CSVファイルは読み書きしない。手動でデータを入力・修正する場合は次の手順で行う：
+    1. export  データストアの全行を html_data.csv と同じ列のCSVに書き出す
+    2. 書き出したCSVを表計算ソフトなどで編集する（手動の行は filename を .png にする）
+    3. import  CSVの行をデータストアに取り込む（同じ filename と日時の行は置き換える）
+--replace を付けると、既存のデータをすべて削除してからCSVの内容で作り直す（CSVから削除した行も反映する）。
+日時の書式は load_from_csv と同じく、スラッシュ区切りや秒の無い時刻も読み込める。
+
+使い方:
+    python tools/convert_html_data.py export [graphs/html_data.csv] [--store parquet|sqlite] [--dataset PATH]
+    python tools/convert_html_data.py import [graphs/html_data.csv] [--store parquet|sqlite] [--dataset PATH] [--replace]
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parquet_store
+import sqlite_store
+from analyze_html import load_frame_from_csv, zone_columns, ZONE_SHORT_NAMES
+
+# 保存形式ごとのデータストアの既定の場所
+DEFAULT_DATASETS = {
+    "parquet": os.path.join("graphs", "html_data.parquet"),
+    "sqlite": sqlite_store.DEFAULT_SQLITE_PATH,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="html_data.csv と Parquet・SQLite のデータストアを相互に変換する")
+    parser.add_argument("command", choices=("import", "export"), help="import: CSV → データストア、export: データストア → CSV")
+    parser.add_argument("csv", nargs="?", default=os.path.join("graphs", "html_data.csv"), help="CSVファイル")
+    parser.add_argument("--store", default="parquet", choices=sorted(DEFAULT_DATASETS), help="データストアの形式")
+    parser.add_argument("--dataset", help="データストアの場所（省略時は graphs/html_data.parquet または graphs/html_data.sqlite）")
+    parser.add_argument("--replace", action="store_true", help="import 時に既存のデータをすべてCSVの内容で置き換える")
+    args = parser.parse_args()
+    args.dataset = args.dataset or DEFAULT_DATASETS[args.store]
+
+    if args.command == "export":
+        if args.store == "sqlite":
+            df = sqlite_store.export_csv_frame(args.dataset, ZONE_SHORT_NAMES)
+        else:
+            df = parquet_store.export_csv_frame(args.dataset, zone_columns())
+        if df is None:
+            print(f"エラー: データストアがありません: {args.dataset}")
+            sys.exit(1)
+        df.to_csv(args.csv, index=False, encoding="utf-8-sig")
+        print(f"{len(df)} 件をCSVに書き出しました: {args.dataset} → {args.csv}")
+    else:
+        if not os.path.exists(args.csv):
+            print(f"エラー: CSVファイルがありません: {args.csv}")
+            sys.exit(1)
+        frame = load_frame_from_csv(args.csv)
+        if args.store == "sqlite":
+            changed = sqlite_store.import_csv_frame(args.dataset, frame, ZONE_SHORT_NAMES, replace=args.replace)
+        else:
+            changed = parquet_store.import_csv_frame(args.dataset, frame, zone_columns(), replace=args.replace)
+        print(f"CSVの {len(frame)} 件のうち {changed} 件を取り込みました（追加・更新）: {args.csv} → {args.dataset}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"エラーが発生しました: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,154 @@
+"""保存済みのHTMLを html_storage の圧縮形式へ一括移行する
+
+html/ の非圧縮HTML（または別の圧縮形式のHTML）を指定の形式で保存し直し、
+展開した内容が元のHTMLと一致することを確認してから元のファイルを削除する。
+ファイルの更新日時（CSVの file_date_str）は元のファイルのものを引き継ぎ、
+変化なしマーカー（*.same）の参照先も新しいファイル名に書き換える。
+
+移行後に、削減できたバイト数と、一部のファイルでの解析時間（圧縮前後）を表示する。
+
+使い方:
+    python tools/migrate_html_storage.py [--compression gzip|zstd] [--level N] [--sample N] [--dry-run]
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_storage import (
+    HTML_EXTENSIONS, HTML_STORAGE_EXTENSIONS, get_html_storage_config, strip_html_extension, compress_html, read_html,
+)
+from snapshot_dedup import UNCHANGED_SUFFIX
+
+
+def load_config():
+    """config.json を読み込む"""
+    with open("config.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def time_extraction(path, repeat):
+    """extract_zone_data_from_html の1回あたりの時間（ミリ秒）と抽出結果を返す"""
+    from analyze_html import extract_zone_data_from_html
+    start = time.perf_counter()
+    for _ in range(repeat):
+        zone_data = extract_zone_data_from_html(path)
+    return (time.perf_counter() - start) / repeat * 1000, zone_data
+
+
+def rewrite_markers(html_dir, renamed):
+    """変化なしマーカーの参照先（same_as）を移行後のファイル名に書き換え、書き換えた数を返す"""
+    count = 0
+    for ext in HTML_EXTENSIONS:
+        for marker_path in glob.glob(os.path.join(html_dir, f"*{ext}{UNCHANGED_SUFFIX}")):
+            with open(marker_path, "r", encoding="utf-8") as f:
+                marker = json.load(f)
+            if marker["same_as"] not in renamed:
+                continue
+            marker["same_as"] = renamed[marker["same_as"]]
+            stat = os.stat(marker_path)
+            with open(marker_path, "w", encoding="utf-8") as f:
+                json.dump(marker, f, ensure_ascii=False)
+                f.write("\n")
+            os.utime(marker_path, (stat.st_atime, stat.st_mtime))
+            count += 1
+    return count
+
+
+def migrate(html_dir, compression, level=None, sample=10, repeat=3, dry_run=False):
+    """html_dir のHTMLを compression 形式へ移行し、移行結果の集計を返す"""
+    target_ext = HTML_STORAGE_EXTENSIONS[compression]
+    files = sorted(
+        p for ext in HTML_EXTENSIONS for p in glob.glob(os.path.join(html_dir, f"*{ext}")) if not p.endswith(target_ext)
+    )
+    # 解析時間を測るファイル（新しいものから sample 件）
+    sample_files = set(files[-sample:]) if sample else set()
+
+    report = {"files": 0, "bytes_before": 0, "bytes_after": 0, "parse_before_ms": [], "parse_after_ms": [], "mismatches": 0}
+    renamed = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for path in files:
+            html_content = read_html(path)
+            data = compress_html(html_content, compression, level)
+            new_path = strip_html_extension(path) + target_ext
+            written_path = os.path.join(work_dir, os.path.basename(new_path))
+            with open(written_path, "wb") as f:
+                f.write(data)
+            if read_html(written_path) != html_content:
+                raise RuntimeError(f"圧縮したHTMLを展開した内容が元と一致しません: {path}")
+
+            if path in sample_files:
+                before_ms, before_data = time_extraction(path, repeat)
+                after_ms, after_data = time_extraction(written_path, repeat)
+                report["parse_before_ms"].append(before_ms)
+                report["parse_after_ms"].append(after_ms)
+                if before_data != after_data:
+                    report["mismatches"] += 1
+
+            report["files"] += 1
+            report["bytes_before"] += os.path.getsize(path)
+            report["bytes_after"] += len(data)
+
+            if not dry_run:
+                stat = os.stat(path)
+                os.replace(written_path, new_path)
+                # 更新日時は元のファイルのものを引き継ぐ（get_html_files の file_date に使われる）
+                os.utime(new_path, (stat.st_atime, stat.st_mtime))
+                os.remove(path)
+                renamed[os.path.basename(path)] = os.path.basename(new_path)
+            else:
+                os.remove(written_path)
+
+    report["markers"] = 0 if dry_run else rewrite_markers(html_dir, renamed)
+    return report
+
+
+def print_report(report, compression, dry_run):
+    """移行結果を表示する"""
+    if not report["files"]:
+        print("移行対象のHTMLファイルがありません。")
+        return
+    saved = report["bytes_before"] - report["bytes_after"]
+    print(f"{'（確認のみ）' if dry_run else ''}{report['files']} 件のHTMLを {compression} 形式に移行しました。")
+    print(f"  移行前: {report['bytes_before'] / 1024 / 1024:.1f} MB")
+    print(f"  移行後: {report['bytes_after'] / 1024 / 1024:.1f} MB（{report['bytes_after'] / report['bytes_before']:.1%}）")
+    print(f"  削減量: {saved / 1024 / 1024:.1f} MB")
+    if report["parse_before_ms"]:
+        before = sum(report["parse_before_ms"]) / len(report["parse_before_ms"])
+        after = sum(report["parse_after_ms"]) / len(report["parse_after_ms"])
+        print(f"  解析時間（{len(report['parse_before_ms'])} 件の平均）: 移行前 {before:.1f} ms → 移行後 {after:.1f} ms（{after / before - 1:+.1%}）")
+        if report["mismatches"]:
+            print(f"  警告: {report['mismatches']} 件で移行前後の抽出結果が一致しませんでした。")
+    if not dry_run:
+        print(f"  変化なしマーカーの参照先を {report['markers']} 件書き換えました。")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="保存済みのHTMLを圧縮形式へ一括移行する")
+    parser.add_argument("--dir", default="html", help="移行するHTMLのディレクトリ")
+    parser.add_argument("--compression", choices=["gzip", "zstd"], help="圧縮形式（省略時は config.json の html_storage.compression）")
+    parser.add_argument("--level", type=int, help="圧縮レベル（省略時は config.json の html_storage.level）")
+    parser.add_argument("--sample", type=int, default=10, help="解析時間を比較するファイル数（0で比較しない）")
+    parser.add_argument("--dry-run", action="store_true", help="ファイルを変更せず、削減量と解析時間だけを表示する")
+    args = parser.parse_args()
+
+    storage = get_html_storage_config(load_config())
+    compression = args.compression or storage["compression"]
+    level = args.level if args.level is not None else storage["level"]
+    if compression == "none":
+        print("エラー: 圧縮形式を --compression か config.json の html_storage.compression で指定してください。")
+        sys.exit(1)
+
+    report = migrate(args.dir, compression, level=level, sample=args.sample, dry_run=args.dry_run)
+    print_report(report, compression, args.dry_run)
+    if report["mismatches"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""記録済みのAPIレスポンスを再生するローカルのスタンドインサーバー
+
+fetch_html.py の api_capture が保存した JSON（IPTeCA_YYYYMMDD_HHMMSS_JST.json）を読み込み、
+記録されたレスポンスを元のパス・クエリで配信する。"/" では記録された各APIを fetch() するだけの
+ページを返すため、実サイトに接続せずにレスポンス取得からJSON解析までを確認できる。
+
+使い方:
+    python tools/replay_server.py 記録.json [--port 8000]   # サーバーとして起動
+    python tools/replay_server.py 記録.json --check          # 取得→解析を実行して記録と比較
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import threading
+from urllib.parse import urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def load_recordings(paths):
+    """記録ファイルを読み込み、パス（クエリ付き）→ レスポンス本文 の辞書を返す"""
+    recordings = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            capture_data = json.load(f)
+        for response in capture_data.get("responses", []):
+            parts = urlsplit(response["url"])
+            key = parts.path + (f"?{parts.query}" if parts.query else "")
+            recordings[key] = response["body"]
+    return recordings
+
+
+def build_index_page(recordings):
+    """記録された各APIを読み込むだけのHTMLページを作成する"""
+    fetches = "\n".join(f"      fetch({json.dumps(key)});" for key in recordings)
+    return f"""<!DOCTYPE html>
+<html>
+  <head><meta charset="utf-8"><title>replay</title></head>
+  <body>
+    <script>
+{fetches}
+    </script>
+  </body>
+</html>
+"""
+
+
+def make_handler(recordings):
+    """記録を配信するリクエストハンドラを作成する"""
+    index_page = build_index_page(recordings).encode("utf-8")
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/":
+                self._send(200, "text/html; charset=utf-8", index_page)
+            elif self.path in recordings:
+                body = json.dumps(recordings[self.path], ensure_ascii=False).encode("utf-8")
+                self._send(200, "application/json; charset=utf-8", body)
+            else:
+                self._send(404, "text/plain", b"not recorded")
+
+        def _send(self, status, content_type, body):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ReplayHandler
+
+
+def start_server(recordings, port=0):
+    """再生サーバーをバックグラウンドで起動する"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(recordings))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def run_check(recording_paths):
+    """再生サーバーに対して fetch_html を実行し、解析結果が記録と一致するか確認する"""
+    from fetch_html import fetch_html
+    from analyze_html import extract_zone_data_from_json
+
+    server = start_server(load_recordings(recording_paths))
+    origin = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            api_config = {"enabled": True, "store": "json_only", "url_patterns": [origin + "/"]}
+            # 再生ページにはワールドカードが無いため、従来の networkidle 待機を使う
+            readiness = {"strategy": "networkidle", "latency_log": None}
+            saved_files = fetch_html(lean=False, url=origin + "/", save_dir=tmp_dir, api_config=api_config, readiness=readiness)
+            actual = extract_zone_data_from_json(saved_files[-1])
+    finally:
+        server.shutdown()
+
+    expected = {}
+    for path in recording_paths:
+        expected.update(extract_zone_data_from_json(path))
+
+    if actual != expected:
+        print("不一致: 再生したレスポンスの解析結果が記録と異なります。")
+        print(f"  期待値: {expected}")
+        print(f"  実際値: {actual}")
+        return False
+    print(f"一致: {len(actual)} ゾーンのデータが記録と一致しました。")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="記録済みのAPIレスポンスを再生する")
+    parser.add_argument("recordings", nargs="+", help="api_capture が保存したJSONファイル")
+    parser.add_argument("--port", type=int, default=8000, help="待ち受けポート（サーバー起動時）")
+    parser.add_argument("--check", action="store_true", help="取得から解析までを実行して記録と比較する")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if run_check(args.recordings) else 1)
+
+    server = start_server(load_recordings(args.recordings), port=args.port)
+    print(f"再生サーバーを起動しました: http://127.0.0.1:{server.server_address[1]}/")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""保存済みのHTML（APIレスポンス）を現在の抽出処理で解析し直し、バージョン付きのデータセットを作る
+
+cluster.mu のマークアップ変更に合わせて抽出処理を直した後（EXTRACTOR_VERSION を上げた後）に使う。
+html/ のスナップショットのうち --since / --until の範囲を、抽出インデックスや取得時の記録を使わずに
+プロセスプールで並列に解析し直し、graphs/datasets/v<EXTRACTOR_VERSION>/ に次のファイルを書き出す：
+    html_data.csv     新しいデータセット（graphs/html_data.csv と同じ列）
+    manifest.json     抽出処理のバージョン・バックエンド・範囲・件数
+    diff_report.json  元のデータ（--base）との差分の集計（追加・削除・変更された行、ゾーンごとの変更数）
+    diff.csv          値が変わったセルの一覧（filename, column, old, new）
+元のデータは config.json の analysis.storage の保存先（csv: graphs/html_data.csv、parquet: graphs/html_data.parquet、
+sqlite: analysis.sqlite_path）から読む。--base で別の場所を指定できる（形式は analysis.storage に従う）。
+手動で追加した行（filename が .png のもの）は元のデータからそのまま引き継ぐ。
+範囲外のHTMLの行も元のデータから引き継ぐ（manifest.json の carried_rows）。
+元のデータで同じ filename のHTMLの行が複数ある場合（日時の書式が違う古い行など）は1行にまとめる（diff_report.json の duplicate_rows）。
+
+--promote を付けると、元のデータを出力先に previous_html_data.csv として残した上で、
+元のデータの保存先を新しいデータセットで置き換え（既存の行とはマージしない。Parquet・SQLite は import_csv_frame の replace=True で
+作り直す）、graphs/world_data.csv も更新する。graphs/snapshot_digests.json は削除し、次回の analyze_html.py で全件を書き込み直す。
+
+使い方:
+    python tools/reprocess.py [--since 2026-01-01] [--until 2026-01-31] [--workers 4] [--backend selectolax]
+    python tools/reprocess.py --promote
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+from datetime import datetime, time as dt_time
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parquet_store
+import sqlite_store
+from analyze_html import (
+    get_html_files, csv_frame, load_config, get_storage_config, load_frame_from_csv, ZONE_SHORT_NAMES, EXTRACTOR_VERSION,
+    PARSER_BACKENDS, DEFAULT_PARSER_BACKEND, DEFAULT_CHUNKSIZE,
+)
+from world_store import save_world_store
+
+JST = ZoneInfo("Asia/Tokyo")
+
+
+def parse_date(value, end_of_day=False):
+    """「YYYY-MM-DD」または「YYYY-MM-DD HH:MM:SS」をJSTのdatetimeにする（日付のみの場合、end_of_day なら23:59:59）"""
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=JST)
+    except ValueError:
+        day = datetime.strptime(value, "%Y-%m-%d")
+        return datetime.combine(day, dt_time(23, 59, 59) if end_of_day else dt_time(0, 0, 0), tzinfo=JST)
+
+
+def zone_columns():
+    """ゾーンデータの列名"""
+    return [f"{zone_name}_{metric}" for zone_name in ZONE_SHORT_NAMES for metric in ("visitors", "likes")]
+
+
+def in_range(date_str, since, until):
+    """CSVの date_str（YYYY-MM-DD HH:MM:SS）が範囲内かどうか（解釈できない場合は範囲外とする）"""
+    dates = pd.to_datetime(date_str, format="%Y-%m-%d %H:%M:%S", errors="coerce").dt.tz_localize(JST)
+    mask = dates.notna()
+    if since is not None:
+        mask &= dates >= since
+    if until is not None:
+        mask &= dates <= until
+    return mask
+
+
+def read_base(storage, base):
+    """元のデータを html_data.csv と同じ列のDataFrameとして読み込む（無い場合は None）"""
+    if storage == "parquet":
+        return parquet_store.export_csv_frame(base, zone_columns())
+    if storage == "sqlite":
+        return sqlite_store.export_csv_frame(base, ZONE_SHORT_NAMES)
+    return pd.read_csv(base, encoding="utf-8-sig") if os.path.exists(base) else None
+
+
+def promote_dataset(storage, base, dataset_path):
+    """元のデータの保存先を新しいデータセット（CSV）で置き換える"""
+    if storage == "parquet":
+        parquet_store.import_csv_frame(base, load_frame_from_csv(dataset_path), zone_columns(), replace=True)
+    elif storage == "sqlite":
+        sqlite_store.import_csv_frame(base, load_frame_from_csv(dataset_path), ZONE_SHORT_NAMES, replace=True)
+    else:
+        shutil.copyfile(dataset_path, base)
+
+
+def build_dataset(rows, df_base, since, until):
+    """解析し直した行に、元のCSVの手動データと範囲外の行を加えたデータセットと、引き継いだ行数を返す"""
+    df_new = csv_frame(rows) if rows else pd.DataFrame(columns=["filename", "date_str"])
+    if df_base is None:
+        return df_new.sort_values("date_str", kind="stable"), 0, 0
+
+    is_manual = df_base["filename"].astype(str).str.endswith(".png")
+    # 範囲外のHTMLの行（範囲を指定した場合のみ）
+    is_carried = ~is_manual & ~df_base["filename"].isin(set(df_new["filename"]))
+    is_carried &= ~in_range(df_base["date_str"], since, until) if (since or until) else False
+    # 同じ filename の行が複数ある場合は、解析し直した行と同じく1行にまとめる（後の行を使う）
+    df_carried = df_base[is_carried].drop_duplicates(subset=["filename"], keep="last")
+    df_combined = pd.concat([df_new, df_base[is_manual], df_carried], ignore_index=True)
+    return df_combined.sort_values("date_str", kind="stable"), int(is_manual.sum()), len(df_carried)
+
+
+def diff_datasets(df_base, df_new):
+    """元のCSVと新しいデータセットを filename ごとに比較し、(集計, 変更されたセルのDataFrame) を返す（手動データは除く）"""
+    columns = [column for column in zone_columns() if column in df_new.columns]
+    if df_base is None:
+        df_base = pd.DataFrame(columns=["filename"] + columns)
+
+    def html_rows(df):
+        df = df[~df["filename"].astype(str).str.endswith(".png")]
+        df = df.drop_duplicates(subset=["filename"], keep="last").set_index("filename")
+        return df.reindex(columns=columns).apply(pd.to_numeric, errors="coerce").fillna(0)
+
+    # 同じ filename の行が複数ある場合（日時の書式が違う古い行など）は、新しいデータセットでは1行になる
+    # 実際にまとめた行数（新しいデータセットに残った filename の、元のデータでの重複）を数える
+    base_filenames = df_base.loc[~df_base["filename"].astype(str).str.endswith(".png"), "filename"]
+    kept_filenames = base_filenames[base_filenames.isin(set(df_new["filename"]))]
+    duplicate_rows = len(kept_filenames) - kept_filenames.nunique()
+    base = html_rows(df_base)
+    new = html_rows(df_new)
+    common = base.index.intersection(new.index)
+    old_values = base.loc[common, columns]
+    new_values = new.loc[common, columns]
+    changed_cells = old_values.ne(new_values)
+
+    changes = changed_cells.stack()
+    changes = changes[changes].index
+    df_changes = pd.DataFrame({
+        "filename": changes.get_level_values(0),
+        "column": changes.get_level_values(1),
+        "old": [old_values.at[filename, column] for filename, column in changes],
+        "new": [new_values.at[filename, column] for filename, column in changes],
+    })
+
+    zones = {}
+    for zone_name in ZONE_SHORT_NAMES:
+        counts = {
+            metric: int(changed_cells[f"{zone_name}_{metric}"].sum())
+            for metric in ("visitors", "likes") if f"{zone_name}_{metric}" in changed_cells
+        }
+        if any(counts.values()):
+            zones[zone_name] = counts
+
+    summary = {
+        "base_rows": len(base),
+        "new_rows": len(new),
+        "added_rows": sorted(new.index.difference(base.index)),
+        "removed_rows": sorted(base.index.difference(new.index)),
+        "duplicate_rows": duplicate_rows,
+        "changed_rows": int(changed_cells.any(axis=1).sum()),
+        "changed_cells": len(df_changes),
+        "zones_affected": zones,
+    }
+    return summary, df_changes
+
+
+def print_report(summary, manifest):
+    """差分の集計を表示する"""
+    print(f"抽出処理 v{manifest['extractor_version']}（{manifest['parser_backend']}）で {manifest['extracted_rows']} 件を解析し直しました。")
+    print(f"  手動データ {manifest['manual_rows']} 件、範囲外の行 {manifest['carried_rows']} 件を引き継ぎました（合計 {manifest['total_rows']} 件）")
+    print(f"  元のデータとの差分: 追加 {len(summary['added_rows'])} 件、削除 {len(summary['removed_rows'])} 件、"
+          f"変更 {summary['changed_rows']} 件（{summary['changed_cells']} セル）、重複して除いた行 {summary['duplicate_rows']} 件")
+    for zone_name, counts in summary["zones_affected"].items():
+        print(f"    {zone_name}: 来場者数 {counts.get('visitors', 0)} 件、いいね数 {counts.get('likes', 0)} 件")
+    if summary["removed_rows"]:
+        print(f"  警告: 新しいデータセットに無い行があります（HTMLが削除された可能性があります）: {', '.join(summary['removed_rows'][:5])}"
+              + (" ..." if len(summary["removed_rows"]) > 5 else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="保存済みのHTMLを解析し直し、バージョン付きのデータセットと差分レポートを作る")
+    parser.add_argument("--dir", default="html", help="解析するHTMLのディレクトリ")
+    parser.add_argument("--base", help="比較・引き継ぎ元のデータの場所（省略時は analysis.storage の保存先）")
+    parser.add_argument("--output", help=f"出力先のディレクトリ（省略時は graphs/datasets/v{EXTRACTOR_VERSION}）")
+    parser.add_argument("--since", help="対象の開始日時（YYYY-MM-DD または YYYY-MM-DD HH:MM:SS、JST）")
+    parser.add_argument("--until", help="対象の終了日時（日付のみの場合はその日の終わりまで、JST）")
+    parser.add_argument("--backend", default=DEFAULT_PARSER_BACKEND, choices=PARSER_BACKENDS, help="解析バックエンド")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="並列に解析するプロセス数")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="ワーカーに一度に渡すファイル数")
+    parser.add_argument("--promote", action="store_true", help="元のデータの保存先を新しいデータセットで置き換える")
+    args = parser.parse_args()
+
+    # 対応していない analysis.storage の場合は解析を始める前に止める
+    storage, default_base = get_storage_config(load_config())
+    args.base = args.base or default_base
+
+    since = parse_date(args.since)
+    until = parse_date(args.until, end_of_day=True)
+    output_dir = args.output or os.path.join("graphs", "datasets", f"v{EXTRACTOR_VERSION}")
+
+    rows = get_html_files(
+        args.dir, workers=args.workers, chunksize=args.chunksize, since=since, until=until, backend=args.backend
+    )
+    df_base = read_base(storage, args.base)
+    df_dataset, manual_rows, carried_rows = build_dataset(rows, df_base, since, until)
+    summary, df_changes = diff_datasets(df_base, df_dataset)
+
+    manifest = {
+        "extractor_version": EXTRACTOR_VERSION,
+        "parser_backend": args.backend,
+        "created": datetime.now(JST).isoformat(timespec="seconds"),
+        "since": since.isoformat() if since else None,
+        "until": until.isoformat() if until else None,
+        "storage": storage,
+        "base": args.base,
+        "extracted_rows": len(rows),
+        "manual_rows": manual_rows,
+        "carried_rows": carried_rows,
+        "total_rows": len(df_dataset),
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    dataset_path = os.path.join(output_dir, "html_data.csv")
+    df_dataset.to_csv(dataset_path, index=False, encoding="utf-8-sig")
+    df_changes.to_csv(os.path.join(output_dir, "diff.csv"), index=False, encoding="utf-8-sig")
+    for name, content in (("manifest.json", manifest), ("diff_report.json", summary)):
+        with open(os.path.join(output_dir, name), "w", encoding="utf-8") as f:
+            json.dump(content, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+
+    print_report(summary, manifest)
+    print(f"データセットを保存しました: {output_dir}")
+
+    if args.promote:
+        previous_path = os.path.join(output_dir, "previous_html_data.csv")
+        if storage == "csv" and df_base is not None:
+            shutil.copyfile(args.base, previous_path)
+        elif df_base is not None:
+            df_base.to_csv(previous_path, index=False, encoding="utf-8-sig")
+        promote_dataset(storage, args.base, dataset_path)
+        print(f"{args.base} を新しいデータセットで置き換えました（元のデータ: {previous_path}）")
+        save_world_store(rows, os.path.join("graphs", "world_data.csv"))
+        # データストアを置き換えたため、次回の analyze_html.py ですべてのスナップショットを書き込み直す
+        digests_path = os.path.join("graphs", "snapshot_digests.json")
+        if os.path.exists(digests_path):
+            os.remove(digests_path)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"エラーが発生しました: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
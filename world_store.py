@@ -0,0 +1,81 @@
+import os
+from zoneinfo import ZoneInfo
+import pandas as pd
+
+# 縦持ち（1行 = 1回の取得 × 1ワールド）の列
+# ワールドが増えても列は増えず、行数は「取得回数 × ワールド数」に比例する
+WORLD_STORE_COLUMNS = ["date_str", "filename", "world_id", "title", "visitors", "likes"]
+# 行のキー（同じキーの行が複数ある場合は後の行を使う）
+WORLD_STORE_KEYS = ["filename", "world_id"]
+
+
+def world_records(data):
+    """get_html_files の結果（各行の "worlds"）を縦持ちのDataFrameに変換する"""
+    records = []
+    for row in data:
+        date_str = row["date"].strftime("%Y-%m-%d %H:%M:%S")
+        for world_id, world in row.get("worlds", {}).items():
+            records.append((date_str, row["filename"], world_id, world["title"], world["visitors"], world["likes"]))
+    return pd.DataFrame.from_records(records, columns=WORLD_STORE_COLUMNS)
+
+
+def append_world_store(data, csv_path):
+    """ワールドごとのデータを縦持ちのCSVの末尾に追記する（既存の行は読まず、書き換えない）
+    data には新しいスナップショットと値が変わったスナップショットだけを渡す（SnapshotDigests で選ぶ）
+    値が変わったスナップショットの古い行は残り、load_world_store が (filename, world_id) ごとに後の行を使う"""
+    df_new = world_records(data)
+    if df_new.empty:
+        return None
+    csv_dir = os.path.dirname(csv_path)
+    if csv_dir:
+        os.makedirs(csv_dir, exist_ok=True)
+    exists = os.path.exists(csv_path) and os.path.getsize(csv_path) > 0
+    if exists:
+        # 手動で編集したファイルの末尾に改行が無い場合に補う（追記した行が前の行に繋がらないように）
+        with open(csv_path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) not in (b"\n", b"\r"):
+                f.write(b"\n")
+    df_new.to_csv(csv_path, mode="a", header=not exists, index=False, encoding="utf-8-sig")
+    print(f"ワールドデータのCSVに {len(df_new)} 行を追記しました: {csv_path}（{df_new['filename'].nunique()} スナップショット）")
+    return csv_path
+
+
+def save_world_store(data, csv_path):
+    """ワールドごとのデータを縦持ちのCSVに保存（ファイル全体を書き直す。再解析したデータセットの反映用）
+    今回解析したスナップショットの行は、既存の行を置き換える（再解析でワールドが減った場合も正しくなる）
+    追記で残った古い行（同じ filename と world_id の前の行）もここで除く"""
+    df_new = world_records(data)
+    if df_new.empty:
+        print("ワールドデータのCSVに保存するデータがありません。")
+        return None
+
+    if os.path.exists(csv_path):
+        df_existing = pd.read_csv(csv_path, encoding="utf-8-sig", dtype={"world_id": str})
+        df_existing = df_existing[~df_existing["filename"].isin(set(df_new["filename"]))]
+        df_existing = df_existing.drop_duplicates(subset=WORLD_STORE_KEYS, keep="last")
+        df_combined = pd.concat([df_existing, df_new], ignore_index=True)
+    else:
+        df_combined = df_new
+    # 取得日時順（同じ取得内はワールドIDの順）に並べる
+    df_combined = df_combined.sort_values(["date_str", "world_id"], kind="stable")
+
+    csv_dir = os.path.dirname(csv_path)
+    if csv_dir:
+        os.makedirs(csv_dir, exist_ok=True)
+    df_combined.to_csv(csv_path, index=False, encoding="utf-8-sig")
+
+    print(f"ワールドデータのCSVを保存しました: {csv_path} ({df_combined['world_id'].nunique()} ワールド、合計 {len(df_combined)} 行)")
+    return csv_path
+
+
+def load_world_store(csv_path):
+    """縦持ちのCSVを読み込み、date 列（JST）を加えたDataFrameを返す（ファイルが無い場合は None）
+    同じ filename と world_id の行が複数ある場合は後に追記した行を使い、取得日時順（同じ取得内はワールドIDの順）に並べる"""
+    if not os.path.exists(csv_path):
+        return None
+    df = pd.read_csv(csv_path, encoding="utf-8-sig", dtype={"world_id": str, "title": str})
+    df = df.drop_duplicates(subset=WORLD_STORE_KEYS, keep="last")
+    df = df.sort_values(["date_str", "world_id"], kind="stable").reset_index(drop=True)
+    df["date"] = pd.to_datetime(df["date_str"], format="%Y-%m-%d %H:%M:%S").dt.tz_localize(ZoneInfo("Asia/Tokyo"))
+    return df